@@ -0,0 +1,108 @@
+"""
+Compares the asyncio details backend against the pypi-fetcher binary on a local stand-in for PyPI.
+
+Run from the repository root:
+    python -m benchmarks.details_fetch [path/to/pypi-fetcher] [package count] [latency ms]
+
+The stand-in answers /pypi/<name>/json with a small PyPI-like document after the given
+latency (20 ms by default), over HTTP/1.1 keep-alive. Both backends write to throwaway
+cache directories, so the real cache is never touched. Without a binary path only the
+asyncio backend is timed.
+"""
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from components.installer.cache import DetailsCache
+from components.installer.fetcher import AsyncDetailsBackend
+
+
+def _stand_in_server(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            name = self.path.strip("/").split("/")[1]
+            body = json.dumps({"info": {
+                "name": name, "version": "1.0.0", "summary": f"Stand-in for {name}",
+                "classifiers": ["License :: OSI Approved :: MIT License"],
+            }}).encode()
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _time_asyncio(url: str, names: list) -> float:
+    backend = AsyncDetailsBackend(DetailsCache(tempfile.mkdtemp()), url=url)
+    received = []
+
+    async def run():
+        await backend.fetch(names, lambda name, details: received.append(name))
+        await backend.close()
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    assert len(received) == len(names)
+    return elapsed
+
+
+def _time_go(binary: str, url: str, names: list) -> float:
+    process = subprocess.Popen(
+        [binary, "-serve", f"-url={url}", f"-cache-dir={tempfile.mkdtemp()}"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    start = time.perf_counter()
+    process.stdin.write(json.dumps({"id": 1, "packages": names}) + "\n")
+    process.stdin.flush()
+    received = 0
+    for line in process.stdout:
+        response = json.loads(line)
+        if response.get("done"):
+            break
+        received += 1
+    elapsed = time.perf_counter() - start
+    process.stdin.close()
+    process.wait()
+    assert received == len(names)
+    return elapsed
+
+
+def main():
+    binary = sys.argv[1] if len(sys.argv) > 1 else None
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    latency = (float(sys.argv[3]) if len(sys.argv) > 3 else 20) / 1000
+
+    server = _stand_in_server(latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}/pypi/{{}}/json"
+    names = [f"package-{i}" for i in range(count)]
+
+    print(f"{count} packages, {latency * 1000:.0f} ms latency per request\n")
+    print(f"{'backend':<12}{'seconds':>10}{'packages/s':>14}")
+    elapsed = _time_asyncio(url, names)
+    print(f"{'asyncio':<12}{elapsed:>10.2f}{count / elapsed:>14.0f}")
+    if binary:
+        elapsed = _time_go(binary, url, names)
+        print(f"{'go':<12}{elapsed:>10.2f}{count / elapsed:>14.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares the installer's SearchIndex against the old linear scan, and times the fuzzy fallback.
+
+Run from the repository root:
+    python -m benchmarks.installer_search [path/to/library_list.txt]
+
+The optional path is a JSON array of names (the format older versions saved); it is
+packed into a temporary store first. Without a path the store from the application
+support directory is used (downloaded on first run, the same way the installer does it).
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from components.installer.search import FuzzySearch, IncrementalSearch, SearchIndex, linear_search
+from components.installer.store import PackageNameStore, write_store
+from components.installer.utils import load_data, load_deletion_index
+
+QUERIES = ["r", "py", "req", "requests", "numpy", "learn", "django-rest", "scikit", "flask-", "ests", "zq", "xyzzyq"]
+REPEATS = 5
+TYPED = ["requests-toolbelt", "django-rest-framework", "scikit-learn"]
+TYPOS = ["reqeusts", "sckit-learn", "nmupy", "djnago-rest-framework", "pytset-cov"]
+
+
+def _time_ms(function, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _open_store(json_path: str) -> PackageNameStore:
+    with open(json_path, "r") as file:
+        names = json.load(file)
+    store_path = os.path.join(tempfile.mkdtemp(), "library_list.bin")
+    start = time.perf_counter()
+    write_store(store_path, names)
+    print(f"store written in {time.perf_counter() - start:.2f} s ({os.path.getsize(store_path) / 1e6:.1f} MB)")
+    return PackageNameStore(store_path)
+
+
+def main():
+    store = _open_store(sys.argv[1]) if len(sys.argv) > 1 else load_data()
+    if store is None:
+        sys.exit("No package list available")
+
+    start = time.perf_counter()
+    index = SearchIndex(store)
+    print(f"{len(store):,} package names, index ready in {(time.perf_counter() - start) * 1000:.3f} ms\n")
+    names = list(store)
+
+    print(f"{'query':<14}{'index (ms)':>12}{'linear (ms)':>14}{'same matches':>14}")
+    for query in QUERIES:
+        indexed = _time_ms(index.search, query, 50)
+        linear = _time_ms(linear_search, names, query, 50)
+        # Rankings only differ in how ties on match position are broken
+        same = set(index.search(query, None)) == set(linear_search(names, query, None))
+        print(f"{query:<14}{indexed:>12.3f}{linear:>14.1f}{str(same):>14}")
+
+    # Every prefix of a word, the way the search bar sees it while typing
+    print(f"\n{'typed':<24}{'index (ms)':>12}{'incremental (ms)':>18}")
+    for word in TYPED:
+        prefixes = [word[:i] for i in range(1, len(word) + 1)]
+        start = time.perf_counter()
+        for query in prefixes:
+            index.search(query, 50)
+        indexed = (time.perf_counter() - start) * 1000
+        incremental = IncrementalSearch(SearchIndex(store))
+        start = time.perf_counter()
+        for query in prefixes:
+            incremental.search(query, 50)
+        refined = (time.perf_counter() - start) * 1000
+        print(f"{word:<24}{indexed:>12.3f}{refined:>18.3f}")
+
+    start = time.perf_counter()
+    deletions = load_deletion_index(store)
+    print(f"\ndeletion index ready in {time.perf_counter() - start:.2f} s")
+    if deletions is None:
+        return
+    fuzzy = FuzzySearch(index, deletions)
+    print(f"{'typo':<24}{'fuzzy (ms)':>12}  suggestions")
+    for query in TYPOS:
+        print(f"{query:<24}{_time_ms(fuzzy.search, query, 5):>12.3f}  {', '.join(fuzzy.search(query, 5))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares the in-process site-packages reader against library-loader and `pip inspect`.
+
+Run from the repository root:
+    python -m benchmarks.library_loading [path/to/venv] [path/to/library-loader]
+
+Without a venv (or with "" as the path) a synthetic one is built the way
+benchmarks.library_sizing does it. Every backend is timed cold, as the Library page
+runs it when an environment is selected: `pip inspect` alone, the reader, and, with a
+binary, library-loader without its scan cache and then with a warm one.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.library_sizing import fill_synthetic, site_packages_of
+from components.library.reader import read_installed
+
+REPEATS = 3
+
+
+def _time(function) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    venv = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] else None
+    binary = sys.argv[2] if len(sys.argv) > 2 else None
+    if venv is None:
+        venv = os.path.join(tempfile.mkdtemp(), "venv")
+        subprocess.run([sys.executable, "-m", "venv", venv], check=True)
+        fill_synthetic(site_packages_of(venv), 200, 20)
+
+    python = os.path.join(venv, "Scripts" if os.name == "nt" else "bin", "python")
+    print(f"{len(read_installed(venv))} distributions in {venv}\n")
+    print(f"{'backend':<28}{'seconds':>10}")
+    print(f"{'pip inspect':<28}{_time(lambda: subprocess.run([python, '-m', 'pip', 'inspect'], capture_output=True, check=True)):>10.3f}")
+    print(f"{'reader (python)':<28}{_time(lambda: read_installed(venv)):>10.3f}")
+    if binary:
+        cache_dir = tempfile.mkdtemp()
+        print(f"{'library-loader':<28}{_time(lambda: subprocess.run([binary, venv], capture_output=True, check=True)):>10.3f}")
+        subprocess.run([binary, f"-cache-dir={cache_dir}", venv], capture_output=True, check=True)
+        print(f"{'library-loader (warm cache)':<28}{_time(lambda: subprocess.run([binary, f'-cache-dir={cache_dir}', venv], capture_output=True, check=True)):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
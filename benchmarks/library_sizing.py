@@ -0,0 +1,98 @@
+"""
+Compares sizing installed packages from RECORD's size column against walking their files.
+
+Run from the repository root:
+    python -m benchmarks.library_sizing [path/to/library-loader] [distributions] [files per distribution]
+
+A synthetic virtual environment is created in a temporary directory (`python -m venv`,
+so pip is there for `pip inspect`) and filled with fake distributions, 40 by default
+with 100 files each, half of them sharing one namespace package. Both modes of
+components/library/sizing.py are timed on it; with a library-loader binary, the
+`-size=walk` and `-size=record` runs are timed end to end as well (no scan cache, so
+each run includes the interpreter startup and `pip inspect`).
+"""
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from components.library.sizing import record_size, walk_size
+
+REPEATS = 3
+
+
+def site_packages_of(venv: str) -> str:
+    python = os.path.join(venv, "Scripts" if os.name == "nt" else "bin", "python")
+    return subprocess.run(
+        [python, "-c", "import sysconfig; print(sysconfig.get_paths()['purelib'])"],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def fill_synthetic(site_packages: str, distributions: int, files: int) -> list:
+    """Writes the fake distributions, returning their dist-info directories."""
+    dist_infos = []
+    payload = b"x" * 2048
+    for number in range(distributions):
+        name = f"synthetic_{number}"
+        # Every other distribution puts its modules in the shared `synthetic_ns` namespace
+        package = os.path.join("synthetic_ns", name) if number % 2 else name
+        dist_info = os.path.join(site_packages, f"{name}-1.0.dist-info")
+        os.makedirs(dist_info)
+        rows = []
+        for index in range(files):
+            relative = f"{package}/module_{index}.py".replace(os.sep, "/")
+            file_path = os.path.join(site_packages, relative)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as file:
+                file.write(payload)
+            rows.append((relative, "sha256=-", str(len(payload))))
+            # Compiled files are listed without a size, like pip does
+            rows.append((f"{package}/__pycache__/module_{index}.cpython-3.pyc".replace(os.sep, "/"), "", ""))
+        with open(os.path.join(dist_info, "METADATA"), "w") as file:
+            file.write(f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\nSummary: Synthetic package\n")
+        rows.append((f"{name}-1.0.dist-info/METADATA", "", ""))
+        rows.append((f"{name}-1.0.dist-info/RECORD", "", ""))
+        with open(os.path.join(dist_info, "RECORD"), "w", newline="") as file:
+            csv.writer(file).writerows(rows)
+        dist_infos.append(dist_info)
+    return dist_infos
+
+
+def _time(function) -> tuple[float, object]:
+    best, value = float("inf"), None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    binary = sys.argv[1] if len(sys.argv) > 1 else None
+    distributions = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    files = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    venv = os.path.join(tempfile.mkdtemp(), "venv")
+    subprocess.run([sys.executable, "-m", "venv", venv], check=True)
+    site_packages = site_packages_of(venv)
+    dist_infos = fill_synthetic(site_packages, distributions, files)
+    print(f"{distributions} distributions, {distributions * files:,} files\n")
+
+    print(f"{'mode':<22}{'seconds':>10}{'total MB':>12}")
+    for mode, size in (("walk (python)", walk_size), ("record (python)", record_size)):
+        elapsed, total = _time(lambda: sum(size(site_packages, dist_info) for dist_info in dist_infos))
+        print(f"{mode:<22}{elapsed:>10.3f}{total / 1e6:>12.2f}")
+
+    if binary:
+        for mode in ("walk", "record"):
+            elapsed, _ = _time(lambda: subprocess.run(
+                [binary, f"-size={mode}", venv], capture_output=True, check=True
+            ))
+            print(f"{f'library-loader {mode}':<22}{elapsed:>10.3f}{'':>12}")
+
+
+if __name__ == "__main__":
+    main()
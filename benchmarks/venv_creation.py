@@ -0,0 +1,54 @@
+"""
+Compares creating a virtual environment with `python -m venv` against cloning a template.
+
+Run from the repository root:
+    python -m benchmarks.venv_creation [path/to/python] [environments]
+
+Everything happens in a temporary directory. The template of the interpreter (the
+running one by default) is built first and timed on its own, then `environments`
+venvs (5 by default) are made each way: `python -m venv`, a clone hard-linking the
+template's files and a clone copying them. Every clone is checked to run pip.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from components.library.templates import VenvTemplates, bin_directory
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    python = sys.argv[1] if len(sys.argv) > 1 else sys.executable
+    environments = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    root = tempfile.mkdtemp()
+    templates = VenvTemplates(os.path.join(root, "templates"))
+    print(f"template build: {_time(lambda: templates.template(python)):.3f}s")
+
+    def venv(path):
+        subprocess.run([python, "-m", "venv", path], capture_output=True, check=True)
+
+    def clone(hardlink):
+        def create(path):
+            templates.hardlink = hardlink
+            if not templates.clone(python, path):
+                raise RuntimeError(f"Failed to clone into {path}")
+        return create
+
+    for label, create in (("python -m venv", venv), ("clone, hardlink", clone(True)), ("clone, copy", clone(False))):
+        paths = [os.path.join(root, label.replace(" ", "_").replace(",", ""), f"venv_{index}") for index in range(environments)]
+        timings = [_time(lambda path=path: create(path)) for path in paths]
+        pip = os.path.join(bin_directory(paths[-1]), "pip")
+        subprocess.run([pip, "--version"], capture_output=True, check=True)
+        print(f"{label:<16} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,41 @@
+from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QLabel, QVBoxLayout, QWidget
+from ..installer.wheelhouse import Wheelhouse
+from ..library.utils import human_readable_size
 
 
 class Analysis(QWidget):
     """
     Analysis page of the application
+
+    - Wheelhouse: size against its cap, wheels kept and how many installed
+      packages came from it without touching the index (refreshed when shown)
     """
-    def __init__(self):
+    def __init__(self, wheelhouse: Wheelhouse | None = None):
         super().__init__()
+        self.wheelhouse = wheelhouse
         self.setObjectName("analysis")
         self.main_layout = QVBoxLayout()
+        self.main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         self.label = QLabel("This is the analysis Page")
         self.main_layout.addWidget(self.label)
+        self.wheelhouse_label = QLabel()
+        self.wheelhouse_label.setObjectName("wheelhouseStats")
+        self.wheelhouse_label.setTextFormat(Qt.TextFormat.RichText)
+        self.main_layout.addWidget(self.wheelhouse_label)
         self.setLayout(self.main_layout)
-        pass
+
+    def _refresh_wheelhouse(self):
+        if self.wheelhouse is None:
+            self.wheelhouse_label.setText("Wheelhouse: disabled")
+            return
+        stats = self.wheelhouse.stats()
+        self.wheelhouse_label.setText(
+            f"Wheelhouse: {human_readable_size(stats['size'])} of {human_readable_size(stats['max_size'])}, "
+            f"{stats['wheels']} wheels<br>"
+            f"Hit rate: {stats['hit_rate']:.0%} ({stats['hits']} packages installed from it, {stats['misses']} fetched)"
+        )
+
+    def showEvent(self, a0):
+        self._refresh_wheelhouse()
+        return super().showEvent(a0)
@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import time
+
+# Same rules as `pypi-fetcher`, which writes most of the entries
+VALID_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+# RFC 3339 as Go's time.Time writes it: 0 to 9 fraction digits, Z or an offset
+TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})?$")
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """
+    Parses `fetched_at`, written by Python's isoformat or Go's RFC3339Nano.
+
+    Before Python 3.11 fromisoformat only takes 3 or 6 fraction digits and no `Z`,
+    so the fraction is cut or padded to microseconds first. Raises ValueError.
+    """
+    match = TIMESTAMP.match(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    seconds, fraction, offset = match.groups()
+    fraction = f".{(fraction or '')[:6].ljust(6, '0')}"
+    offset = "+00:00" if offset in (None, "Z") else offset
+    return datetime.datetime.fromisoformat(seconds + fraction + offset)
+
+
+class DetailsCache:
+    """
+    The PyPI details cache shared with `pypi-fetcher`, one JSON file per package.
+
+    Layout: `<directory>/<first two hex digits of sha1(name)>/<name>.json`, holding the
+    same object the fetcher returns. Lookups read a single small file, writes replace
+    a single file with `os.replace`, so neither side ever loads or rewrites the whole
+    cache and both can use it at the same time.
+
+    - an entry whose `fetched_at` is older than `ttl` seconds counts as missing
+    - a hit bumps the file's modification time, which is the LRU order
+    - `sweep` deletes expired entries, then the least recently used ones beyond `max_entries`
+    """
+    def __init__(self, directory: str, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def path_for(self, name: str) -> str | None:
+        if not VALID_NAME.match(name):
+            return None
+        shard = hashlib.sha1(name.encode()).hexdigest()[:2]
+        return os.path.join(self.directory, shard, f"{name}.json")
+
+    def _is_expired(self, data: dict) -> bool:
+        try:
+            fetched_at = parse_timestamp(data['fetched_at'])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return time.time() - fetched_at.timestamp() > self.ttl
+
+    def get(self, name: str) -> dict | None:
+        """Returns the cached details of a package, or None when missing or expired."""
+        file_path = self.path_for(name)
+        if file_path is None:
+            return None
+        try:
+            with open(file_path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if self._is_expired(data):
+            return None
+        try:
+            os.utime(file_path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, name: str, data: dict):
+        """Stores the details of a package, stamping `fetched_at` if it is not set."""
+        file_path = self.path_for(name)
+        if file_path is None:
+            return
+        if not data.get('fetched_at'):
+            data = dict(data, fetched_at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temp_path, file_path)
+
+    def sweep(self) -> int:
+        """Deletes expired and least recently used entries, returning how many were removed."""
+        entries = []
+        removed = 0
+        for shard in os.scandir(self.directory) if os.path.isdir(self.directory) else ():
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, "r") as file:
+                        expired = self._is_expired(json.load(file))
+                    modified = entry.stat().st_mtime
+                except (OSError, ValueError):
+                    expired, modified = True, 0
+                if expired:
+                    removed += self._remove(entry.path)
+                else:
+                    entries.append((modified, entry.path))
+
+        entries.sort(reverse=True)
+        for _, file_path in entries[self.max_entries:]:
+            removed += self._remove(file_path)
+        return removed
+
+    @staticmethod
+    def _remove(file_path: str) -> int:
+        try:
+            os.remove(file_path)
+            return 1
+        except OSError:
+            return 0
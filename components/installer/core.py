@@ -2,11 +2,18 @@ from PyQt6.QtCore import QModelIndex, QTimer, pyqtSignal
 from PyQt6.QtWidgets import QLineEdit, QListView, QSizePolicy, QVBoxLayout, QWidget
 
 # Imports from our new package structure
-from .threads import GettingInstallerLibraryDetails, InstallerLibraries, PyPiRunner
+from .threads import AsyncDetailsFetcher, PyPiFetcherDaemon, PyPiRunner, SearchRunner
+from .install_queue import InstallQueue
 from .models import LibraryListModel
 from .models import DataRole
 from .delegates import PyPIitemDelegate
-from helpers.utils import resource_path
+from .prefetch import DetailsPrefetcher
+from .search import FuzzySearch, SearchIndex
+from .store import PackageNameStore
+from .utils import get_details_cache, get_wheelhouse
+from .cache import DetailsCache
+from .fetcher import AsyncDetailsBackend
+from helpers.utils import normalize_name, resource_path
 
 class Installer(QWidget):
     """Installer widget for installing libraries"""
@@ -16,20 +23,35 @@ class Installer(QWidget):
     population_finished = pyqtSignal()
     details_fetched = pyqtSignal(str, dict)
     installed = pyqtSignal()
+    PAGE_SIZE = 50
     def __init__(self, parent=None, config: dict = {}):
         super().__init__(parent)
         self.config = config
-        self.installer_thread = None
+        installer_controls = config.get('controls', {}).get('installer', {})
+        # Wheels downloaded or built for one environment are reused by the others
+        self.wheelhouse = get_wheelhouse(
+            max_bytes=installer_controls.get('wheelhouseMaxMB', 2048) * 1024 ** 2
+        ) if installer_controls.get('wheelhouse', True) else None
+        self.install_queue = InstallQueue(
+            batch_window=installer_controls.get('installBatchWindow', 300),
+            wheelhouse=self.wheelhouse,
+            parent=self
+        )
+        self.install_queue.progress.connect(self._show_install_progress)
+        self.install_queue.finished.connect(self._show_installed_flag)
         self.indexes_which_are_installed = []
         self.sorted_matches = []
         self.sorted_match_with_install = []
-        self.all_libraries = []
+        self.search_query = ""
+        self.page_request = None # (generation, limit) of the page being loaded
+        self.all_libraries: PackageNameStore | list = []
+        self.search_index: SearchIndex | None = None
         self.python_exec = ""
         self.setStyleSheet(
             self.config.get('stylesheet', {}).get('tooltip','')
         )
         self.API_ENDPOINT: str = (
-            self.config.get('api', {}).get('pypi', {}).get('libraryDetails', 'https://pypi.org/pypi/{package}/json')
+            self.config.get('api', {}).get('pypi', {}).get('libraryDetails', 'https://pypi.org/pypi/{}/json')
         )
         # Setup all the UI Components
         self._setup_ui()
@@ -37,7 +59,6 @@ class Installer(QWidget):
         # Setup timers and signals for fetching list of libraries
         self._setup_timers()
         self._setup_signals_for_fetching_libraries()
-        self.get_details = None
 
     def _setup_ui(self):
         # Initialize the main layout
@@ -52,13 +73,23 @@ class Installer(QWidget):
         self.python_exec = path
 
     def _setup_search_bar(self):
+        self.search_timer = QTimer()
+        self.search_timer.setInterval(150)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.filterList)
+        self.search_runner = SearchRunner(
+            fuzzy_threshold=self.config.get('controls', {}).get('installer', {}).get('fuzzyThreshold', 5)
+        )
+        self.search_runner.results.connect(self._show_search_results)
+
         # Set a search bar for searching libraries to install
         self.search_bar = QLineEdit()
         self.search_bar.setFixedHeight(30)
         self.search_bar.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.search_bar.setObjectName("searchBarInstaller")
         self.search_bar.setPlaceholderText("Search for libraries to install...")
-        self.search_bar.textChanged.connect(self.filterList) # ADDED: Connect search bar to filter method
+        # Searches run on a worker, the timer only waits for typing to pause
+        self.search_bar.textChanged.connect(self.search_timer.start)
         self.main_layout.addWidget(self.search_bar)
 
     def _setup_list_model(self):
@@ -75,7 +106,8 @@ class Installer(QWidget):
         self.library_list_view.setUniformItemSizes(False)
 
         # List Model which holds the data for the library list view
-        self.source_model = LibraryListModel()
+        self.source_model = LibraryListModel(page_size=self.PAGE_SIZE)
+        self.source_model.fetch_more_requested.connect(self._fetch_more)
         self.library_list_view.setModel(self.source_model)
         self.delegate = PyPIitemDelegate(self.config, self.library_list_view)
         self.library_list_view.setItemDelegate(self.delegate)
@@ -83,114 +115,159 @@ class Installer(QWidget):
 
     def _setup_timers(self):
         # Search Timer
-        self.scraper_pypi = PyPiRunner()
-        self.search_timer = QTimer()
-        self.search_timer.setInterval(300)
-        self.search_timer.setSingleShot(True)
-        self.search_timer.timeout.connect(self.filterList)
+        self.scraper_pypi = PyPiRunner(
+            url=self.config.get('api', {}).get('pypi', {}).get('packageList', 'https://pypi.org/simple/'),
+            refresh_interval=self.config.get('controls', {}).get('installer', {}).get('packageListRefresh', 21600000)
+        )
+
+        # Details are fetched for the rows on screen, and a page ahead once the user is idle
+        details_cache = get_details_cache(
+            ttl=self.config.get('controls', {}).get('installer', {}).get('detailsCacheTTL', 86400),
+            max_entries=self.config.get('controls', {}).get('installer', {}).get('detailsCacheMaxEntries', 5000)
+        )
+        self.details_prefetcher = DetailsPrefetcher(
+            self.library_list_view,
+            self.source_model,
+            self._create_details_fetcher(details_cache),
+            details_cache,
+            idle_interval=self.config.get('controls', {}).get('installer', {}).get('detailsTimeout', 1000)
+        )
 
-        self.fetch_details_timer = QTimer()
-        self.fetch_details_timer.setInterval(1000)
-        self.fetch_details_timer.setSingleShot(True)
-        self.fetch_details_timer.timeout.connect(self.fetchDetails)
+    def _create_details_fetcher(self, details_cache: DetailsCache):
+        # `api.pypi.detailsBackend` picks between the Go binary and the in-process asyncio client
+        pypi_config = self.config.get('api', {}).get('pypi', {})
+        if pypi_config.get('detailsBackend', 'go') == 'asyncio':
+            async_config = pypi_config.get('asyncFetcher', {})
+            return AsyncDetailsFetcher(AsyncDetailsBackend(
+                details_cache,
+                url=self.API_ENDPOINT,
+                max_connections=async_config.get('maxConnections', 10),
+                timeout=async_config.get('timeout', 10),
+                retries=async_config.get('retries', 2),
+            ), self)
+        return PyPiFetcherDaemon(
+            resource_path(self.config.get('paths', {}).get('executables', {}).get('pypiDetailFetcher', {}).get('darwin', "./pypi_detail_fetcher")),
+            self, details_cache.ttl, details_cache.max_entries
+        )
 
 
     def set_status(self, libraries_list: list):
-        for library in self.sorted_matches:
+        # Names in the store are normalized, installed names come straight from the metadata
+        libraries_list = {normalize_name(library) for library in libraries_list}
+        # Scrolling loads more pages, so avoid a lookup of every row in every row
+        for index, library in enumerate(self.sorted_matches):
             if library in libraries_list:
-                try:
-                    index = self.sorted_matches.index(library)
-                    self.sorted_match_with_install[index].update({'status': 'installed'})
-                    index_of_model = self.source_model.name_to_row.get(library, -1)
-                    if index_of_model != -1:
-                        idx = self.source_model.index(index_of_model)
-                        self.source_model.dataChanged.emit(idx, idx)
-                except ValueError:
-                    continue
+                status = 'installed'
+            elif self.install_queue.is_queued(self.python_exec, library):
+                status = 'installing'
             else:
-                index = self.sorted_matches.index(library)
-                if index == -1:
-                    continue
-                self.sorted_match_with_install[index].update({'status': 'install'})
-                index_of_model = self.source_model.name_to_row.get(library, -1)
-                if index_of_model != -1:
-                    idx = self.source_model.index(index_of_model)
-                    self.source_model.dataChanged.emit(idx, idx)
-
-
-    def fetchDetails(self):
-        # Fetch details of libraries
-        if self.sorted_matches:
-            self.get_details = GettingInstallerLibraryDetails(
-                resource_path(self.config.get('paths', {}).get('executables', {}).get('pypiDetailFetcher', {}).get('darwin', "./pypi_detail_fetcher")),
-                self.sorted_matches
-            )
-            self.get_details.finished.connect(self.source_model.updateData)
-            self.get_details.start()
-
-    def _show_installed_flag(self, return_code, model_index: QModelIndex):
-
-        name_of_library = model_index.data(DataRole).get('name')
-        self.installed.emit()
+                status = 'install'
+            self.sorted_match_with_install[index].update({'status': status})
+            index_of_model = self.source_model.name_to_row.get(library, -1)
+            if index_of_model != -1:
+                idx = self.source_model.index(index_of_model)
+                self.source_model.dataChanged.emit(idx, idx)
+
+
+    def _set_library_status(self, name_of_library: str, status: str, **extra):
+        if name_of_library not in self.sorted_matches:
+            return # Searched away, set_status marks it once it shows up again
         idx = self.sorted_matches.index(name_of_library)
-        if return_code == -1:
-            self.sorted_match_with_install[idx].update({'status': 'failed'})
+        self.sorted_match_with_install[idx].update({'status': status, 'phase': "", **extra})
+        row = self.source_model.name_to_row.get(name_of_library, -1)
+        if row != -1:
+            model_index = self.source_model.index(row)
             self.source_model.dataChanged.emit(model_index, model_index)
-        else:
-            self.sorted_match_with_install[idx].update({'status': 'installed'})
-            self.source_model.dataChanged.emit(model_index, model_index)
-        self.installer_thread = None
+
+    def _show_install_progress(self, python_exec: str, name_of_library: str, phase: str):
+        self._set_library_status(name_of_library, 'installing', phase=phase)
+
+    def _show_installed_flag(self, python_exec: str, results: dict, log: list):
+        for name_of_library, success in results.items():
+            if success:
+                self._set_library_status(name_of_library, 'installed')
+            else:
+                # What pip said is shown when hovering the failed row
+                self._set_library_status(name_of_library, 'failed', log=log)
+        self.installed.emit()
 
     def _install_library(self, model_index: QModelIndex):
-        name_of_library = model_index.data(DataRole).get('name')
-        idx = self.sorted_matches.index(name_of_library)
-        self.sorted_match_with_install[idx].update({'status': 'installing'})
-        self.source_model.dataChanged.emit(model_index, model_index)
-        self.installer_thread = InstallerLibraries(self.python_exec, name_of_library, model_index)
-        self.installer_thread.finished.connect(self._show_installed_flag)
-        self.installer_thread.finished.connect(self.installer_thread.quit)
-        self.installer_thread.start()
+        item = model_index.data(DataRole)
+        name_of_library = item.get('name')
+        self._set_library_status(name_of_library, 'installing')
+        # Clicks close together are installed by one pip run, of the version shown once its details are in
+        version = item.get('version', "")
+        self.install_queue.enqueue(self.python_exec, name_of_library, "" if version == "UNKNOWN" else version)
 
     def _setup_signals_for_fetching_libraries(self):
         # Threading setup, fetching details of libraries will be in different function
         self.source_model.remove_item.connect(self._remove_garbage_data)
         self.scraper_pypi.list_of_libraries.connect(self.getAllLibraries)
+        self.scraper_pypi.search_index.connect(self._set_search_index)
+        self.scraper_pypi.fuzzy_search.connect(self._set_fuzzy_search)
         self.scraper_pypi.startFetching()
         self.delegate.install_clicked.connect(self._install_library)
 
     def _remove_garbage_data(self, item):
-        self.all_libraries.remove(item)
-        self.filterList()
+        # The model already dropped the row, searching again would throw away the loaded pages
+        self.search_runner.discard(item)
+        if item in self.sorted_matches:
+            self.sorted_matches.remove(item)
 
-    def getAllLibraries(self, libraries: list):
+    def getAllLibraries(self, libraries: PackageNameStore):
         self.all_libraries = libraries
         self.search_bar.setPlaceholderText("Search for libraries to install from the {:,} available libraries".format(len(self.all_libraries)))
         self.filterList()
 
+    def _set_search_index(self, search_index: SearchIndex):
+        self.search_index = search_index
+        self.search_runner.set_index(search_index)
+        self.filterList()
+
+    def _set_fuzzy_search(self, fuzzy_search: FuzzySearch):
+        self.search_runner.set_fuzzy(fuzzy_search)
+        # Queries that found next to nothing can now show suggestions
+        self.filterList()
+
     def openAllEditors(self):
         for row in range(self.source_model.rowCount()):
             index = self.source_model.index(row)
             self.library_list_view.openPersistentEditor(index)
 
     def filterList(self):
-        search_text = self.search_bar.text().lower()
-        if not search_text:
-            self.sorted_matches = self.all_libraries[:50]
-            self.sorted_match_with_install = [{'name': name, 'status': 'install'} for name in self.sorted_matches]
-        else:
-            matches = [
-                item for item in self.all_libraries
-                if search_text in item.lower()
-            ]
-            self.sorted_matches = sorted(
-                matches,
-                key=lambda item: item.lower().find(search_text)
-            )
-            self.sorted_matches = self.sorted_matches[:50]
-            self.sorted_match_with_install = [{'name': name, 'status': 'install'} for name in self.sorted_matches]
+        self.search_timer.stop()
+        if self.search_index is None:
+            return
+        self.search_query = self.search_bar.text().lower()
+        self.page_request = None
+        self.search_runner.search(self.search_query, self.PAGE_SIZE)
+
+    def _fetch_more(self, limit: int):
+        # Only the rows past the ones already shown come back
+        generation = self.search_runner.search(self.search_query, limit, len(self.sorted_matches))
+        self.page_request = (generation, limit)
+
+    def _show_search_results(self, generation: int, matches: list):
+        # A newer query is already queued, its results will replace these anyway
+        if self.search_runner.is_stale(generation):
+            return
+        if self.page_request is not None and self.page_request[0] == generation:
+            self._append_search_results(matches, self.page_request[1])
+            return
+        self.sorted_matches = matches
+        self.sorted_match_with_install = [{'name': name, 'status': 'install'} for name in self.sorted_matches]
 
         self.population_finished.emit()
-        self.fetch_details_timer.start(1000)
         self.library_list_view.scrollToTop()
-        self.source_model.setDataList(self.sorted_match_with_install)
+        self.source_model.setDataList(self.sorted_match_with_install, len(matches) >= self.PAGE_SIZE)
         self.source_model.set_name_to_row()
+
+    def _append_search_results(self, matches: list, limit: int):
+        self.page_request = None
+        self.sorted_matches.extend(matches)
+        # The model holds `sorted_match_with_install` itself, so appending there extends both
+        self.source_model.appendData(
+            [{'name': name, 'status': 'install'} for name in matches],
+            len(self.sorted_matches) >= limit
+        )
+        self.population_finished.emit()
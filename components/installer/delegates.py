@@ -1,8 +1,11 @@
 from PyQt6.QtCore import QEvent, QModelIndex, QPoint, QRect, QSize, Qt, pyqtSignal
 from PyQt6.QtGui import QColor, QPainter, QPainterPath, QPixmap
 from PyQt6.QtWidgets import QStyle, QStyledItemDelegate
+from ..widgets.helper_classes import draw_progress_arc
 from ..widgets.tooltip import InteractiveToolTip
 from .models import DataRole
+from .utils import pip_log_html, pypi_tooltip_html
+from helpers.pip_runner import phase_fraction
 from helpers.utils import resource_path
 
 
@@ -138,6 +141,8 @@ class PyPIitemDelegate(QStyledItemDelegate):
             self._draw_coloured_pixmap(painter, install_rect, QPixmap(
                 resource_path(self.config.get("paths", {}).get("assets", {}).get("images", {}).get("installing", ""))
             ), self.button_color)
+            # How far pip got with this package, around the icon
+            draw_progress_arc(painter, install_rect, phase_fraction(item_data.get('phase', "")), self.button_color)
         elif status_install == "failed":
             self._draw_coloured_pixmap(painter, install_rect, QPixmap(
                 resource_path(self.config.get("paths", {}).get("assets", {}).get("images", {}).get("failed", ""))
@@ -147,15 +152,22 @@ class PyPIitemDelegate(QStyledItemDelegate):
         if event.type() == QEvent.Type.ToolTip: #type: ignore
             # Get the full data dictionary from the model
             item_data = index.data(DataRole)
-            if not item_data or 'description' not in item_data:
+            if item_data and item_data.get('status') == "failed" and item_data.get('log'):
+                target = view.viewport() #type: ignore
+                log = item_data['log']
+                self.tooltip.set_content(lambda: pip_log_html(log))
+                self.tooltip.schedule_show(lambda: pip_log_html(log), event.globalPos() + QPoint(15, 15), target) #type: ignore
+                return True
+            if not item_data or 'details' not in item_data:
                 self.tooltip.hide()
                 return True
 
             if item_data:
                 target = view.viewport() #type: ignore
-                self.tooltip.set_content(item_data['description'])
-                self.tooltip.adjustSize()
-                self.tooltip.schedule_show(item_data['description'], event.globalPos() + QPoint(15, 15), target) #type: ignore
+                # Built when the tooltip actually shows, and only once per package version
+                details = item_data['details']
+                self.tooltip.set_content(lambda: pypi_tooltip_html(details))
+                self.tooltip.schedule_show(lambda: pypi_tooltip_html(details), event.globalPos() + QPoint(15, 15), target) #type: ignore
                 return True
 
         self.tooltip.hide()
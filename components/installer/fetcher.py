@@ -0,0 +1,214 @@
+import asyncio
+import datetime
+import json
+import random
+import ssl
+from urllib.parse import urljoin, urlsplit
+
+from .cache import DetailsCache
+
+DEFAULT_URL = "https://pypi.org/pypi/{}/json"
+# The fields `pypi-fetcher` keeps, so both backends fill the cache the same way
+INFO_FIELDS = {
+    "name": "", "version": "", "summary": "", "author": "", "author_email": "",
+    "classifiers": [], "license": "", "license_file": "", "keywords": "",
+    "maintainer": "", "maintainer_email": "", "project_url": "", "package_urls": [],
+    "provides_extra": [], "requires_dist": [], "requires_python": "",
+    "yanked": False, "yanked_reason": "",
+}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# PyPI redirects names that are not spelled canonically (pyyaml -> PyYAML)
+MAX_REDIRECTS = 5
+
+
+def empty_details() -> dict:
+    """What a package PyPI does not have is answered with, the same as the zero value `pypi-fetcher` sends."""
+    return {
+        "fetched_at": "0001-01-01T00:00:00Z",
+        "info": {key: (list(value) if isinstance(value, list) else value) for key, value in INFO_FIELDS.items()},
+    }
+
+
+def failed_details(error: str) -> dict:
+    """What a fetch that may succeed later is answered with: no details, and why."""
+    return dict(empty_details(), error=error)
+
+
+def details_from_json(data: dict) -> dict:
+    """Trims a PyPI JSON API response down to the cached fields and stamps it."""
+    source = data.get("info") or {}
+    info = {key: source.get(key) if source.get(key) is not None else default for key, default in INFO_FIELDS.items()}
+    prefix = "License :: OSI Approved :: "
+    license = next((c[len(prefix):] for c in info["classifiers"] if c.startswith(prefix)), None)
+    info["license"] = license or info["license"] or "UNKNOWN"
+    return {"fetched_at": datetime.datetime.now(datetime.timezone.utc).isoformat(), "info": info}
+
+
+class HTTPConnectionPool:
+    """
+    A minimal HTTP/1.1 client on asyncio streams that keeps connections alive.
+
+    At most `max_connections` requests are in flight; finished connections go back
+    to an idle list per host and are reused by the next request. Only what the
+    metadata fetch needs is supported: GET, redirects, Content-Length and chunked bodies.
+    """
+    def __init__(self, max_connections: int = 10, timeout: float = 10.0):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = {}
+        self._ssl_context = ssl.create_default_context()
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        return await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self._ssl_context if scheme == "https" else None),
+            self.timeout
+        )
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: dict) -> tuple[bytes, bool]:
+        """Reads the response body, reporting whether the connection can be reused."""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # Trailers, if any, end with an empty line
+                    while (await reader.readline()).strip():
+                        pass
+                    return b"".join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"])), True
+        return await reader.read(), False
+
+    async def _request(self, reader, writer, host: str, path: str) -> tuple[int, dict, bytes, bool]:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: P4cMan\r\n"
+            "Accept: application/json\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before the response")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body, reusable = await self._read_body(reader, headers)
+        keep_alive = reusable and version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return int(status), headers, body, keep_alive
+
+    async def get(self, url: str, max_redirects: int = MAX_REDIRECTS) -> tuple[int, bytes]:
+        """GETs a URL, following up to `max_redirects` redirects, returning the status code and the body."""
+        for _ in range(max_redirects):
+            status, headers, body = await self._get_once(url)
+            if status not in REDIRECT_STATUSES or not headers.get("location"):
+                return status, body
+            url = urljoin(url, headers["location"])
+        status, _, body = await self._get_once(url)
+        return status, body
+
+    async def _get_once(self, url: str) -> tuple[int, dict, bytes]:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        async with self._slots:
+            idle = self._idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                reader, writer = idle.pop() if reused else await self._connect(key)
+                try:
+                    status, headers, body, keep_alive = await asyncio.wait_for(
+                        self._request(reader, writer, parts.hostname, path), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    writer.close()
+                    # The server may have dropped an idle connection, try a fresh one
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep_alive:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, headers, body
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class AsyncDetailsBackend:
+    """
+    Fetches PyPI details in process, as an alternative to the `pypi-fetcher` binary.
+
+    Every package is looked up in the shared `DetailsCache` first; the others are
+    fetched through one `HTTPConnectionPool`, with a per-request timeout and
+    `retries` retries (exponential backoff with jitter) on timeouts, connection
+    errors and any answer but 200 or 404. `on_result(name, details)` is called for
+    every package as soon as it is known: packages PyPI does not have get
+    `empty_details()`, the ones that still failed get `failed_details()`.
+    """
+    def __init__(self, cache: DetailsCache, url: str = DEFAULT_URL, max_connections: int = 10,
+                 timeout: float = 10.0, retries: int = 2, backoff: float = 0.5):
+        self.cache = cache
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._pool: HTTPConnectionPool | None = None
+
+    @property
+    def pool(self) -> HTTPConnectionPool:
+        # Created lazily so it belongs to the loop the backend runs on
+        if self._pool is None:
+            self._pool = HTTPConnectionPool(self.max_connections, self.timeout)
+        return self._pool
+
+    async def fetch_one(self, name: str) -> dict:
+        url = self.url.format(name)
+        error = ""
+        for attempt in range(self.retries + 1):
+            try:
+                status, body = await self.pool.get(url)
+                if status == 200:
+                    details = details_from_json(json.loads(body))
+                    self.cache.put(name, details)
+                    return details
+                if status == 404:
+                    return empty_details()
+                error = f"status {status}"
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                error = repr(e)
+            print(f"Failed to fetch {name} (attempt {attempt + 1}): {error}")
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+        return failed_details(error)
+
+    async def fetch(self, names: list, on_result):
+        async def fetch_and_report(name):
+            details = self.cache.get(name)
+            if details is None:
+                details = await self.fetch_one(name)
+            on_result(name, details)
+
+        await asyncio.gather(*(fetch_and_report(name) for name in names if name))
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
@@ -0,0 +1,70 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from .threads import InstallerLibraries
+from .wheelhouse import Wheelhouse
+
+
+class InstallQueue(QObject):
+    """
+    Installs the packages clicked in the installer, one pip run per environment at a time.
+
+    Clicks are collected until none has come for `batch_window` ms, then every
+    package waiting for an environment goes to a single `InstallerLibraries` run.
+    While an environment's pip is running its new packages wait, they make up the
+    next run once it finishes; pip never runs twice against the same environment.
+    Runs go through the shared `wheelhouse` when there is one.
+
+    Signals:
+        progress (str, str, str): The python path, a package and the pip phase it entered.
+        finished (str, dict, list): Emitted after each run with the python path,
+            whether each of its packages was installed and the last lines pip printed.
+    """
+    progress = pyqtSignal(str, str, str)
+    finished = pyqtSignal(str, dict, list)
+
+    def __init__(self, batch_window: int = 300, wheelhouse: Wheelhouse | None = None, parent = None):
+        super().__init__(parent)
+        self.wheelhouse = wheelhouse
+        self.pending: dict[str, list[str]] = {}
+        # The version shown for each queued package, the one installed from the wheelhouse
+        self.versions: dict[str, dict[str, str]] = {}
+        self.running: dict[str, InstallerLibraries] = {}
+        self.batch_timer = QTimer(self)
+        self.batch_timer.setInterval(batch_window)
+        self.batch_timer.setSingleShot(True)
+        self.batch_timer.timeout.connect(self._dispatch)
+
+    def enqueue(self, python_exec: str, name: str, version: str = ""):
+        if self.is_queued(python_exec, name):
+            return
+        self.pending.setdefault(python_exec, []).append(name)
+        if version:
+            self.versions.setdefault(python_exec, {})[name] = version
+        self.batch_timer.start()
+
+    def is_queued(self, python_exec: str, name: str) -> bool:
+        """True while the package waits for, or is in, a pip run of that environment."""
+        running = self.running.get(python_exec)
+        return name in self.pending.get(python_exec, []) or (running is not None and name in running.library_names)
+
+    def _dispatch(self):
+        for python_exec in list(self.pending):
+            if python_exec in self.running:
+                continue
+            names = self.pending.pop(python_exec)
+            versions = self.versions.pop(python_exec, {})
+            installer_thread = InstallerLibraries(python_exec, names, self.wheelhouse, versions)
+            installer_thread.progress.connect(self.progress)
+            installer_thread.finished.connect(self._on_finished)
+            self.running[python_exec] = installer_thread
+            installer_thread.start()
+
+    def _on_finished(self, python_exec: str, results: dict, log: list):
+        installer_thread = self.running.pop(python_exec, None)
+        if installer_thread is not None:
+            # `finished` is the last thing run() does, the thread is gone right after
+            installer_thread.wait()
+            installer_thread.deleteLater()
+        self.finished.emit(python_exec, results, log)
+        if self.pending.get(python_exec):
+            self._dispatch()
@@ -1,5 +1,4 @@
 from PyQt6.QtCore import QAbstractListModel, QModelIndex, QVariant, Qt, pyqtSignal
-from .utils import format_pypi_tooltip_html
 
 DataRole = Qt.ItemDataRole.UserRole + 1
 
@@ -10,21 +9,31 @@ class LibraryListModel(QAbstractListModel):
 
     This model stores a list of dictionaries, where each dictionary represents
     a PyPI package and can include details like 'name', 'version', 'status'
-    (e.g., 'install', 'installed', 'installing', 'failed'), and a 'description'
-    (which is pre-formatted HTML for a tooltip).
+    (e.g., 'install', 'installed', 'installing', 'failed'), and 'details'
+    (the fetched PyPI data, turned into tooltip HTML only when it is hovered).
 
     It provides data for display and custom roles, handles updates to library
     details fetched from an external source, and signals when items are removed.
 
+    Rows are loaded in pages: while `has_more` is set, the view calls `fetchMore`
+    when it is scrolled to the bottom, and the model asks for `page_size` more rows
+    through `fetch_more_requested`. The rows arrive later through `appendData`,
+    so only what has been scrolled into reach is ever held.
+
     Signals:
         remove_item (str): Emitted with the name of the library that has been removed from the model (e.g., if its version is "UNKNOWN").
+        fetch_more_requested (int): Emitted with the total number of rows the view wants to show.
     """
     remove_item = pyqtSignal(str)
+    fetch_more_requested = pyqtSignal(int)
 
-    def __init__(self, data = None, parent = None):
+    def __init__(self, data = None, parent = None, page_size: int = 50):
         super().__init__(parent)
         self._data = data if data else []
         self.name_to_row = {}
+        self.page_size = page_size
+        self.has_more = False
+        self._fetching = False
 
     def set_name_to_row(self):
         self.name_to_row = {data['name']: i for i, data in enumerate(self._data)}
@@ -49,18 +58,45 @@ class LibraryListModel(QAbstractListModel):
             Qt.ItemFlag.ItemIsSelectable |
             Qt.ItemFlag.ItemIsEnabled)
 
-    def setDataList(self, data):
+    def setDataList(self, data, has_more: bool = False):
         self.beginResetModel()
         self._data = data
+        self.has_more = has_more
+        self._fetching = False
         self.endResetModel()
 
+    def appendData(self, data, has_more: bool = False):
+        """Appends a page of rows fetched after `fetch_more_requested`."""
+        self._fetching = False
+        self.has_more = has_more
+        if not data:
+            return
+        first = len(self._data)
+        self.beginInsertRows(QModelIndex(), first, first + len(data) - 1)
+        self._data.extend(data)
+        self.name_to_row.update({item['name']: first + i for i, item in enumerate(data)})
+        self.endInsertRows()
+
+    def canFetchMore(self, parent = QModelIndex()):
+        return self.has_more and not self._fetching and not parent.isValid()
+
+    def fetchMore(self, parent = QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._fetching = True
+        self.fetch_more_requested.emit(len(self._data) + self.page_size)
+
     def deleteUpdatedData(self, indexes):
-        for idx, item in indexes.items():
-            item_to_remove = [index for index, data in enumerate(self._data) if data['name'] == item]
-            self._data.pop(item_to_remove[0])
+        for item in indexes.values():
+            row = next((index for index, data in enumerate(self._data) if data['name'] == item), -1)
+            if row == -1:
+                continue
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self._data.pop(row)
+            self.endRemoveRows()
             self.remove_item.emit(item)
-            model_index = self.index(idx, 0, QModelIndex())
-            self.dataChanged.emit(model_index, model_index)
+        if indexes:
+            self.set_name_to_row()
 
     def updateData(self, data_dict: dict):
         # When the API has emitted some data related to the library
@@ -69,10 +105,9 @@ class LibraryListModel(QAbstractListModel):
             index_number = self.name_to_row.get(item, -1)
             if index_number == -1:
                 continue
-            tootlip = format_pypi_tooltip_html(item_data, 'figtree')
             if item_data.get('info', {}).get('summary') == "":
                 indexes_to_remove[index_number] =  item
-            self._data[index_number].update({'description': tootlip})
+            self._data[index_number].update({'details': item_data})
             self._data[index_number].update({'version': item_data['info']['version']})
             idx = self.index(index_number, 0, QModelIndex())
             self.dataChanged.emit(idx, idx)
@@ -0,0 +1,158 @@
+import time
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWidgets import QListView
+
+from .cache import DetailsCache
+from .models import DataRole, LibraryListModel
+from .threads import AsyncDetailsFetcher, PyPiFetcherDaemon
+
+
+class DetailsPrefetcher(QObject):
+    """
+    Fetches PyPI details for the installer rows the user can actually see.
+
+    Rows on screen are requested first, then the rows around them (half a screen
+    on either side) by distance from the viewport. One batch is waited on at a time;
+    a batch whose rows have all scrolled away stops being waited on (what it still
+    brings back is kept), and rows that were only queued are simply dropped the next
+    time the wanted rows are worked out. Batches go to the fetcher (the resident
+    `pypi-fetcher` or the asyncio backend), which reports each package as soon as
+    it arrives.
+
+    Once the user has not scrolled or searched for `idle_interval` ms, the window is
+    extended by a page below the viewport, loading that page into the model first
+    if it is not there yet.
+
+    Rows are first looked up in the `DetailsCache` the fetcher writes to, one small
+    file per package, so details that are still fresh never go back to the fetcher.
+
+    Answers carrying an `error` (timeouts, 5xx after the fetcher's own retries) leave
+    the row alone; the package is asked for again once `retry_delay` ms have passed.
+    """
+    def __init__(self, view: QListView, model: LibraryListModel, fetcher: PyPiFetcherDaemon | AsyncDetailsFetcher,
+                 cache: DetailsCache, batch_size: int = 20, idle_interval: int = 1000, retry_delay: int = 30000):
+        super().__init__(view)
+        self.view = view
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = cache
+        self.fetcher = fetcher
+        self.fetcher.package_fetched.connect(self._on_fetched)
+        self.fetcher.request_finished.connect(self._on_request_finished)
+        self._request_id: int | None = None
+        self._in_flight = set()
+        self._failed = set()
+        self.retry_delay = retry_delay
+        # Names whose fetch failed, with the monotonic time they can be asked for again
+        self._retry_at = {}
+        self._idle = False
+
+        # Scrolling fires many times a second, the wanted rows are worked out once it settles
+        self.schedule_timer = QTimer(self)
+        self.schedule_timer.setInterval(100)
+        self.schedule_timer.setSingleShot(True)
+        self.schedule_timer.timeout.connect(self.schedule)
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(idle_interval)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self._on_idle)
+
+        self.view.verticalScrollBar().valueChanged.connect(self._on_activity)
+        self.model.modelReset.connect(self._on_activity)
+        self.model.rowsInserted.connect(self.schedule_timer.start)
+
+    def _on_activity(self):
+        self._idle = False
+        self.idle_timer.start()
+        self.schedule_timer.start()
+
+    def _on_idle(self):
+        self._idle = True
+        self.schedule()
+
+    def _visible_rows(self) -> tuple[int, int]:
+        count = self.model.rowCount()
+        rect = self.view.viewport().rect()
+        first = self.view.indexAt(rect.topLeft())
+        last = self.view.indexAt(rect.bottomLeft())
+        first_row = first.row() if first.isValid() else 0
+        # Past the last row, or the view has not been laid out yet
+        last_row = last.row() if last.isValid() else min(count, first_row + self.model.page_size) - 1
+        return first_row, last_row
+
+    def _wanted_names(self) -> list:
+        """Names still missing details around the viewport, closest to it first."""
+        count = self.model.rowCount()
+        if count == 0:
+            return []
+        first, last = self._visible_rows()
+        margin = max(1, (last - first + 1) // 2)
+        below = last + margin + (self.model.page_size if self._idle else 0)
+
+        def distance(row):
+            return first - row if row < first else max(0, row - last)
+
+        names = []
+        now = time.monotonic()
+        for row in sorted(range(max(0, first - margin), min(count, below + 1)), key=distance):
+            item = self.model.index(row).data(DataRole)
+            name = item.get('name')
+            if 'version' not in item and name not in self._failed and self._retry_at.get(name, 0) <= now:
+                names.append(name)
+        return names
+
+    def schedule(self):
+        wanted = self._wanted_names()
+
+        cached = {}
+        for name in wanted:
+            data = self.cache.get(name)
+            if data is not None:
+                cached[name] = data
+        if cached:
+            self.model.updateData(cached)
+            wanted = [name for name in wanted if name not in cached]
+
+        if self._request_id is not None:
+            if self._in_flight.intersection(wanted):
+                return
+            # Everything it was asked for scrolled away, the next batch goes first
+            self._request_id = None
+
+        if not wanted:
+            # Everything around the viewport is filled in, bring the next page in while idle
+            first, last = self._visible_rows()
+            if self._idle and self.model.rowCount() <= last + self.model.page_size and self.model.canFetchMore():
+                self.model.fetchMore()
+            return
+
+        batch = wanted[:self.batch_size]
+        self._in_flight = set(batch)
+        self._request_id = self.fetcher.request(batch)
+
+    def _on_fetched(self, request_id: int, name: str, data: dict):
+        # Results of abandoned batches still go in, the rows may be around again
+        if request_id == self._request_id:
+            self._in_flight.discard(name)
+        if data.get('error'):
+            # Not an answer about the package, the row stays until a retry gets one
+            self._retry_at[name] = time.monotonic() + self.retry_delay / 1000
+            QTimer.singleShot(self.retry_delay, self.schedule_timer.start)
+            return
+        self._retry_at.pop(name, None)
+        self.model.updateData({name: data})
+
+    def _on_request_finished(self, request_id: int):
+        if request_id != self._request_id:
+            return
+        # Names the fetcher never answered are not asked for again this session
+        self._failed.update(self._in_flight)
+        self._in_flight = set()
+        self._request_id = None
+        self.schedule_timer.start()
+
+    def stop(self):
+        self.schedule_timer.stop()
+        self.idle_timer.stop()
+        self.fetcher.stop()
@@ -0,0 +1,304 @@
+import heapq
+from collections import OrderedDict
+from itertools import islice
+from .store import DeletionIndex, PackageNameStore
+from helpers.utils import normalize_name
+
+
+def linear_search(names, query: str, limit: int | None = 50) -> list:
+    """
+    Scans every name for the query, the way the installer searched before the index existed.
+
+    Matches are ranked by the position of the query inside the lowercased name.
+
+    Args:
+        names (list): Package names to scan.
+        query (str): Text typed in the search bar.
+        limit (int | None): Maximum number of results, None for every match.
+
+    Returns:
+        list: Matching names, best match first.
+    """
+    query = query.lower()
+    matches = [item for item in names if query in item.lower()]
+    matches = sorted(matches, key=lambda item: item.lower().find(query))
+    return matches if limit is None else matches[:limit]
+
+
+class SearchIndex:
+    """
+    Substring search over the packed package name store.
+
+    The store keeps the names normalized and sorted and carries trigram postings,
+    so the index itself only remembers the names hidden with `discard`:
+    - names starting with the query are one contiguous range of the store, found with a bisect
+    - other matches of three or more letters come from the smallest trigram posting
+    - shorter queries scan the name blob with `find`, stopping as soon as the best ranks are filled
+
+    Results are ranked by the position of the query inside the name, then alphabetically,
+    which matches the ordering of the old linear scan.
+    """
+    def __init__(self, store: PackageNameStore):
+        self.names = store
+        self._removed = set()
+
+    def __len__(self):
+        return len(self.names) - len(self._removed)
+
+    def discard(self, name: str):
+        """Hides a name from future results without touching the store."""
+        idx = self.names.index(name)
+        if idx != -1:
+            self._removed.add(idx)
+
+    def _trigram_matches(self, query: bytes):
+        """Yields (position, id) for every name containing the query at position 1 or later."""
+        smallest = None
+        for i in range(len(query) - 2):
+            ids = self.names.postings(query[i:i + 3])
+            if len(ids) == 0:
+                return
+            if smallest is None or len(ids) < len(smallest):
+                smallest = ids
+        for idx in smallest or ():
+            position = self.names.name_bytes(idx).find(query)
+            if position > 0:
+                yield position, idx
+
+    def _blob_matches(self, query: bytes, needed: int | None):
+        """Yields (position, id) for the first occurrence of the query in each name, position 1 or later."""
+        store = self.names
+        best_rank_hits = 0
+        blob_position = store.find(query)
+        while blob_position != -1:
+            idx = store.line_of(blob_position)
+            line_start, next_line = store.span(idx)
+            position = blob_position - line_start
+            if position > 0:
+                yield position, idx
+                # The blob is alphabetical, so once `needed` names matched at
+                # position 1 nothing later in the blob can outrank them
+                best_rank_hits += position == 1
+                if needed is not None and best_rank_hits >= needed:
+                    return
+            blob_position = store.find(query, next_line)
+
+    def search_ids(self, query: str, limit: int | None = 50) -> list:
+        """
+        Returns the ids of the names containing the query, best match first.
+
+        Args:
+            query (str): Text typed in the search bar, normalized the same way as the names.
+            limit (int | None): Maximum number of results, None for every match.
+        """
+        query_bytes = normalize_name(query.strip()).encode()
+        removed = self._removed
+        if not query_bytes:
+            return list(islice((idx for idx in range(len(self.names)) if idx not in removed), limit))
+
+        # Names starting with the query always rank first, and the store already
+        # holds them in alphabetical order
+        start, end = self.names.prefix_range(query_bytes)
+        prefixed = list(islice((idx for idx in range(start, end) if idx not in removed), limit))
+        if limit is not None and len(prefixed) >= limit:
+            return prefixed
+
+        needed = None if limit is None else limit - len(prefixed)
+        if len(query_bytes) >= 3:
+            matches = self._trigram_matches(query_bytes)
+        else:
+            matches = self._blob_matches(query_bytes, needed)
+        matches = (match for match in matches if match[1] not in removed)
+        ranked = sorted(matches) if needed is None else heapq.nsmallest(needed, matches)
+        return prefixed + [idx for _, idx in ranked]
+
+    def search(self, query: str, limit: int | None = 50) -> list:
+        """Same as `search_ids`, but returns the names themselves."""
+        return [self.names[idx] for idx in self.search_ids(query, limit)]
+
+
+def edit_distance(a: bytes, b: bytes, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+
+    Only the diagonal band of width `max_distance` is computed, and the computation
+    gives up as soon as the distance is known to exceed `max_distance`, returning
+    `max_distance + 1` in that case.
+    """
+    # Typos rarely sit at both ends, so the shared prefix and suffix are skipped first
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    a, b = a[start:], b[start:]
+    end = 0
+    while end < len(a) and end < len(b) and a[-1 - end] == b[-1 - end]:
+        end += 1
+    if end:
+        a, b = a[:-end], b[:-end]
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if not a or not b:
+        return max(len(a), len(b))
+
+    beyond = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else beyond for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [beyond] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return beyond
+        previous_previous, previous = previous, current
+    return min(previous[-1], beyond)
+
+
+class FuzzySearch:
+    """
+    Typo tolerant lookup over the store, backed by a `DeletionIndex`.
+
+    The deletion index narrows the list down to names whose prefix is one edit away
+    from the query's prefix; those are checked with `edit_distance` against the whole
+    query and ranked by distance, then alphabetically. Names hidden from the
+    `SearchIndex` are hidden here too.
+    """
+    def __init__(self, index: SearchIndex, deletions: DeletionIndex, max_distance: int = 2):
+        self.index = index
+        self.deletions = deletions
+        self.max_distance = max_distance
+
+    def search_ids(self, query: str, limit: int = 10) -> list:
+        query_bytes = normalize_name(query.strip()).encode()
+        if len(query_bytes) < 3:
+            return []
+        store = self.index.names
+        removed = self.index._removed
+        ranked = []
+        for idx in self.deletions.candidates(query_bytes):
+            if idx in removed:
+                continue
+            start, end = store.span(idx)
+            # Cheap length check on the offsets before decoding anything
+            if abs(end - start - 1 - len(query_bytes)) > self.max_distance:
+                continue
+            distance = edit_distance(query_bytes, store.name_bytes(idx), self.max_distance)
+            if distance <= self.max_distance:
+                ranked.append((distance, idx))
+        return [idx for _, idx in heapq.nsmallest(limit, ranked)]
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """Same as `search_ids`, but returns the names themselves."""
+        return [self.index.names[idx] for idx in self.search_ids(query, limit)]
+
+
+class IncrementalSearch:
+    """
+    Answers successive queries typed in the search bar on top of a `SearchIndex`.
+
+    - results of recent queries are kept in an LRU, so deleting a letter is free
+    - the full match set of the last query is kept while it is small enough, and a
+      query extending it only re-checks those names instead of searching the index
+    - `is_stale` is polled while refining, so a query that has been superseded stops early
+    - when fewer than `fuzzy_threshold` names contain the query, the closest names by
+      edit distance are appended, once a `FuzzySearch` has been set
+
+    Not thread safe: the search worker is the only one calling it.
+    """
+    def __init__(self, index: SearchIndex, cache_size: int = 64, refine_limit: int = 20000,
+                 fuzzy_threshold: int = 5):
+        self.index = index
+        self.fuzzy: FuzzySearch | None = None
+        self.fuzzy_threshold = fuzzy_threshold
+        self.cache_size = cache_size
+        self.refine_limit = refine_limit
+        self._cache = OrderedDict()
+        self._last_query = b""
+        self._last_matches = None
+
+    def set_fuzzy(self, fuzzy: FuzzySearch):
+        self.fuzzy = fuzzy
+        self._cache.clear()
+
+    def discard(self, name: str):
+        """Hides a name, dropping every cached result it might be part of."""
+        self.index.discard(name)
+        self._cache.clear()
+        self._last_query, self._last_matches = b"", None
+
+    def _all_matches(self, query: bytes) -> list:
+        """Every (position, id) match of the query, prefixed names included."""
+        start, end = self.index.names.prefix_range(query)
+        matches = [(0, idx) for idx in range(start, end)]
+        matches.extend(self.index._trigram_matches(query))
+        return matches
+
+    def _refine(self, query: bytes, is_stale) -> list | None:
+        """Narrows the previous match set down to the names containing the longer query."""
+        name_bytes = self.index.names.name_bytes
+        matches = []
+        for checked, (_, idx) in enumerate(self._last_matches or ()):
+            if checked % 4096 == 0 and is_stale():
+                return None
+            position = name_bytes(idx).find(query)
+            if position != -1:
+                matches.append((position, idx))
+        return matches
+
+    def search_ids(self, query: str, limit: int = 50, is_stale=lambda: False) -> list | None:
+        """
+        Same ranking as `SearchIndex.search_ids`.
+
+        Returns:
+            list | None: The ids, or None when `is_stale` reported the query as superseded.
+        """
+        query_bytes = normalize_name(query.strip()).encode()
+        key = (query_bytes, limit)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        removed = self.index._removed
+        if self._last_matches is not None and self._last_query and self._last_query in query_bytes:
+            matches = self._refine(query_bytes, is_stale)
+            if matches is None:
+                return None
+        elif len(query_bytes) >= 3:
+            matches = self._all_matches(query_bytes)
+        else:
+            # Short queries match too much to keep, the index stops at the best ranks
+            matches = None
+            result = self.index.search_ids(query, limit)
+
+        if matches is not None:
+            if len(matches) <= self.refine_limit:
+                self._last_query, self._last_matches = query_bytes, matches
+            else:
+                self._last_query, self._last_matches = b"", None
+            matches = (match for match in matches if match[1] not in removed)
+            result = [idx for _, idx in heapq.nsmallest(limit, matches)]
+        else:
+            self._last_query, self._last_matches = b"", None
+
+        if self.fuzzy is not None and len(result) < min(self.fuzzy_threshold, limit):
+            found = set(result)
+            suggestions = self.fuzzy.search_ids(query, limit - len(result))
+            result = result + [idx for idx in suggestions if idx not in found]
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def search(self, query: str, limit: int = 50, is_stale=lambda: False, offset: int = 0) -> list | None:
+        """Same as `search_ids`, but returns the names themselves, skipping the first `offset`."""
+        ids = self.search_ids(query, limit, is_stale)
+        return None if ids is None else [self.index.names[idx] for idx in ids[offset:]]
@@ -0,0 +1,254 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from helpers.utils import normalize_name
+
+MAGIC = b"P4CNAMES"
+VERSION = 1
+# magic, version, name count, blob size, trigram count, posting count (padded to 32 bytes)
+HEADER = struct.Struct("<8sIIIII4x")
+
+def _trigram_key(name: bytes, i: int) -> int:
+    return (name[i] << 16) | (name[i + 1] << 8) | name[i + 2]
+
+
+def _u32_array(values) -> array:
+    packed = array('I', values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed
+
+
+def _u32_view(view: memoryview, position: int, length: int):
+    """Reads `length` little endian uint32 starting at `position`, returning them and the end position."""
+    end = position + 4 * length
+    values = view[position:end].cast('I')
+    if sys.byteorder != "little":
+        values = _u32_array(values)
+    return values, end
+
+
+def write_store(file_path: str, names):
+    """
+    Writes the package names to a packed, memory-mappable file.
+
+    Layout (little endian, every section aligned to 4 bytes):
+    - header
+    - offsets: count + 1 uint32, where name i is blob[offsets[i]:offsets[i + 1] - 1]
+    - trigram keys: sorted uint32 keys made of three UTF-8 bytes
+    - trigram starts: trigram count + 1 uint32 positions in the postings
+    - postings: uint32 name ids, ascending within every trigram
+    - blob: the normalized, sorted names, each followed by a newline
+
+    The file is written next to the destination and swapped in with `os.replace`,
+    so readers never see a half written store.
+    """
+    encoded = sorted({normalize_name(name).encode() for name in names if name.strip()})
+
+    offsets = [0]
+    postings = {}
+    for idx, name in enumerate(encoded):
+        offsets.append(offsets[-1] + len(name) + 1)
+        for key in {_trigram_key(name, i) for i in range(len(name) - 2)}:
+            ids = postings.get(key)
+            if ids is None:
+                postings[key] = ids = array('I')
+            ids.append(idx)
+
+    keys = sorted(postings)
+    starts = [0]
+    for key in keys:
+        starts.append(starts[-1] + len(postings[key]))
+    blob = b"\n".join(encoded) + b"\n" if encoded else b""
+
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(encoded), len(blob), len(keys), starts[-1]))
+        file.write(_u32_array(offsets).tobytes())
+        file.write(_u32_array(keys).tobytes())
+        file.write(_u32_array(starts).tobytes())
+        for key in keys:
+            file.write(_u32_array(postings[key]).tobytes())
+        file.write(blob)
+    os.replace(temp_path, file_path)
+
+
+class PackageNameStore:
+    """
+    A read-only, memory-mapped view of the packed PyPI package name list.
+
+    Behaves like a sorted sequence of normalized names: `len`, indexing and iteration
+    work, but names are only decoded when they are asked for. The trigram postings
+    written by `write_store` are exposed for the search index, so nothing has to be
+    built in memory at startup.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, blob_size, trigram_count, posting_count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{file_path} is not a package name store")
+
+        self._view = memoryview(self._mmap)
+        position = HEADER.size
+        self._offsets, position = _u32_view(self._view, position, count + 1)
+        self._keys, position = _u32_view(self._view, position, trigram_count)
+        self._starts, position = _u32_view(self._view, position, trigram_count + 1)
+        self._postings, position = _u32_view(self._view, position, posting_count)
+        self.blob = self._view[position:position + blob_size]
+        self._blob_start = position
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._count))]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("package name store index out of range")
+        return self.name_bytes(idx).decode()
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self.name_bytes(idx).decode()
+
+    def __contains__(self, name):
+        return self.index(name) != -1
+
+    def name_bytes(self, idx: int) -> bytes:
+        return bytes(self.blob[self._offsets[idx]:self._offsets[idx + 1] - 1])
+
+    def index(self, name: str) -> int:
+        """Returns the id of a name (normalized before the lookup), or -1 if it is not stored."""
+        encoded = normalize_name(name).encode()
+        idx = bisect_left(range(self._count), encoded, key=self.name_bytes)
+        if idx < self._count and self.name_bytes(idx) == encoded:
+            return idx
+        return -1
+
+    def prefix_range(self, prefix: bytes) -> tuple[int, int]:
+        """Ids of the names starting with the prefix, as a half open range."""
+        start = bisect_left(range(self._count), prefix, key=self.name_bytes)
+        end = bisect_left(range(self._count), prefix + b"\xff", lo=start, key=self.name_bytes)
+        return start, end
+
+    def find(self, sub: bytes, start: int = 0) -> int:
+        """Finds bytes in the name blob, returning their blob position or -1."""
+        position = self._mmap.find(sub, self._blob_start + start, self._blob_start + len(self.blob))
+        return position - self._blob_start if position != -1 else -1
+
+    def line_of(self, blob_position: int) -> int:
+        """Returns the id of the name covering a position in the blob."""
+        return bisect_right(self._offsets, blob_position) - 1
+
+    def span(self, idx: int) -> tuple[int, int]:
+        """Blob positions where the name starts and where the next one starts."""
+        return self._offsets[idx], self._offsets[idx + 1]
+
+    def postings(self, trigram: bytes):
+        """Ids of the names containing the three byte trigram, in ascending order."""
+        key = _trigram_key(trigram, 0)
+        position = bisect_left(self._keys, key)
+        if position == len(self._keys) or self._keys[position] != key:
+            return ()
+        return self._postings[self._starts[position]:self._starts[position + 1]]
+
+
+FUZZY_MAGIC = b"P4CFUZZY"
+# magic, version, name count, prefix length, key count, posting count (padded to 32 bytes)
+FUZZY_HEADER = struct.Struct("<8sIIIII4x")
+
+
+def deletion_variants(name: bytes, prefix_length: int = 10) -> set:
+    """The prefix of a name and every string made by deleting one byte from it."""
+    prefix = name[:prefix_length]
+    variants = {prefix}
+    for i in range(len(prefix)):
+        variants.add(prefix[:i] + prefix[i + 1:])
+    return variants
+
+
+def write_deletion_index(file_path: str, store: PackageNameStore, prefix_length: int = 10):
+    """
+    Writes a SymSpell style deletion index for the names of a store.
+
+    Every name is filed under the CRC32 of its first `prefix_length` bytes and of each
+    string made by deleting one of those bytes. Two names whose prefixes are one edit
+    (or one transposition) apart always share a key, collisions only add candidates.
+
+    Layout (little endian, every section aligned to 4 bytes):
+    - header
+    - keys: sorted uint32 CRC32 values
+    - starts: key count + 1 uint32 positions in the postings
+    - postings: uint32 name ids, ascending within every key
+
+    The pairs are sorted in 256 buckets of packed (key, id) integers, so building it for
+    the whole PyPI list never needs more than a few arrays of machine integers.
+    """
+    buckets = [array('Q') for _ in range(256)]
+    for idx in range(len(store)):
+        for variant in deletion_variants(store.name_bytes(idx), prefix_length):
+            key = zlib.crc32(variant)
+            buckets[key >> 24].append((key << 32) | idx)
+
+    keys, starts, postings = array('I'), array('I'), array('I')
+    for i in range(len(buckets)):
+        previous = -1
+        for pair in sorted(buckets[i]):
+            key = pair >> 32
+            if key != previous:
+                keys.append(key)
+                starts.append(len(postings))
+                previous = key
+            postings.append(pair & 0xFFFFFFFF)
+        buckets[i] = None
+    starts.append(len(postings))
+
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(FUZZY_HEADER.pack(FUZZY_MAGIC, VERSION, len(store), prefix_length, len(keys), len(postings)))
+        file.write(_u32_array(keys).tobytes())
+        file.write(_u32_array(starts).tobytes())
+        file.write(_u32_array(postings).tobytes())
+    os.replace(temp_path, file_path)
+
+
+class DeletionIndex:
+    """A read-only, memory-mapped view of the index written by `write_deletion_index`."""
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, prefix_length, key_count, posting_count = FUZZY_HEADER.unpack_from(self._mmap)
+        if magic != FUZZY_MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{file_path} is not a deletion index")
+
+        self._view = memoryview(self._mmap)
+        self.count = count
+        self.prefix_length = prefix_length
+        position = FUZZY_HEADER.size
+        self._keys, position = _u32_view(self._view, position, key_count)
+        self._starts, position = _u32_view(self._view, position, key_count + 1)
+        self._postings, position = _u32_view(self._view, position, posting_count)
+
+    def candidates(self, query: bytes) -> set:
+        """Ids of the names whose prefix is at most one edit away from the query's prefix."""
+        ids = set()
+        for variant in deletion_variants(query, self.prefix_length):
+            key = zlib.crc32(variant)
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                ids.update(self._postings[self._starts[position]:self._starts[position + 1]])
+        return ids
@@ -1,113 +1,442 @@
+import asyncio
 import json
-import subprocess
-from .utils import load_data
-from PyQt6.QtCore import QModelIndex, QObject, QThread, pyqtSignal
+import threading
+import time
+from collections import deque
+from .utils import (
+    SIMPLE_INDEX_URL, RefreshCancelled, load_data, load_deletion_index, load_index_meta, refresh_package_list,
+    remove_old_stores
+)
+from .search import FuzzySearch, IncrementalSearch, SearchIndex
+from .cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from .fetcher import AsyncDetailsBackend
+from .wheelhouse import Wheelhouse
+from helpers.pip_runner import DEFAULT_LOG_LINES, PipProgress, run_pip
+from PyQt6.QtCore import QObject, QProcess, QThread, QTimer, pyqtSignal, pyqtSlot
 
 
-class GetAllLibraryFromPyPI(QThread):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-
-class GettingInstallerLibraryDetails(QThread):
-    """
-    A QThread subclass that fetches details for a list of Python libraries
-    using an external Go executable.
-
-    It executes the Go program with the provided list of libraries, captures
-    its JSON output, and emits the parsed dictionary result via the
-    `finished` signal.
-    """
-    finished = pyqtSignal(dict)
-    def __init__(self, go_executable, list_of_libraries, parent=None):
-        super().__init__(parent)
-        self.go_executable = go_executable
-        self.list_of_libraries = list_of_libraries
-
-    def run(self):
-        if self.list_of_libraries:
-            result = subprocess.run([self.go_executable, *self.list_of_libraries], capture_output=True, text=True)
-            if result.stderr:
-                print(result.stderr)
-            try:
-                data = json.loads(result.stdout)
-                if isinstance(data, dict):
-                    self.finished.emit(data)
-            except Exception as e:
-                self.finished.emit({})
-                print(e)
-                print(result.stdout)
-        else:
-            self.finished.emit({})
-
 class InstallerLibraries(QThread):
     """
-    A QThread subclass for installing a single Python library using pip
+    A QThread subclass for installing Python libraries using pip
     in a separate background thread.
 
-    It executes the 'pip install' command with the specified Python executable
-    and library name, capturing the output and emitting a signal upon completion
-    indicating success or failure.
+    All the libraries are installed by one 'pip install', so pip starts and
+    resolves dependencies once. pip installs nothing when any of them fails, so
+    after a failed batch each library is installed on its own to tell which ones
+    were at fault. `finished` carries the python path and whether each library
+    was installed.
+
+    pip's output is read line by line while it runs: `progress` follows each
+    library through collecting, downloading, building and installing, and the
+    last lines are kept in `log`, which `finished` carries too.
+
+    With a `wheelhouse`, libraries are installed from it alone when it has every
+    wheel they need, and only otherwise downloaded or built into it first. The
+    wheelhouse alone is only tried with every library pinned to the version in
+    `versions` (the one the installer shows), so a wheel cached earlier never
+    stands in for a newer release.
     """
-    finished = pyqtSignal(int, QModelIndex)
-    def __init__(self ,python_exec_path, library_name, model_index: QModelIndex) -> None:
+    finished = pyqtSignal(str, dict, list)
+    progress = pyqtSignal(str, str, str) # (python_path, library_name, phase)
+    def __init__(self, python_exec_path, library_names: list, wheelhouse: Wheelhouse | None = None,
+                 versions: dict | None = None) -> None:
         super().__init__()
         self.python_exec_path = python_exec_path
-        self.library_name = library_name
-        self.model_index = model_index
+        self.library_names = list(library_names)
+        self.wheelhouse = wheelhouse
+        self.versions = versions or {}
+        self.log = deque(maxlen=DEFAULT_LOG_LINES)
 
-    def run(self):
-        try:
-            # subprocess.run is a blocking call, which is now safely in the background
-            result = subprocess.run(
-                [self.python_exec_path, "-m", "pip", "install", self.library_name],
-                capture_output=True,
-                text=True,
-                check=False # Don't raise an exception on non-zero exit codes
-            )
-
-            print("---STDERR---")
-            if result.stderr:
-                print(result.stderr)
-
-            if result.returncode == 0:
-                self.finished.emit(1, self.model_index)
-            else:
-                self.finished.emit(-1, self.model_index)
+    def _run_pip(self, args: list, pip_progress: PipProgress) -> tuple[int, list]:
+        def on_line(line: str):
+            for name, phase in pip_progress.feed(line).items():
+                self.progress.emit(self.python_exec_path, name, phase)
 
-        except Exception as e:
-            print(f"An exception occurred: {e}")
-            self.finished.emit(-1, self.model_index) # Use -1 for exceptions
+        return_code, log = run_pip(self.python_exec_path, args, on_line)
+        self.log.extend(log)
+        return return_code, list(log)
+
+    def _pip_install(self, library_names: list) -> bool:
+        pip_progress = PipProgress(library_names)
+        if self.wheelhouse is None:
+            return self._run_pip(["install", "--progress-bar", "off", *library_names], pip_progress)[0] == 0
+
+        requirements = [
+            f"{name}=={self.versions[name]}" if self.versions.get(name) else name for name in library_names
+        ]
+        return_code, log = -1, []
+        if all(self.versions.get(name) for name in library_names):
+            return_code, log = self._run_pip(self.wheelhouse.install_args(requirements), pip_progress)
+        self.wheelhouse.record(len(library_names), hit=return_code == 0)
+        if return_code != 0:
+            # Something is not in the wheelhouse yet, fetched into it from the index
+            if self._run_pip(self.wheelhouse.fill_args(requirements), pip_progress)[0] == 0:
+                return_code, log = self._run_pip(self.wheelhouse.install_args(requirements), pip_progress)
+                self.wheelhouse.evict()
+            if return_code != 0:
+                return self._run_pip(["install", "--progress-bar", "off", *library_names], pip_progress)[0] == 0
+        self.wheelhouse.touch_used(log)
+        return True
+
+    def run(self):
+        if self._pip_install(self.library_names):
+            results = {name: True for name in self.library_names}
+        elif len(self.library_names) > 1:
+            results = {name: self._pip_install([name]) for name in self.library_names}
+        else:
+            results = {name: False for name in self.library_names}
+        self.finished.emit(self.python_exec_path, results, list(self.log))
 
 class PyPiRunner(QObject):
-    """This class is for fetching libraries for PyPI"""
-    list_of_libraries = pyqtSignal(list)
-    def __init__(self, appName: str = "P4cMan", fileName: str = "library_list.txt"):
+    """
+    This class is for fetching libraries for PyPI
+
+    The worker thread stays alive after the first load so the list can be
+    refreshed in the background every `refresh_interval` milliseconds.
+    """
+    list_of_libraries = pyqtSignal(object)
+    search_index = pyqtSignal(object)
+    fuzzy_search = pyqtSignal(object)
+    request_refresh = pyqtSignal()
+    def __init__(self, appName: str = "P4cMan", fileName: str = "library_list.bin",
+                 url: str = SIMPLE_INDEX_URL, refresh_interval: int = 6 * 60 * 60 * 1000):
         super().__init__()
         self.thread_runner = QThread()
-        self.worker = PyPiWorker(appName, fileName)
+        self.worker = PyPiWorker(appName, fileName, url, refresh_interval)
         self.worker.moveToThread(self.thread_runner)
 
-        self.worker.finished.connect(self.thread_runner.quit)
         self.thread_runner.started.connect(self.worker.run)
         self.worker.list_of_libraries.connect(self.list_of_libraries)
+        self.worker.search_index.connect(self.search_index)
+        self.worker.fuzzy_search.connect(self.fuzzy_search)
+        self.request_refresh.connect(self.worker.refresh)
+        self.thread_runner.finished.connect(self.worker.deleteLater)
 
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread_runner.finished.connect(self.thread_runner.deleteLater)
-
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_interval)
+        self.refresh_timer.timeout.connect(self.request_refresh)
 
     def startFetching(self):
         self.thread_runner.start()
+        self.refresh_timer.start()
+
+    def stop(self):
+        self.refresh_timer.stop()
+        if self.thread_runner.isRunning():
+            # A download in flight gives up at its next chunk, nothing is saved
+            self.worker.cancel()
+            self.thread_runner.quit()
+            self.thread_runner.wait()
 
 class PyPiWorker(QObject):
-    """Worker for fetching libraries from PyPI"""
-    list_of_libraries = pyqtSignal(list)
-    finished = pyqtSignal()
-    def __init__(self, appName: str = "P4cMan", fileName: str = "library_list.txt"):
+    """
+    Worker for fetching libraries from PyPI
+
+    Emits the memory-mapped name store and the search index over it. Both are
+    views of the packed file, so no Python list of names is ever built. The fuzzy
+    search follows once its deletion index is opened (or built, the first time).
+    Every successful refresh emits a new set, saved to a new file; the old store
+    keeps working until the installer drops it. `cancel` makes a download in
+    progress give up, so the thread can be waited on when the app closes.
+    """
+    list_of_libraries = pyqtSignal(object)
+    search_index = pyqtSignal(object)
+    fuzzy_search = pyqtSignal(object)
+    def __init__(self, appName: str = "P4cMan", fileName: str = "library_list.bin",
+                 url: str = SIMPLE_INDEX_URL, refresh_interval: int = 6 * 60 * 60 * 1000):
         super().__init__()
         self.appName = appName
         self.fileName = fileName
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._stop = threading.Event()
+
+    def cancel(self):
+        """Called from the GUI thread, stops a download or refresh at its next chunk."""
+        self._stop.set()
+
+    def _emit_store(self, store):
+        search_index = SearchIndex(store)
+        self.list_of_libraries.emit(store)
+        self.search_index.emit(search_index)
+        if self._stop.is_set():
+            return
+        deletions = load_deletion_index(store)
+        if deletions is not None:
+            self.fuzzy_search.emit(FuzzySearch(search_index, deletions))
+
+    @pyqtSlot()
+    def run(self):
+        store = load_data(self.appName, self.fileName, self._stop.is_set)
+        if store is not None:
+            self._emit_store(store)
+            # Generations replaced while an older one was still mapped (Windows)
+            remove_old_stores(self.appName, self.fileName)
+        if self._stop.is_set():
+            return
+        fetched_at = load_index_meta(self.appName, self.fileName).get("fetched_at", 0)
+        if time.time() - fetched_at > self.refresh_interval / 1000:
+            self.refresh()
+
+    @pyqtSlot()
+    def refresh(self):
+        if self._stop.is_set():
+            return
+        try:
+            store = refresh_package_list(self.appName, self.fileName, self.url, should_stop=self._stop.is_set)
+        except RefreshCancelled:
+            return
+        except Exception as e:
+            print(f"Error refreshing the package list: {e}")
+            return
+        if store is not None:
+            self._emit_store(store)
+
+class SearchRunner(QObject):
+    """
+    Runs installer searches on a background thread.
+
+    Every query gets a generation number. Requests that were superseded before the
+    worker got to them are skipped, a refinement in progress gives up as soon as a
+    newer query arrives, and `results` carries the generation so the installer can
+    drop anything stale.
+    """
+    results = pyqtSignal(int, list)
+    request_search = pyqtSignal(int, str, int, int)
+    request_index = pyqtSignal(object)
+    request_fuzzy = pyqtSignal(object)
+    request_discard = pyqtSignal(str)
+    def __init__(self, fuzzy_threshold: int = 5):
+        super().__init__()
+        self.generation = 0
+        self.thread_runner = QThread()
+        self.worker = SearchWorker(self, fuzzy_threshold)
+        self.worker.moveToThread(self.thread_runner)
+
+        self.request_search.connect(self.worker.search)
+        self.request_index.connect(self.worker.set_index)
+        self.request_fuzzy.connect(self.worker.set_fuzzy)
+        self.request_discard.connect(self.worker.discard)
+        self.worker.results.connect(self.results)
+        self.thread_runner.finished.connect(self.worker.deleteLater)
+        self.thread_runner.start()
+
+    def set_index(self, search_index: SearchIndex):
+        self.request_index.emit(search_index)
+
+    def set_fuzzy(self, fuzzy_search: FuzzySearch):
+        self.request_fuzzy.emit(fuzzy_search)
+
+    def discard(self, name: str):
+        self.request_discard.emit(name)
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> int:
+        """
+        Queues a search and returns its generation number.
+
+        Only the matches ranked from `offset` to `limit` are sent back, which is how
+        the installer loads the next page of an ongoing search.
+        """
+        self.generation += 1
+        self.request_search.emit(self.generation, query, limit, offset)
+        return self.generation
+
+    def is_stale(self, generation: int) -> bool:
+        return generation != self.generation
+
+    def stop(self):
+        if self.thread_runner.isRunning():
+            # Every queued or running search is stale now, a refinement gives up at its next check
+            self.generation += 1
+            self.thread_runner.quit()
+            self.thread_runner.wait()
+
+class SearchWorker(QObject):
+    """Worker owning the `IncrementalSearch`, every call to it happens on the search thread."""
+    results = pyqtSignal(int, list)
+    def __init__(self, runner: SearchRunner, fuzzy_threshold: int = 5):
+        super().__init__()
+        self.runner = runner
+        self.fuzzy_threshold = fuzzy_threshold
+        self.search_state: IncrementalSearch | None = None
+
+    @pyqtSlot(object)
+    def set_index(self, search_index: SearchIndex):
+        self.search_state = IncrementalSearch(search_index, fuzzy_threshold=self.fuzzy_threshold)
+
+    @pyqtSlot(object)
+    def set_fuzzy(self, fuzzy_search: FuzzySearch):
+        # A fuzzy search built for an older list would return ids of the wrong names
+        if self.search_state is not None and fuzzy_search.index is self.search_state.index:
+            self.search_state.set_fuzzy(fuzzy_search)
+
+    @pyqtSlot(str)
+    def discard(self, name: str):
+        if self.search_state is not None:
+            self.search_state.discard(name)
+
+    @pyqtSlot(int, str, int, int)
+    def search(self, generation: int, query: str, limit: int, offset: int):
+        if self.search_state is None or self.runner.is_stale(generation):
+            return
+        names = self.search_state.search(query, limit, lambda: self.runner.is_stale(generation), offset)
+        if names is not None:
+            self.results.emit(generation, names)
+
+class PyPiFetcherDaemon(QObject):
+    """
+    Keeps one `pypi-fetcher --serve` process alive for the whole session.
+
+    Requests and results are single JSON lines over stdin and stdout, so the fetcher
+    starts and loads its cache once instead of once per search. Every package is
+    reported through `package_fetched` as soon as it arrives, followed by one
+    `request_finished` per request. The process is started on the first request and
+    again if it ever exits. Fetched details land in the shared `DetailsCache`, using
+    the given `ttl` (seconds) and `max_entries`.
+    """
+    package_fetched = pyqtSignal(int, str, dict)
+    request_finished = pyqtSignal(int)
+    def __init__(self, go_executable: str, parent=None, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(parent)
+        self.go_executable = go_executable
+        self.arguments = ["-serve", f"-ttl={ttl}s", f"-max-entries={max_entries}"]
+        self.process: QProcess | None = None
+        self._next_id = 0
+        self._pending = set()
+        self._buffer = b""
+
+    def _ensure_started(self) -> bool:
+        if self.process is not None and self.process.state() != QProcess.ProcessState.NotRunning:
+            return True
+        self.process = QProcess(self)
+        self.process.readyReadStandardOutput.connect(self._read_output)
+        self.process.readyReadStandardError.connect(self._read_errors)
+        self.process.finished.connect(self._on_exit)
+        self._buffer = b""
+        self.process.start(self.go_executable, self.arguments)
+        if not self.process.waitForStarted(3000):
+            print(f"Could not start {self.go_executable}: {self.process.errorString()}")
+            self.process = None
+            return False
+        return True
+
+    def request(self, names: list) -> int:
+        """Asks for the details of the packages and returns the request id."""
+        self._next_id += 1
+        request_id = self._next_id
+        if not self._ensure_started():
+            # Reported once the caller knows the id
+            QTimer.singleShot(0, lambda: self.request_finished.emit(request_id))
+            return request_id
+        self._pending.add(request_id)
+        line = json.dumps({"id": request_id, "packages": list(names)}) + "\n"
+        self.process.write(line.encode())
+        return request_id
+
+    def _read_output(self):
+        self._buffer += bytes(self.process.readAllStandardOutput().data())
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                response = json.loads(line)
+            except ValueError as e:
+                print(f"Invalid response from the fetcher: {e}")
+                continue
+            request_id = response.get("id", 0)
+            if response.get("done"):
+                self._pending.discard(request_id)
+                self.request_finished.emit(request_id)
+            elif response.get("name"):
+                data = response.get("data") or {}
+                if response.get("error"):
+                    # Fetching failed, DetailsPrefetcher leaves the row and asks again later
+                    data = dict(data, error=response["error"])
+                self.package_fetched.emit(request_id, response["name"], data)
+
+    def _read_errors(self):
+        print(bytes(self.process.readAllStandardError().data()).decode(errors="replace"), end="")
+
+    def _on_exit(self):
+        # Whatever was still pending will never be answered by this process
+        pending, self._pending = self._pending, set()
+        for request_id in sorted(pending):
+            self.request_finished.emit(request_id)
+
+    def stop(self):
+        if self.process is None or self.process.state() == QProcess.ProcessState.NotRunning:
+            return
+        # Closing stdin lets the fetcher finish in-flight requests and compact its cache
+        self.process.closeWriteChannel()
+        if not self.process.waitForFinished(3000):
+            self.process.kill()
+            self.process.waitForFinished(1000)
+
+class AsyncDetailsFetcher(QObject):
+    """
+    Same interface as `PyPiFetcherDaemon`, backed by `AsyncDetailsBackend`.
+
+    An asyncio event loop runs on its own QThread for the whole session, so the
+    connection pool stays warm between requests. Results are emitted from the loop
+    thread and reach the GUI thread as queued signals.
+    """
+    package_fetched = pyqtSignal(int, str, dict)
+    request_finished = pyqtSignal(int)
+    def __init__(self, backend: AsyncDetailsBackend, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.loop = asyncio.new_event_loop()
+        self.thread_runner = AsyncLoopThread(self.loop)
+        self.thread_runner.start()
+        self._next_id = 0
+        # pypi-fetcher sweeps the cache it shares when it starts, this backend does it once per session
+        asyncio.run_coroutine_threadsafe(self._sweep_cache(), self.loop)
+
+    async def _sweep_cache(self):
+        # Reading every entry is file IO, it runs on the loop's executor so requests are not held up
+        try:
+            await self.loop.run_in_executor(None, self.backend.cache.sweep)
+        except Exception as e:
+            print(f"Error sweeping the details cache: {e!r}")
+
+    def request(self, names: list) -> int:
+        """Asks for the details of the packages and returns the request id."""
+        self._next_id += 1
+        asyncio.run_coroutine_threadsafe(self._run_request(self._next_id, list(names)), self.loop)
+        return self._next_id
+
+    async def _run_request(self, request_id: int, names: list):
+        try:
+            await self.backend.fetch(names, lambda name, details: self.package_fetched.emit(request_id, name, details))
+        except Exception as e:
+            print(f"Error fetching details: {e!r}")
+        self.request_finished.emit(request_id)
+
+    async def _shutdown(self):
+        # Requests in flight are cancelled, then the pool is closed and the loop stops
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await self.backend.close()
+        except Exception as e:
+            print(f"Error closing the connection pool: {e!r}")
+        self.loop.stop()
+
+    def stop(self):
+        if not self.thread_runner.isRunning():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self.thread_runner.wait()
+
+class AsyncLoopThread(QThread):
+    """Runs an asyncio event loop until it is stopped."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, parent=None):
+        super().__init__(parent)
+        self.loop = loop
 
     def run(self):
-        librarylist = load_data(self.appName, self.fileName)
-        self.list_of_libraries.emit(librarylist)
-        self.finished.emit()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
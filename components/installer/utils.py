@@ -1,9 +1,16 @@
+import codecs
+import html
 import datetime
 import requests
-from bs4 import BeautifulSoup
 import os
 import json
+import time
+from html.parser import HTMLParser
 from helpers.utils import get_app_support_directory
+from ..widgets.tooltip import tooltip_html_cache
+from .cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL, DetailsCache, parse_timestamp
+from .wheelhouse import DEFAULT_MAX_BYTES, Wheelhouse
+from .store import DeletionIndex, PackageNameStore, write_deletion_index, write_store
 
 def format_pypi_tooltip_html(pypi_data, font_family_name):
     """
@@ -91,7 +98,7 @@ def format_pypi_tooltip_html(pypi_data, font_family_name):
     if pypi_data.get('fetched_at'):
         try:
             # Parse ISO 8601 timestamp and format it nicely
-            dt_obj = datetime.datetime.fromisoformat(pypi_data['fetched_at'].replace('Z', '+00:00'))
+            dt_obj = parse_timestamp(pypi_data['fetched_at'])
             # Format to something like "16 Sep 2025, 03:07 PM IST"
             dt_obj = dt_obj.astimezone(datetime.timezone(datetime.timedelta(hours=5, minutes=30))) # Convert to IST
             fetched_at_str = dt_obj.strftime('%d %b %Y, %I:%M %p %Z')
@@ -123,39 +130,277 @@ def format_pypi_tooltip_html(pypi_data, font_family_name):
     </div>
     """
 
+def pypi_tooltip_html(pypi_data, font_family_name: str = 'figtree') -> str:
+    """`format_pypi_tooltip_html`, memoized on (package, version, fetched_at)."""
+    info = pypi_data.get('info', {})
+    key = ('pypi', info.get('name'), info.get('version'), pypi_data.get('fetched_at'), font_family_name)
+    return tooltip_html_cache.get(key, lambda: format_pypi_tooltip_html(pypi_data, font_family_name))
+
+def pip_log_html(log: list, lines: int = 20, font_family_name: str = 'figtree') -> str:
+    """The last lines pip printed for a failed install, escaped for the tooltip."""
+    text = html.escape("\n".join(log[-lines:]))
+    return f"""
+    <div style="font-family: '{font_family_name}', sans-serif; font-size: 12px; max-width: 550px; color: #f8d7da;">
+        <div style="font-weight: 600; color: #999999; padding-bottom: 4px;">pip failed</div>
+        <pre style="white-space: pre-wrap; margin: 0;">{text}</pre>
+    </div>
+    """
+
+
 
-def save_file(data: list, app_name: str = "P4cMan", file_name: str = "library_list.txt"):
-    """Saves data to a file in the application's support directory."""
+LEGACY_FILE_NAME = "library_list.txt"
+SIMPLE_INDEX_URL = "https://pypi.org/simple/"
+SIMPLE_JSON_TYPE = "application/vnd.pypi.simple.v1+json"
+REQUEST_TIMEOUT = (10, 60) # (connect, read) in seconds
+
+
+class RefreshCancelled(Exception):
+    """Raised inside a package list download that was asked to stop."""
+
+def save_file(data, app_name: str = "P4cMan", file_name: str = "library_list.bin"):
+    """
+    Saves the package names as a packed store in the application's support directory.
+
+    Every save is a new generation, `<file_name>.<ns timestamp>`, recorded in the meta
+    file by the caller. The store in use stays memory mapped until the installer drops
+    it, and Windows refuses to replace or delete a mapped file.
+    """
     # Saves Data in a pre-defined directory
     app_support_dir = get_app_support_directory(app_name)
-    file_path = os.path.join(app_support_dir, file_name)
-    with open(file_path, "w") as file:
-        json.dump(data, file, indent=4)
+    file_path = os.path.join(app_support_dir, f"{file_name}.{time.time_ns()}")
+    write_store(file_path, data)
+    return file_path
+
+def store_path(app_name: str = "P4cMan", file_name: str = "library_list.bin") -> str:
+    """The store in use: the generation the meta file names, or `file_name` before the first refresh."""
+    app_support_dir = get_app_support_directory(app_name)
+    current = load_index_meta(app_name, file_name).get("store_file")
+    if current and os.path.exists(os.path.join(app_support_dir, current)):
+        return os.path.join(app_support_dir, current)
+    return os.path.join(app_support_dir, file_name)
+
+def remove_old_stores(app_name: str = "P4cMan", file_name: str = "library_list.bin"):
+    """Deletes the generations (and their fuzzy indexes) before the one in use, those still mapped are left for later."""
+    app_support_dir = get_app_support_directory(app_name)
+    current = os.path.basename(store_path(app_name, file_name))
+    for entry in os.scandir(app_support_dir):
+        store_name = entry.name[:-len(".fuzzy")] if entry.name.endswith(".fuzzy") else entry.name
+        # The name before generations, or `<file_name>.<digits>`; the meta file is left alone
+        generation = store_name == file_name or (
+            store_name.startswith(f"{file_name}.") and store_name[len(file_name) + 1:].isdigit()
+        )
+        if store_name == current or not generation:
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+def _meta_path(app_name: str, file_name: str) -> str:
+    return os.path.join(get_app_support_directory(app_name), f"{file_name}.meta.json")
+
+def load_index_meta(app_name: str = "P4cMan", file_name: str = "library_list.bin") -> dict:
+    """Loads the validators (ETag, Last-Modified) and fetch time saved with the package list."""
+    try:
+        with open(_meta_path(app_name, file_name), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_index_meta(meta: dict, app_name: str = "P4cMan", file_name: str = "library_list.bin"):
+    with open(_meta_path(app_name, file_name), "w") as file:
+        json.dump(meta, file, indent=4)
+
+def _decoded_chunks(response, chunk_size: int = 1 << 16):
+    # The simple index is always UTF-8, whatever requests guesses for text/html
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+def _until_stopped(chunks, should_stop):
+    for chunk in chunks:
+        if should_stop is not None and should_stop():
+            raise RefreshCancelled()
+        yield chunk
+
+def iter_json_project_names(chunks):
+    """
+    Yields project names from a PEP 691 JSON simple index, one object at a time.
+
+    Only the object currently being read is kept in memory: the `projects` array is
+    located, then each entry is decoded with `raw_decode` as soon as it is complete.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    in_projects = False
+    for chunk in chunks:
+        buffer += chunk
+        if not in_projects:
+            key = buffer.find('"projects"')
+            bracket = buffer.find("[", key) if key != -1 else -1
+            if bracket == -1:
+                continue
+            buffer = buffer[bracket + 1:]
+            in_projects = True
 
-def download_data_from_pypi(app_name: str = "P4cMan", file_name: str = "library_list.txt") -> list:
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                project, position_after = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break # The object continues in the next chunk
+            yield project["name"]
+            position = position_after
+        buffer = buffer[position:]
+    raise ValueError("The simple index ended before the projects list was complete")
+
+class _AnchorTextParser(HTMLParser):
+    """Collects the text of every <a> tag while the HTML is fed in chunks."""
+    def __init__(self):
+        super().__init__()
+        self.names = []
+        self._anchor_text = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._anchor_text = []
+
+    def handle_data(self, data):
+        if self._anchor_text is not None:
+            self._anchor_text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._anchor_text is not None:
+            self.names.append("".join(self._anchor_text).strip())
+            self._anchor_text = None
+
+def iter_html_project_names(chunks):
+    """Yields project names from the HTML simple index without building a DOM."""
+    parser = _AnchorTextParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.names
+        parser.names.clear()
+    parser.close()
+    yield from parser.names
+
+def refresh_package_list(app_name: str = "P4cMan", file_name: str = "library_list.bin",
+                         url: str = SIMPLE_INDEX_URL, conditional: bool = True,
+                         should_stop = None) -> PackageNameStore | None:
+    """
+    Downloads the list of all PyPI packages and swaps it in for the saved one.
+
+    The JSON form of the simple index (PEP 691) is requested and parsed as a stream,
+    with the HTML form as a fallback for indexes that do not offer it. When `conditional`
+    is set, the ETag and Last-Modified of the previous download are sent back, so an
+    unchanged index costs a 304 and nothing is rewritten. `should_stop` is checked
+    before every chunk, RefreshCancelled is raised once it returns True and nothing
+    is saved.
+
+    Returns:
+        PackageNameStore | None: The new store, or None when the index has not changed.
+    """
+    meta = load_index_meta(app_name, file_name) if conditional else {}
+    headers = {
+        "User-Agent": "insomnia/11.4.0",
+        "Accept": f"{SIMPLE_JSON_TYPE}, text/html;q=0.1",
+    }
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 304:
+            meta["fetched_at"] = time.time()
+            save_index_meta(meta, app_name, file_name)
+            return None
+        response.raise_for_status()
+
+        chunks = _until_stopped(_decoded_chunks(response), should_stop)
+        if response.headers.get("Content-Type", "").startswith(SIMPLE_JSON_TYPE):
+            names = iter_json_project_names(chunks)
+        else:
+            names = iter_html_project_names(chunks)
+        # A new generation, readers keep their mapping of the old one
+        file_path = save_file(names, app_name, file_name)
+
+        save_index_meta({
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+            "fetched_at": time.time(),
+            "store_file": os.path.basename(file_path),
+        }, app_name, file_name)
+    remove_old_stores(app_name, file_name)
+    return PackageNameStore(file_path)
+
+def download_data_from_pypi(app_name: str = "P4cMan", file_name: str = "library_list.bin",
+                            should_stop = None) -> PackageNameStore:
     """Downloads the list of all PyPI packages and saves them to a file."""
-    # Downloads Data from PyPi.org
-    url = "https://pypi.org/simple/"
-    headers = {"User-Agent": "insomnia/11.4.0"}
-    response = requests.request("GET", url, data="", headers=headers)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    librarylist = [tag.get_text() for tag in soup.find_all('a')]
-    save_file(librarylist, app_name, file_name)
-    return librarylist
-
-def load_data(app_name = "P4cMan", file_name = "library_list.txt") -> list:
-    """Loads data from a file in the application's support directory, downloading it if not present."""
+    return refresh_package_list(app_name, file_name, conditional=False, should_stop=should_stop) # type: ignore
+
+def load_data(app_name = "P4cMan", file_name = "library_list.bin", should_stop = None) -> PackageNameStore | None:
+    """
+    Opens the packed package name store from the application's support directory.
+
+    The store is memory mapped, so opening it costs almost nothing. A list saved by
+    older versions (a JSON array in `library_list.txt`) is converted once, and the
+    list is downloaded when neither file exists.
+    """
     # Loads Data from a pre-defined directory
     try:
         appSupportDir = get_app_support_directory(app_name)
-        filePath = os.path.join(appSupportDir, file_name)
+        filePath = store_path(app_name, file_name)
+        legacyPath = os.path.join(appSupportDir, LEGACY_FILE_NAME)
 
         if os.path.exists(filePath):
-            with open(filePath, "r") as file:
-                data = json.load(file)
+            data = PackageNameStore(filePath)
+        elif os.path.exists(legacyPath):
+            with open(legacyPath, "r") as file:
+                write_store(filePath, json.load(file))
+            os.remove(legacyPath)
+            data = PackageNameStore(filePath)
         else:
-            data = download_data_from_pypi(app_name, file_name)
+            data = download_data_from_pypi(app_name, file_name, should_stop)
+    except RefreshCancelled:
+        data = None
     except Exception as e:
-        data = []
+        data = None
         print(f"Error loading data: {e}")
     return data
+
+def load_deletion_index(store: PackageNameStore) -> DeletionIndex | None:
+    """
+    Opens the deletion index used for typo tolerant search, next to the store it belongs to.
+
+    The index is rebuilt when it is missing, older than the store, or was built for a
+    different list, which takes a few seconds for the whole PyPI list.
+    """
+    file_path = f"{store.file_path}.fuzzy"
+    try:
+        if os.path.exists(file_path) and os.path.getmtime(file_path) >= os.path.getmtime(store.file_path):
+            deletions = DeletionIndex(file_path)
+            if deletions.count == len(store):
+                return deletions
+        write_deletion_index(file_path, store)
+        return DeletionIndex(file_path)
+    except Exception as e:
+        print(f"Error loading the fuzzy search index: {e}")
+        return None
+
+def get_details_cache(app_name: str = "P4cMan", ttl: int = DEFAULT_TTL,
+                      max_entries: int = DEFAULT_MAX_ENTRIES) -> DetailsCache:
+    """The PyPI details cache in the application's support directory, shared with `pypi-fetcher`."""
+    return DetailsCache(os.path.join(get_app_support_directory(app_name), "library_details"), ttl, max_entries)
+
+
+def get_wheelhouse(app_name: str = "P4cMan", max_bytes: int = DEFAULT_MAX_BYTES) -> Wheelhouse:
+    """The wheelhouse in the application's support directory, shared by the installs of every environment."""
+    return Wheelhouse(os.path.join(get_app_support_directory(app_name), "wheelhouse"), max_bytes)
@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+STATS_FILE = "stats.json"
+
+# Installs of different environments run at the same time, the stats file is shared
+_stats_lock = threading.Lock()
+
+
+class Wheelhouse:
+    """
+    A directory of wheels shared by the installs of every environment.
+
+    Installs of a known version first try the wheelhouse alone (`--no-index
+    --find-links` with `name==version`), which only succeeds when the wheel of that
+    version and every one it needs are already there: that is a hit, and nothing is
+    downloaded or built. Otherwise (a miss) `pip wheel` downloads and builds what is
+    missing into the wheelhouse, from the index, and the install is retried from it.
+
+    Wheels are evicted least recently used first, by mtime (bumped whenever an
+    install takes a wheel from here), once the wheelhouse grows past `max_bytes`.
+    Hits and misses are counted per package in `stats.json`.
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def install_args(self, requirements: list) -> list:
+        """`pip install` arguments that only look in the wheelhouse, `requirements` pinned (`name==version`)."""
+        return ["install", "--progress-bar", "off", "--no-index", "--find-links", self.directory, *requirements]
+
+    def fill_args(self, requirements: list) -> list:
+        """`pip wheel` arguments that add the wheels of `requirements` and their dependencies, reusing the ones here."""
+        return ["wheel", "--progress-bar", "off", "--wheel-dir", self.directory, "--find-links", self.directory, *requirements]
+
+    def touch_used(self, log: list):
+        """Bumps the wheels pip took from here, from its `Processing <path>` lines."""
+        prefix = os.path.join(os.path.abspath(self.directory), "")
+        for line in log:
+            line = line.strip()
+            if line.startswith("Processing "):
+                # Relative to the working directory when the wheelhouse is below it
+                file_path = os.path.abspath(line[len("Processing "):].split(" ")[0])
+                if file_path.startswith(prefix):
+                    try:
+                        os.utime(file_path)
+                    except OSError:
+                        pass
+
+    def _read_stats(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), "r") as file:
+                stats = json.load(file)
+        except (OSError, ValueError):
+            stats = {}
+        return {'hits': stats.get('hits', 0), 'misses': stats.get('misses', 0)}
+
+    def record(self, packages: int, hit: bool):
+        with _stats_lock:
+            stats = self._read_stats()
+            stats['hits' if hit else 'misses'] += packages
+            file_path = os.path.join(self.directory, STATS_FILE)
+            temp_path = f"{file_path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "w") as file:
+                    json.dump(stats, file)
+                os.replace(temp_path, file_path)
+            except OSError as e:
+                print(f"Failed to save wheelhouse stats: {e}")
+
+    def _wheels(self) -> list:
+        wheels = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".whl") and entry.is_file():
+                        stat = entry.stat()
+                        wheels.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return wheels
+
+    def evict(self) -> int:
+        """Deletes the least recently used wheels beyond `max_bytes`, returning how many were removed."""
+        wheels = sorted(self._wheels())
+        total_size = sum(size for _, size, _ in wheels)
+        removed = 0
+        for _, size, file_path in wheels:
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """Size, wheel count, hits, misses and hit rate, for the Analysis page."""
+        wheels = self._wheels()
+        stats = self._read_stats()
+        requests = stats['hits'] + stats['misses']
+        return {
+            'size': sum(size for _, size, _ in wheels),
+            'max_size': self.max_bytes,
+            'wheels': len(wheels),
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hits'] / requests if requests else 0.0,
+        }
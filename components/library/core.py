@@ -1,18 +1,20 @@
 import os
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (QComboBox, QFileDialog, QLineEdit, QMessageBox,
-                             QStackedWidget, QWidget, QVBoxLayout, QListWidget,
-                             QHBoxLayout, QLabel, QListWidgetItem, QPushButton,
-                             QSizePolicy)
+                             QStackedWidget, QWidget, QVBoxLayout, QListView,
+                             QHBoxLayout, QLabel, QPushButton, QSizePolicy)
 from PyQt6.QtCore import (QEasingCurve, QPropertyAnimation, QTimer, Qt,
-                        pyqtSignal, QSize, pyqtSlot)
+                        pyqtSignal, pyqtSlot)
 from ..widgets.helper_classes import LineEdit
 from ..onboarding.utils import commit_action
 from ..onboarding.utils import loading_virtual_env
-from ..widgets.tooltip import InteractiveToolTip
 from ..widgets.buttons import RotatingPushButton
-from .threads import LibraryThreads, Uninstall
-from .utils import rank_query, human_readable_size, format_tooltip_html
+from .threads import LibraryThreads, Uninstall, scan_cache_directory
+from .prefetch import EnvironmentPrefetcher
+from .watcher import SitePackagesWatcher
+from .models import DataRole, InstalledLibraryModel, LibraryFilterProxyModel
+from .delegates import LibraryItemDelegate
+from collections import deque
 from copy import deepcopy
 from helpers.utils import resource_path
 
@@ -45,7 +47,7 @@ class Library(QWidget):
 
     def _init_properties(self):
         """Initializes non-UI properties, caches, and maps."""
-        self.item_map = {}
+        self.all_items_data = []
         self.animate_env_box = False
         self.current_loaded_virtual_envs_list = []
         self.current_virtual_env = ""
@@ -55,13 +57,53 @@ class Library(QWidget):
         self.already_inside_project = False
         self.current_dir = ""
         self.uninstall_manager = None
+        self.streaming_details = False
+        # Venv paths of the detail requests the worker has not answered yet, oldest first
+        self.requested_venv_paths = deque()
+        # Site-packages changes that came in while the list was loading, applied once it is in
+        self.pending_site_changes = []
 
     def _worker_thread(self):
         """Initializes worker threads for fetching library details and virtual environment lists."""
-        self.worker = LibraryThreads()
+        self.worker = LibraryThreads(
+            size_mode=self.config.get('controls', {}).get('library', {}).get('sizeMode', 'record'),
+            backend=self.config.get('controls', {}).get('library', {}).get('metadataBackend', 'go')
+        )
         self.worker.details.connect(self._handle_list_libraries)
+        self.worker.details_started.connect(self._on_details_started)
+        self.worker.details_rows.connect(self._on_details_rows)
+        self.worker.details_sizes.connect(self._on_details_sizes)
         self.worker.virtual_envs.connect(self._venv_loaded_connected)
 
+        # The other environments of the directory are loaded in the background, switching is instant
+        library_controls = self.config.get('controls', {}).get('library', {})
+        self.env_prefetcher = EnvironmentPrefetcher(
+            self._load_library_exe(),
+            scan_cache_directory(),
+            size_mode=library_controls.get('sizeMode', 'record'),
+            backend=library_controls.get('metadataBackend', 'go'),
+            max_workers=library_controls.get('prefetchWorkers', 3),
+            parent=self
+        )
+        self.env_prefetcher.loaded.connect(self._on_environment_prefetched)
+
+        # Installs and uninstalls, from the app or outside it, are applied as deltas
+        self.site_watcher = SitePackagesWatcher(
+            size_mode=library_controls.get('sizeMode', 'record'),
+            debounce=library_controls.get('watchDebounce', 500),
+            parent=self
+        )
+        self.site_watcher.changed.connect(self._on_site_packages_changed)
+
+    def _load_library_exe(self):
+        return resource_path(self.config.get('paths', {}).get('executables', {}).get('load_library', {}).get('darwin'))
+
+    def _venv_path(self, venv_name):
+        return next(
+            (env['venv_path'] for env in self.current_loaded_virtual_envs_list if env['venv_name'] == venv_name),
+            os.path.join(self.current_dir, venv_name)
+        )
+
     def _init_ui(self):
         """Initializes the main user interface layout and components."""
         self.setObjectName("library")
@@ -203,7 +245,9 @@ class Library(QWidget):
             commit_action(self, "Same name environment already exist")
         else:
             self.stacked_library_with_loading_screen.setCurrentIndex(self.index_for_stacked_pages['loading_page'])
-            self.env_creator = LibraryThreads()
+            self.env_creator = LibraryThreads(
+                template_mode=self.config.get('controls', {}).get('library', {}).get('venvTemplates', 'hardlink')
+            )
             self.env_creator.emit_create_virtual_env(
                 self.current_dir,
                 self.drop_down_for_creating_python_env.currentText().split(":")[1].strip(),
@@ -214,11 +258,19 @@ class Library(QWidget):
 
     def _on_creating_new_virtual_env(self, success_code, directory, virtual_env_name, venvs):
         if success_code == 1:
+            # The worker only describes the new environment, the others are already listed
+            known = {env['venv_path']: env for env in self.current_loaded_virtual_envs_list}
+            known.update({env['venv_path']: env for env in venvs})
+            venvs = sorted(known.values(), key=lambda env: env['venv_path'])
             self.selection_location_from_main(directory, virtual_env_name, venvs)
         elif success_code == 0:
             self.stacked_library_with_loading_screen.setCurrentIndex(self.index_for_stacked_pages['loading_page'])
         else:
-            commit_action(self, "Unknown error")
+            # Back to what was shown before the spinner
+            page = 'library_list' if self.current_virtual_env else 'page_no_env'
+            self.stacked_library_with_loading_screen.setCurrentIndex(self.index_for_stacked_pages[page])
+            reason = venvs[0] if venvs and isinstance(venvs[0], str) else "Unknown error"
+            commit_action(self, f"Could not create {virtual_env_name}: {reason}")
 
 
     def _change_virtual_env(self, directory, venv_name):
@@ -228,11 +280,54 @@ class Library(QWidget):
         self.current_state.emit(directory, venv_name, self.current_loaded_virtual_envs_list)
         self.current_virtual_env = venv_name
         self._set_python_exec_path([env['python_path'] for env in self.current_loaded_virtual_envs_list if env['venv_name'] == venv_name][0])
+        venv_path = self._venv_path(venv_name)
+        self.site_watcher.watch(venv_path)
+        cached = self.env_prefetcher.get(venv_path)
+        if cached is not None:
+            # Shown straight away, and loaded again in the background in case it changed.
+            # A load still streaming is for another environment now, its rows are dropped.
+            self.streaming_details = False
+            self._add_items(cached)
+            self.env_prefetcher.revalidate(venv_path)
+            return
+        self.requested_venv_paths.append(venv_path)
+        # Split from the resolved path, so the path the worker tags its details with is this one
         self.worker.emit_signal_for_details(
-            self.current_dir,
-            resource_path(self.config.get('paths', {}).get('executables', {}).get('load_library', {}).get('darwin')),
-            self.current_virtual_env
+            os.path.dirname(venv_path),
+            self._load_library_exe(),
+            os.path.basename(venv_path)
+        )
+
+    def _on_environment_prefetched(self, venv_path, installed):
+        """Applies a background load to the list when it is for the environment on screen and differs."""
+        if venv_path != self._venv_path(self.current_virtual_env) or self.streaming_details or venv_path in self.requested_venv_paths:
+            return
+        if [item['metadata'] for item in installed] != self.all_items_data:
+            self._add_items(installed)
+
+    def _on_site_packages_changed(self, venv_path, entries, removed):
+        """Applies what changed in the watched site-packages to the list, without loading it again."""
+        if venv_path != self._venv_path(self.current_virtual_env):
+            return
+        installed = self.env_prefetcher.get(venv_path)
+        if self.streaming_details or venv_path in self.requested_venv_paths or installed is None:
+            # The watcher will not report it again, the load may have read site-packages before it
+            self.pending_site_changes.append((venv_path, entries, removed))
+            return
+        # Rows showing their uninstall are removed by on_uninstall_finished
+        self.library_model.removeItems([
+            name for name in removed if self.library_model.status(name) not in ("uninstalling", "uninstalled")
+        ])
+        self.library_model.upsertItems([entry['metadata'] for entry in entries])
+
+        changed = set(removed) | {entry['metadata']['name'] for entry in entries}
+        installed = sorted(
+            [entry for entry in installed if entry['metadata']['name'] not in changed] + entries,
+            key=lambda entry: entry['metadata']['name'].lower()
         )
+        self.env_prefetcher.put(venv_path, installed)
+        self.all_items_data = [entry['metadata'] for entry in installed]
+        self.libraries_emitter.emit(self.all_items_data)
 
     def _setup_search_bar(self, parent_layout):
         """Creates the search bar and its associated typing timer."""
@@ -242,15 +337,41 @@ class Library(QWidget):
         self.search_bar.setFixedHeight(30)
         self.search_bar.setPlaceholderText("Search for libraries")
         self.search_bar.setObjectName("searchBarInLibraryListWidget")
-        self.search_bar.textChanged.connect(self._sort_items_list)
-        parent_layout.addWidget(self.search_bar)
+        self.search_bar.textChanged.connect(self._filter_items)
+
+        # Shown while libraries are selected, removes them all with one pip run
+        self.bulk_uninstall_button = QPushButton()
+        self.bulk_uninstall_button.hide()
+        self.bulk_uninstall_button.setFixedHeight(30)
+        self.bulk_uninstall_button.setObjectName("bulkUninstallButton")
+        self.bulk_uninstall_button.clicked.connect(self._uninstall_selected)
+
+        search_layout = QHBoxLayout()
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.addWidget(self.search_bar)
+        search_layout.addWidget(self.bulk_uninstall_button)
+        parent_layout.addLayout(search_layout)
 
     def _setup_library_list(self, parent_layout):
-        """Creates the main QListWidget for displaying the libraries."""
+        """Creates the QListView, its model, filter proxy and delegate, for displaying the libraries."""
         library_layout = QVBoxLayout()
         library_layout.setContentsMargins(0, 10, 0, 0)
         self.stacked_library_with_loading_screen = QStackedWidget()
-        self.library_list = QListWidget()
+        self.library_list = QListView()
+        self.library_list.setUniformItemSizes(True)
+        self.library_list.setMouseTracking(True)
+
+        # Rows are painted by the delegate, searching only re-filters the proxy
+        self.library_model = InstalledLibraryModel(self)
+        self.library_proxy = LibraryFilterProxyModel(self)
+        self.library_proxy.setSourceModel(self.library_model)
+        self.library_proxy.sort(0)
+        self.library_list.setModel(self.library_proxy)
+        self.library_delegate = LibraryItemDelegate(self.config, self.library_list)
+        self.library_delegate.uninstall_clicked.connect(self.start_library_uninstaller)
+        self.library_list.setItemDelegate(self.library_delegate)
+        self.library_list.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.library_list.selectionModel().selectionChanged.connect(self._on_library_selection_changed)
         self.stacked_library_with_loading_screen.addWidget(self.library_list)
         self.loading_page = loading_virtual_env()
         self.stacked_library_with_loading_screen.addWidget(self.loading_page)
@@ -302,7 +423,14 @@ class Library(QWidget):
         self.python_exec_path = path
         self.python_exec.emit(path)
 
-    def _handle_list_libraries(self, libraries: list):
+    def _handle_list_libraries(self, venv_path: str, libraries: list):
+        if venv_path in self.requested_venv_paths:
+            self.requested_venv_paths.remove(venv_path)
+        if venv_path:
+            self.env_prefetcher.put(venv_path, libraries)
+        # The user moved on to another environment while this one loaded, it is only cached
+        if venv_path != self._venv_path(self.current_virtual_env):
+            return
         self._add_items(libraries)
 
     def _on_venv_loaded(self, directory_path, current_venv, virtual_env_names):
@@ -332,8 +460,11 @@ class Library(QWidget):
 
             # Manually trigger the load for the first item
             self._change_virtual_env(self.current_dir, self.current_virtual_env)
+            self.env_prefetcher.prefetch([
+                env['venv_path'] for env in virtual_env_names if env['venv_name'] != self.current_virtual_env
+            ])
         else:
-            self.library_list.clear() # No venvs found
+            self.library_model.setItems([]) # No venvs found
             QMessageBox.information(self, "No Environments", "No virtual environments found in this directory.")
             self.change_env_in_same_directory.blockSignals(False)
 
@@ -348,6 +479,8 @@ class Library(QWidget):
             self.worker.emit_signal_for_virtual_envs(
                 directory_path,
                 resource_path(self.config.get('paths', {}).get('executables', {}).get('find_local_environment', {}).get('darwin')),
+                self.config.get('controls', {}).get('library', {}).get('discoveryDepth', 2),
+                self.config.get('controls', {}).get('library', {}).get('discoveryWorkers', 8)
             )
 
     def _venv_loaded_connected(self, venv_list):
@@ -376,151 +509,107 @@ class Library(QWidget):
         self.venv_loaded.emit(directoryPath, venv_name, virtual_envs)
 
 
-    def _add_items(self, itemsList):
+    def _on_details_started(self, venv_path: str):
+        """library-loader is streaming, rows are shown as their batches arrive."""
+        if venv_path != self._venv_path(self.current_virtual_env):
+            return
+        self.streaming_details = True
         self.search_bar.show()
-        self.all_items_data = [items['metadata'] for items in itemsList]
-        self.libraries_emitter.emit(self.all_items_data)
-        self._sort_items_list()
+        self.library_model.setItems([])
 
+    def _on_details_rows(self, venv_path: str, itemsList):
+        # Only while the streamed environment is the one on screen, see _on_details_started
+        if not self.streaming_details or venv_path != self._venv_path(self.current_virtual_env):
+            return
+        self.library_model.appendItems([items['metadata'] for items in itemsList])
+        self.stacked_library_with_loading_screen.setCurrentIndex(
+            self.index_for_stacked_pages['library_list']
+        )
 
-    def _sort_items_list(self):
-        """
-        Updates the library list with the provided items, applying search and sorting.
+    def _on_details_sizes(self, venv_path: str, sizes):
+        if not self.streaming_details or venv_path != self._venv_path(self.current_virtual_env):
+            return
+        self.library_model.updateSizes(sizes)
 
-        Args:
-            itemsList (list): A list of dictionaries, where each dictionary contains
-                              metadata about an installed library.
-            emit (bool, optional): Whether to emit the list_library_refreshed signal after
-                                   updating the list. Defaults to False, which starts a timer
-                                   to delay the signal emission.
-        """
+    def _add_items(self, itemsList):
         self.search_bar.show()
-        query = self.search_bar.text()
-        items = []
-        if not query:
-            items = sorted(self.all_items_data, key=lambda x: x['name'])
-        else:
-            items = rank_query([item_data for item_data in self.all_items_data], query)
-
-        # Clear the UI and re-populate it with the sorted list
-        self.library_list.clear()
-        self.item_map.clear()
-        for item in items:
-            list_lbrary_widget = QWidget()
-            list_lbrary_widget.setObjectName("listLibraryWidget")
-            list_lbrary_widget.setFocusPolicy(Qt.FocusPolicy.NoFocus)
-            list_widget_layout = QHBoxLayout(list_lbrary_widget)
-            # All the QLabels
-
-            # Name of the Library
-            name_library_panel = QLabel(item['name'])
-            name_library_panel.setAlignment(Qt.AlignmentFlag.AlignVCenter)
-            name_library_panel.setObjectName("nameLibraryPanel")
-
-            # Version of the Library
-            version_library_panel = QLabel(item['version'])
-            version_library_panel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            version_library_panel.setObjectName("versionLibraryPanel")
-
-            # Tag of The Library I means Installed outside and D means Downloaded from the world wide web
-            size_panel = QLabel()
-            size_panel.setText(human_readable_size(item['size']))
-            size_panel.setFixedWidth(60)
-            size_panel.setObjectName("sizeLibraryPanel")
-
-            # Changing Properties of QLabels
-            uninstall_button = QPushButton()
-            uninstall_button.setFixedSize(30, 30)
-            uninstall_button.setObjectName("deleteButtonFromLibraryListWidget")
-            uninstall_button.setIcon(QIcon(
-                resource_path(self.config.get("paths", {}).get("assets", {}).get("images", {}).get("uninstall")),
-            ))
-            uninstall_button.setIconSize(QSize(22, 22))
-
-            classifiers = item.get('classifier', [])
-            classifiers = classifiers if classifiers else []
-            license = ""
-            if item.get('license_expression', "") != "":
-                license = item['license_expression'].strip()
-            for classifier in classifiers:
-                if "License :: OSI Approved" in classifier:
-                    license = classifier.split("::")[-1].strip()
-            if license == "":
-                for classifier in classifiers:
-                    if "License :: OSI Approved" in classifier:
-                        license = classifier.split("::")[-1].strip()
-                if item.get('license', "") != "":
-                    license = item['license'].strip()
-
-            license_panel = QLabel()
-            license_panel.setText(license.replace("License", "").strip())
-            license_panel.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-            # license_panel.setFixedWidth(100)
-            license_panel.setObjectName("licenseLibraryPanel")
-            license_panel.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
-
-            # Adding Widget in proper Order
-            list_widget_layout.addWidget(size_panel)
-            list_widget_layout.addWidget(name_library_panel)
-            list_widget_layout.addWidget(license_panel)
-            list_widget_layout.addWidget(version_library_panel)
-            list_widget_layout.addSpacing(100)
-            list_widget_layout.addWidget(uninstall_button)
-            listItem = QListWidgetItem(self.library_list)
-            listItem.setSizeHint(QSize(0, 55))
-            self.library_list.addItem(listItem)
-            self.library_list.setItemWidget(listItem, list_lbrary_widget)
-
-            interactiveToolTip = InteractiveToolTip(self)
-            interactiveToolTip.install_on(list_lbrary_widget)
-            interactiveToolTip.set_object_name("listLibraryWidgetToolTip")
-            interactiveToolTip.set_content(format_tooltip_html(item, 'figtree'))
-
-            self.item_map[item['name']] = (list_lbrary_widget, listItem)
-            uninstall_button.clicked.connect(
-                lambda checked=False, packageName=item['name'], uninstall_button=uninstall_button: self.start_library_uninstaller(packageName, uninstall_button))
-
+        self.all_items_data = [items['metadata'] for items in itemsList]
+        self.libraries_emitter.emit(self.all_items_data)
+        if not self.streaming_details:
+            self.library_model.setItems(self.all_items_data)
+        self.streaming_details = False
         self.stacked_library_with_loading_screen.setCurrentIndex(
             self.index_for_stacked_pages['library_list']
         )
+        self._apply_pending_site_changes()
+
+    def _apply_pending_site_changes(self):
+        """Applies the changes held back while loading, in order; they are deltas, applying one twice is harmless."""
+        pending, self.pending_site_changes = self.pending_site_changes, []
+        for venv_path, entries, removed in pending:
+            self._on_site_packages_changed(venv_path, entries, removed)
+
+    def _filter_items(self, query: str):
+        """Filters the library list, only the proxy is invalidated and the rows on screen repainted."""
+        self.library_proxy.set_query(query)
+
+    def _selected_library_names(self) -> list:
+        return sorted(
+            index.data(DataRole)['name'] for index in self.library_list.selectionModel().selectedIndexes()
+            if index.data(DataRole) and index.data(DataRole).get('status') == "uninstall"
+        )
+
+    def _on_library_selection_changed(self, *_):
+        names = self._selected_library_names()
+        self.bulk_uninstall_button.setText(f"Uninstall {len(names)} selected")
+        self.bulk_uninstall_button.setVisible(len(names) > 1)
 
-    def start_library_uninstaller(self, packageName, uninstall_button: QPushButton):
+    def _uninstall_selected(self):
+        self.start_library_uninstaller(self._selected_library_names())
+
+    def start_library_uninstaller(self, package_names):
+        """Asks once, then removes one or more libraries with a single `pip uninstall`."""
+        if isinstance(package_names, str):
+            package_names = [package_names]
+        if not package_names:
+            return
+        if self.uninstall_manager is not None:
+            commit_action(self, "Wait for the running uninstall to finish")
+            return
+        listed = ", ".join(package_names[:10]) + (f" and {len(package_names) - 10} more" if len(package_names) > 10 else "")
         reply = QMessageBox.warning(
             self,
             'Confirm Uninstall',
-            f"Uninstalling {packageName}",
+            f"Uninstalling {listed}",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
         if reply == QMessageBox.StandardButton.Yes:
-            if packageName in self.item_map:
-                uninstall_button.setIcon(
-                    QIcon(resource_path(self.config.get('paths', {}).get('assets', {}).get('images', {}).get('uninstalling', '')))
-                )
-            self.uninstall_manager = Uninstall(self.python_exec_path, packageName, uninstall_button)
+            for package_name in package_names:
+                self.library_model.setStatus(package_name, "uninstalling")
+            self.library_list.clearSelection()
+            self.uninstall_manager = Uninstall(self.python_exec_path, package_names)
+            self.uninstall_manager.progress.connect(self._on_uninstall_progress)
             self.uninstall_manager.finished.connect(self.on_uninstall_finished)
-            self.uninstall_manager.finished.connect(self.uninstall_manager.deleteLater)
             self.uninstall_manager.start()
 
     def refetch_libraries(self):
+        if self.site_watcher.watching():
+            return # The watcher applies what the install changed
         self._change_virtual_env(self.current_dir, self.current_virtual_env)
 
-    @pyqtSlot(int, str, str, QPushButton)
-    def on_uninstall_finished(self, success, package_name, python_path, uninstall_button: QPushButton):
-
-        def _pop_item_in_sometime(self):
-            listItem = self.item_map.pop(package_name)
-            if listItem:
-                row = self.library_list.row(listItem[1])
-                self.library_list.takeItem(row)
-        if success:
-            uninstall_button.setIcon(
-                QIcon(resource_path(self.config.get('paths', {}).get('assets', {}).get('images', {}).get('uninstalled', '')))
-            )
-            QTimer.singleShot(2000, lambda: _pop_item_in_sometime(self))
-        else:
-            uninstall_button.setIcon(
-                QIcon(resource_path(self.config.get('paths', {}).get('assets', {}).get('images', {}).get('failed', '')))
-            )
-            uninstall_button.setEnabled(False)
+    def _on_uninstall_progress(self, package_name, phase):
+        self.library_model.setStatus(package_name, "uninstalling", phase)
+
+    @pyqtSlot(str, dict)
+    def on_uninstall_finished(self, python_path, results):
+        uninstalled = [package_name for package_name, success in results.items() if success]
+        for package_name, success in results.items():
+            self.library_model.setStatus(package_name, "uninstalled" if success else "failed")
+        if uninstalled:
+            # All the rows go in one update once the icons had time to show
+            QTimer.singleShot(2000, lambda: self.library_model.removeItems(uninstalled))
+        if self.uninstall_manager is not None:
+            self.uninstall_manager.wait()
+            self.uninstall_manager.deleteLater()
         self.uninstall_manager = None
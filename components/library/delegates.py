@@ -0,0 +1,150 @@
+from PyQt6.QtCore import QEvent, QModelIndex, QPoint, QRect, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter, QPainterPath, QPixmap
+from PyQt6.QtWidgets import QStyle, QStyledItemDelegate
+from ..widgets.helper_classes import draw_progress_arc
+from ..widgets.tooltip import InteractiveToolTip
+from .models import DataRole
+from .utils import library_tooltip_html
+from helpers.pip_runner import phase_fraction
+from helpers.utils import resource_path
+
+
+class LibraryItemDelegate(QStyledItemDelegate):
+    """
+    A custom QStyledItemDelegate painting an installed package row in the Library page.
+
+    A row shows the size, name, license and version of the package with an
+    uninstall icon on the right, all painted from the model data, so only the
+    rows on screen cost anything. One tooltip is shared by every row.
+
+    Signals:
+        uninstall_clicked (str): Emitted with the package name when its uninstall icon is clicked.
+    """
+    uninstall_clicked = pyqtSignal(str)
+    ROW_HEIGHT = 55
+    SIZE_WIDTH = 60
+    ICON_SIZE = 22
+
+    def __init__(self, config: dict, parent = None):
+        super().__init__(parent)
+        self.config = config
+        self.tooltip = InteractiveToolTip(parent)
+        self.tooltip.set_object_name("listLibraryWidgetToolTip")
+        self.color_hover = QColor(self.config.get('ui', {}).get(
+            "colors", {}).get("background", {}).get("hover", QColor(255, 255, 255))
+        )
+        self.color_selected = QColor(self.config.get('ui', {}).get(
+            "colors", {}).get("background", {}).get("pressed", QColor(85, 85, 85))
+        )
+        self.text_color = QColor(
+            self.config.get('ui', {}).get("colors", {}).get("text", {}).get("normal", QColor(0, 0, 0))
+        )
+        self.color_muted = QColor(
+            self.config.get('ui', {}).get("colors", {}).get("text", {}).get("muted", QColor(128, 128, 128))
+        )
+        self.color_bright = QColor(
+            self.config.get('ui', {}).get("colors", {}).get("text", {}).get("bright", QColor(255, 255, 255))
+        )
+        self.rounded_corner_radius = self.config.get("ui", {}).get(
+            "window", {}).get("installer", {}).get('roundedCornerRadius', 8)
+        # Loaded once, instead of once per row
+        images = self.config.get("paths", {}).get("assets", {}).get("images", {})
+        self.status_pixmaps = {
+            status: QPixmap(resource_path(images.get(status, "")))
+            for status in ("uninstall", "uninstalling", "uninstalled", "failed")
+        }
+
+    def _uninstall_rect(self, rect: QRect) -> QRect:
+        return QRect(
+            rect.right() - self.ICON_SIZE - 15,
+            rect.center().y() - self.ICON_SIZE // 2,
+            self.ICON_SIZE,
+            self.ICON_SIZE
+        )
+
+    def paint(self, painter: QPainter, option, index): #type: ignore
+        item_data = index.data(DataRole)
+        if not item_data:
+            return
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = option.rect
+        if option.state & (QStyle.StateFlag.State_Selected | QStyle.StateFlag.State_MouseOver):
+            path = QPainterPath()
+            path.addRoundedRect(rect.toRectF(), self.rounded_corner_radius, self.rounded_corner_radius)
+            selected = option.state & QStyle.StateFlag.State_Selected
+            painter.fillPath(path, self.color_selected if selected else self.color_hover)
+
+        # Item layout, the same proportions the row widgets used to have
+        padding = 10
+        uninstall_rect = self._uninstall_rect(rect)
+        size_rect = QRect(rect.left() + padding, rect.top(), self.SIZE_WIDTH, rect.height())
+        content_left = size_rect.right() + padding * 2
+        content_width = uninstall_rect.left() - 100 - content_left
+        name_rect = QRect(content_left, rect.top(), int(content_width * 0.4), rect.height())
+        license_rect = QRect(name_rect.right() + padding, rect.top(), int(content_width * 0.4) - padding, rect.height())
+        version_rect = QRect(license_rect.right() + padding, rect.top(), int(content_width * 0.2), rect.height())
+        v_center = Qt.AlignmentFlag.AlignVCenter
+
+        painter.setPen(self.color_muted)
+        painter.drawText(size_rect, v_center | Qt.AlignmentFlag.AlignLeft, item_data['size_label'])
+        painter.setPen(self.color_bright)
+        painter.drawLine(size_rect.right(), rect.top() + padding, size_rect.right(), rect.bottom() - padding)
+
+        painter.setPen(self.text_color)
+        painter.drawText(name_rect, v_center | Qt.AlignmentFlag.AlignLeft,
+                         painter.fontMetrics().elidedText(item_data.get('name', ""), Qt.TextElideMode.ElideRight, name_rect.width()))
+
+        oldfont = painter.font()
+        font = QFont(oldfont)
+        if font.pointSizeF() > 0:
+            font.setPointSizeF(font.pointSizeF() * 0.85)
+        painter.setFont(font)
+        painter.setPen(self.color_muted)
+        painter.drawText(license_rect, v_center | Qt.AlignmentFlag.AlignLeft,
+                         painter.fontMetrics().elidedText(item_data['license_label'], Qt.TextElideMode.ElideRight, license_rect.width()))
+
+        font = QFont(oldfont)
+        font.setItalic(True)
+        painter.setFont(font)
+        painter.drawText(version_rect, v_center | Qt.AlignmentFlag.AlignHCenter, item_data.get('version', ""))
+        painter.setFont(oldfont)
+
+        pixmap = self.status_pixmaps.get(item_data.get('status', "uninstall"))
+        if pixmap is not None and not pixmap.isNull():
+            painter.drawPixmap(uninstall_rect, pixmap)
+        if item_data.get('status') == "uninstalling":
+            draw_progress_arc(painter, uninstall_rect, phase_fraction(item_data.get('phase', "")), self.color_muted)
+        painter.restore()
+
+    def helpEvent(self, event, view, option, index) -> bool:
+        if event.type() == QEvent.Type.ToolTip: #type: ignore
+            item_data = index.data(DataRole)
+            if not item_data:
+                self.tooltip.hide()
+                return True
+
+            target = view.viewport() #type: ignore
+            self.tooltip.set_content(lambda: library_tooltip_html(item_data))
+            self.tooltip.schedule_show(lambda: library_tooltip_html(item_data), event.globalPos() + QPoint(15, 15), target) #type: ignore
+            return True
+
+        self.tooltip.hide()
+        return super().helpEvent(event, view, option, index)
+
+    def editorEvent(self, event, model, option, index: QModelIndex) -> bool:
+        if event.type() == QEvent.Type.MouseMove: # type: ignore
+            if option.widget:
+                option.widget.update(index) # type: ignore
+
+        item_data = index.data(DataRole)
+        if item_data and item_data.get("status", "uninstall") == "uninstall":
+            if event.type() == QEvent.Type.MouseButtonRelease: # type: ignore
+                if self._uninstall_rect(option.rect).adjusted(-5, -5, 5, 5).contains(event.pos()): # type: ignore
+                    self.uninstall_clicked.emit(item_data['name'])
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.ROW_HEIGHT)
@@ -0,0 +1,177 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QVariant, Qt
+from .utils import license_label, plain_size
+
+DataRole = Qt.ItemDataRole.UserRole + 1
+
+
+class InstalledLibraryModel(QAbstractTableModel):
+    """
+    A QAbstractTableModel holding the packages installed in the selected virtual environment.
+
+    Each row is the package metadata from `library-loader`, plus the values the
+    delegate paints, worked out once when the rows are set: 'size_label',
+    'license_label' and the uninstall 'status' ('uninstall', 'uninstalling',
+    'uninstalled' or 'failed', with the pip 'phase' while uninstalling). The full row is returned for `DataRole`, the
+    columns only matter for sorting and accessibility.
+    """
+    COLUMNS = ("name", "version", "size", "license")
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self._data = []
+        self.name_to_row = {}
+
+    def rowCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(self._data)
+
+    def columnCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._data)):
+            return QVariant()
+
+        row_item = self._data[index.row()]
+        if role == DataRole:
+            return row_item
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = self.COLUMNS[index.column()]
+            if column == "size":
+                return row_item['size_label']
+            if column == "license":
+                return row_item['license_label']
+            return row_item.get(column, '')
+
+        return QVariant()
+
+    def headerData(self, section, orientation, role = Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section].capitalize()
+        return QVariant()
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
+
+    @staticmethod
+    def _row(item: dict) -> dict:
+        return dict(item, size_label=plain_size(item.get('size', 0)),
+                    license_label=license_label(item), status="uninstall", phase="")
+
+    def setItems(self, items: list):
+        """Replaces the rows with the metadata of a freshly loaded environment."""
+        self.beginResetModel()
+        self._data = [self._row(item) for item in items]
+        self.name_to_row = {item['name']: row for row, item in enumerate(self._data)}
+        self.endResetModel()
+
+    def appendItems(self, items: list):
+        """Adds a batch of rows while an environment is still being loaded."""
+        items = [item for item in items if item['name'] not in self.name_to_row]
+        if not items:
+            return
+        first = len(self._data)
+        self.beginInsertRows(QModelIndex(), first, first + len(items) - 1)
+        for row, item in enumerate(items, first):
+            self._data.append(self._row(item))
+            self.name_to_row[item['name']] = row
+        self.endInsertRows()
+
+    def updateSizes(self, sizes: dict):
+        """Fills in sizes that arrive after their rows, `sizes` maps names to bytes."""
+        changed = []
+        for name, size in sizes.items():
+            row = self.name_to_row.get(name)
+            if row is None:
+                continue
+            self._data[row]['size'] = size
+            self._data[row]['size_label'] = plain_size(size)
+            changed.append(row)
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), len(self.COLUMNS) - 1))
+
+    def upsertItems(self, items: list):
+        """Applies re-read packages, rows already there are updated in place and new ones appended."""
+        new_items = []
+        for item in items:
+            row = self.name_to_row.get(item['name'])
+            if row is None:
+                new_items.append(item)
+                continue
+            self._data[row] = self._row(item)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+        self.appendItems(new_items)
+
+    def status(self, name: str) -> str | None:
+        row = self.name_to_row.get(name)
+        return None if row is None else self._data[row]['status']
+
+    def setStatus(self, name: str, status: str, phase: str = ""):
+        """Sets a row's uninstall status, and the pip phase it is in while uninstalling."""
+        row = self.name_to_row.get(name)
+        if row is None:
+            return
+        self._data[row]['status'] = status
+        self._data[row]['phase'] = phase
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def removeItem(self, name: str):
+        self.removeItems([name])
+
+    def removeItems(self, names: list):
+        """Removes rows by name, one removal per run of adjacent rows."""
+        rows = sorted(self.name_to_row[name] for name in set(names) if name in self.name_to_row)
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        # Bottom up, so the rows still to remove keep their numbers
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._data[first:last + 1]
+            self.endRemoveRows()
+        if ranges:
+            self.name_to_row = {item['name']: i for i, item in enumerate(self._data)}
+
+
+class LibraryFilterProxyModel(QSortFilterProxyModel):
+    """
+    Filters and orders the installed packages for the search bar.
+
+    Without a query rows are sorted by name; with one, only names containing it
+    (case-insensitive) are kept, ranked by where the query starts in the name,
+    the same order `rank_query` gives. Changing the query only invalidates the
+    proxy, the source rows and the view's items are never rebuilt.
+    """
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.query = ""
+        self._keys = {}
+
+    def set_query(self, query: str):
+        self.query = query.lower()
+        self._keys.clear()
+        self.invalidate()
+
+    def _sort_key(self, source_row: int):
+        key = self._keys.get(source_row)
+        if key is None:
+            name = self.sourceModel().index(source_row, 0).data(DataRole)['name'].lower()
+            key = (name.find(self.query) if self.query else 0, name)
+            self._keys[source_row] = key
+        return key
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.query:
+            return True
+        return self._sort_key(source_row)[0] != -1
+
+    def lessThan(self, left, right):
+        return self._sort_key(left.row()) < self._sort_key(right.row())
+
+    def setSourceModel(self, source_model):
+        super().setSourceModel(source_model)
+        # Keys are per source row, which move when rows are reset or removed
+        source_model.modelAboutToBeReset.connect(lambda: self._keys.clear())
+        source_model.rowsAboutToBeRemoved.connect(lambda *_: self._keys.clear())
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from .threads import load_installed
+
+
+class EnvironmentPrefetcher(QObject):
+    """
+    Loads every virtual environment of the selected directory in the background.
+
+    Package lists are kept in memory by venv path, so switching environments in the
+    Library page is a model swap instead of a spinner. Loads run on a pool of
+    `max_workers` threads (each one mostly waits on library-loader); a venv is never
+    loaded twice at the same time. `revalidate` loads a cached venv again, and
+    `loaded` is emitted with every finished load, so the page can apply what changed.
+
+    Signals:
+        loaded (str, list): Emitted with the venv path and its `installed` list.
+    """
+    loaded = pyqtSignal(str, list)
+    _finished = pyqtSignal(str, object)
+
+    def __init__(self, load_library_exe: str, scan_cache_dir: str, size_mode: str = "record",
+                 backend: str = "go", max_workers: int = 3, parent = None):
+        super().__init__(parent)
+        self.load_library_exe = load_library_exe
+        self.scan_cache_dir = scan_cache_dir
+        self.size_mode = size_mode
+        self.backend = backend
+        self.cache = {}
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="venv-prefetch")
+        # Emitted from the pool, so the slot runs on the GUI thread
+        self._finished.connect(self._on_finished)
+
+    def get(self, venv_path: str) -> list | None:
+        return self.cache.get(venv_path)
+
+    def put(self, venv_path: str, installed: list):
+        self.cache[venv_path] = installed
+
+    def _submit(self, venv_path: str):
+        if venv_path in self._pending:
+            return
+        self._pending.add(venv_path)
+
+        def load():
+            try:
+                installed = load_installed(venv_path, self.load_library_exe, self.scan_cache_dir, self.size_mode, self.backend)
+            except Exception as e:
+                print(f"Failed to prefetch {venv_path}: {e}")
+                installed = None
+            self._finished.emit(venv_path, installed)
+
+        self._executor.submit(load)
+
+    def prefetch(self, venv_paths: list):
+        """Loads the venvs that are not cached yet."""
+        for venv_path in venv_paths:
+            if venv_path not in self.cache:
+                self._submit(venv_path)
+
+    def revalidate(self, venv_path: str):
+        """Loads a venv again even though it is cached, `loaded` tells what it holds now."""
+        self._submit(venv_path)
+
+    def _on_finished(self, venv_path: str, installed):
+        self._pending.discard(venv_path)
+        if installed is None:
+            return
+        self.cache[venv_path] = installed
+        self.loaded.emit(venv_path, installed)
+
+    def stop(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
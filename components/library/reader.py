@@ -0,0 +1,104 @@
+import glob
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import HeaderParser
+
+from .sizing import distribution_size
+
+# METADATA headers read into the metadata dict, as (header, key, is a list)
+METADATA_FIELDS = (
+    ("Name", "name", False),
+    ("Version", "version", False),
+    ("Summary", "summary", False),
+    ("Author", "author", False),
+    ("License", "license", False),
+    ("License-Expression", "license_expression", False),
+    ("License-File", "license_file", True),
+    ("Classifier", "classifier", True),
+    ("Requires-Dist", "requires_dist", True),
+    ("Requires-Python", "requires_python", False),
+    ("Project-URL", "project_url", True),
+    ("Provides-Extra", "provides_extra", True),
+)
+
+
+def find_site_packages(venv_path: str) -> str | None:
+    """
+    Locates the site-packages of a virtual environment from its layout, without running it.
+
+    `pyvenv.cfg` gives the Python version (`version` or `version_info`), which names
+    `lib/pythonX.Y/site-packages` on POSIX; Windows venvs use `Lib/site-packages`.
+    """
+    candidates = [os.path.join(venv_path, "Lib", "site-packages")]
+    version = ""
+    try:
+        with open(os.path.join(venv_path, "pyvenv.cfg"), "r", encoding="utf-8") as file:
+            for line in file:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info") and not version:
+                    version = value.strip()
+    except OSError:
+        pass
+    if version:
+        major_minor = ".".join(version.split(".")[:2])
+        candidates.insert(0, os.path.join(venv_path, "lib", f"python{major_minor}", "site-packages"))
+        candidates.insert(1, os.path.join(venv_path, "lib", f"python{major_minor}t", "site-packages"))
+    candidates.extend(sorted(glob.glob(os.path.join(venv_path, "lib", "python3*", "site-packages")), reverse=True))
+    return next((path for path in candidates if os.path.isdir(path)), None)
+
+
+def read_metadata(metadata_path: str) -> dict:
+    """Parses the headers of a METADATA / PKG-INFO file into the metadata dict `pip inspect` gives."""
+    with open(metadata_path, "r", encoding="utf-8", errors="replace") as file:
+        headers = HeaderParser().parse(file)
+    metadata = {}
+    for header, key, is_list in METADATA_FIELDS:
+        values = [str(value).strip() for value in (headers.get_all(header) or [])]
+        metadata[key] = values if is_list else (values[0] if values else "")
+    return metadata
+
+
+def read_distribution(site_packages: str, metadata_location: str, size_mode: str = "record") -> dict | None:
+    """Reads one *.dist-info / *.egg-info directory into an entry of library-loader's `installed` list."""
+    metadata_file = "PKG-INFO" if metadata_location.endswith(".egg-info") else "METADATA"
+    try:
+        metadata = read_metadata(os.path.join(metadata_location, metadata_file))
+    except OSError as e:
+        print(f"Error reading {metadata_location}: {e}", file=sys.stderr)
+        return None
+    if not metadata['name']:
+        return None
+    metadata['size'] = distribution_size(site_packages, metadata_location, size_mode)
+    try:
+        with open(os.path.join(metadata_location, "INSTALLER"), "r") as file:
+            installer = file.read().strip()
+    except OSError:
+        installer = ""
+    return {
+        'metadata': metadata,
+        'metadata_location': metadata_location,
+        'installer': installer,
+        'requested': os.path.exists(os.path.join(metadata_location, "REQUESTED")),
+    }
+
+
+def read_installed(venv_path: str, size_mode: str = "record", max_workers: int = 8) -> list:
+    """
+    Lists the distributions installed in a virtual environment, in process.
+
+    The alternative to library-loader: no interpreter is started and pip is not
+    imported; every metadata directory in site-packages is read and sized on a
+    thread pool. Returns the same list as library-loader's `installed`, sorted by
+    name, or an empty list when no site-packages is found.
+    """
+    site_packages = find_site_packages(venv_path)
+    if site_packages is None:
+        return []
+    metadata_locations = [
+        entry.path for entry in os.scandir(site_packages)
+        if entry.name.endswith((".dist-info", ".egg-info")) and entry.is_dir()
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        installed = executor.map(lambda location: read_distribution(site_packages, location, size_mode), metadata_locations)
+        return sorted((item for item in installed if item), key=lambda item: item['metadata']['name'].lower())
@@ -0,0 +1,78 @@
+import csv
+import os
+
+# How installed distributions are sized, the same modes as library-loader's -size flag
+SIZE_MODES = ("walk", "record")
+
+
+def _record_rows(dist_info: str):
+    with open(os.path.join(dist_info, "RECORD"), "r", encoding="utf-8", newline="") as file:
+        yield from csv.reader(file)
+
+
+def _inside(site_packages: str, relative_path: str) -> str | None:
+    base = os.path.normpath(site_packages)
+    file_path = os.path.normpath(os.path.join(base, relative_path))
+    return file_path if file_path.startswith(base + os.sep) else None
+
+
+def record_size(site_packages: str, dist_info: str) -> int | None:
+    """
+    Sums the size column of RECORD for the files inside site-packages.
+
+    Rows without a size (usually .pyc files compiled at install time) are stat-ed
+    instead, so each file is counted once and nothing is walked. Returns None when
+    the distribution has no RECORD.
+    """
+    total_size = 0
+    try:
+        for row in _record_rows(dist_info):
+            if not row or not row[0]:
+                continue
+            file_path = _inside(site_packages, row[0])
+            if file_path is None:
+                # Scripts and data files outside site-packages are not counted, like the walk
+                continue
+            if len(row) >= 3 and row[2].isdigit():
+                total_size += int(row[2])
+                continue
+            try:
+                total_size += os.stat(file_path).st_size
+            except OSError:
+                pass
+    except OSError:
+        return None
+    return total_size
+
+
+def _walk(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total_size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total_size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total_size
+
+
+def walk_size(site_packages: str, dist_info: str) -> int:
+    """Walks every top level path RECORD mentions, or the metadata directory without one."""
+    top_levels = set()
+    try:
+        for row in _record_rows(dist_info):
+            if row and row[0] and _inside(site_packages, row[0]) is not None:
+                top_levels.add(os.path.join(site_packages, row[0].split("/")[0]))
+    except OSError:
+        top_levels = {dist_info}
+    return sum(_walk(path) for path in top_levels)
+
+
+def distribution_size(site_packages: str, dist_info: str, mode: str = "record") -> int:
+    if mode == "record":
+        size = record_size(site_packages, dist_info)
+        if size is not None:
+            return size
+    return walk_size(site_packages, dist_info)
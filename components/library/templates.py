@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+# The template's directory name, distinctive so it is only ever replaced where it is the prompt
+TEMPLATE_NAME = "p4cman-template-venv"
+MARKER_FILE = "template.json"
+# Scripts are small, anything bigger in bin/ is an executable that does not mention the venv
+MAX_SCRIPT_SIZE = 1024 * 1024
+
+# Environments are created on more than one thread, a template is built once
+_build_lock = threading.Lock()
+
+
+def bin_directory(venv_path: str) -> str:
+    return os.path.join(venv_path, "Scripts" if os.name == "nt" else "bin")
+
+
+def pyvenv_version(config_path: str) -> str:
+    """venv writes `version = 3.12.1`, virtualenv and uv `version_info = 3.12.1.final.0`."""
+    try:
+        with open(config_path, "r", encoding="utf-8") as file:
+            for line in file:
+                key, found, value = line.partition("=")
+                if found and key.strip() in ("version", "version_info"):
+                    return ".".join(value.strip().split(".")[:3])
+    except OSError:
+        pass
+    return ""
+
+
+def _first_executable(directory: str, names: list) -> str:
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return ""
+
+
+def describe_venv(venv_path: str) -> dict | None:
+    """The entry env-finder would list for a virtual environment, None when it would not list it."""
+    bin_dir = bin_directory(venv_path)
+    suffix = ".exe" if os.name == "nt" else ""
+    python_path = _first_executable(bin_dir, [f"python{suffix}", f"python3{suffix}"])
+    pip_path = _first_executable(bin_dir, [f"pip{suffix}", f"pip3{suffix}"])
+    python_version = pyvenv_version(os.path.join(venv_path, "pyvenv.cfg"))
+    if not (python_path and pip_path and python_version):
+        return None
+    return {
+        'venv_name': os.path.basename(venv_path),
+        'venv_path': venv_path,
+        'python_version': python_version,
+        'pip_path': pip_path,
+        'python_path': python_path,
+    }
+
+
+def _link_or_copy(source: str, destination: str):
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Another volume, or a filesystem without hard links
+        shutil.copy2(source, destination)
+
+
+def _rewrite(file_path: str, replacements: list):
+    """Replaces the template's path and name in a file, written anew so a hard-linked original is untouched."""
+    try:
+        if os.path.islink(file_path) or os.path.getsize(file_path) > MAX_SCRIPT_SIZE:
+            return
+        with open(file_path, "rb") as file:
+            content = file.read()
+    except OSError:
+        return
+    rewritten = content
+    for old, new in replacements:
+        rewritten = rewritten.replace(old, new)
+    if rewritten == content:
+        return
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(rewritten)
+    shutil.copymode(file_path, temp_path)
+    os.replace(temp_path, file_path)
+
+
+class VenvTemplates:
+    """
+    Creates virtual environments by cloning a pristine one per interpreter.
+
+    The first environment made with an interpreter runs `python -m venv` once, into
+    `<directory>/<hash of the interpreter>/`, and every environment after that is a
+    copy of it: no interpreter starts and pip is not bootstrapped again. The template
+    is rebuilt when the interpreter's inode or mtime changes (it was upgraded).
+
+    Only pyvenv.cfg and the scripts in bin/ mention where the environment lives
+    (activate's VIRTUAL_ENV and prompt, the shebang of pip), they are rewritten for
+    the new path. With `hardlink`, everything else is hard-linked instead of copied:
+    pip and Python replace files instead of writing into them, so the template
+    never sees the changes made to a clone.
+    """
+    def __init__(self, directory: str, hardlink: bool = True):
+        self.directory = directory
+        self.hardlink = hardlink
+
+    def _template_root(self, python_path: str) -> str:
+        digest = hashlib.sha1(os.path.realpath(python_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:16])
+
+    @staticmethod
+    def _stamp(python_path: str) -> dict:
+        stat = os.stat(os.path.realpath(python_path))
+        return {'python': os.path.realpath(python_path), 'inode': stat.st_ino, 'mtime': stat.st_mtime_ns}
+
+    def template(self, python_path: str) -> str | None:
+        """The template venv of an interpreter, built first when missing or stale. None when venv fails."""
+        root = self._template_root(python_path)
+        template_path = os.path.join(root, TEMPLATE_NAME)
+        marker_path = os.path.join(root, MARKER_FILE)
+        try:
+            stamp = self._stamp(python_path)
+        except OSError:
+            return None
+        with _build_lock:
+            try:
+                with open(marker_path, "r") as file:
+                    if json.load(file) == stamp and os.path.isdir(template_path):
+                        return template_path
+            except (OSError, ValueError):
+                pass
+            # The marker is written last, a template without one is a partial build
+            shutil.rmtree(root, ignore_errors=True)
+            os.makedirs(root, exist_ok=True)
+            result = subprocess.run(
+                [python_path, "-m", "venv", template_path], capture_output=True, text=True, check=False
+            )
+            if result.returncode != 0 or describe_venv(template_path) is None:
+                print(f"Failed to build the venv template: {result.stderr.strip()}")
+                shutil.rmtree(root, ignore_errors=True)
+                return None
+            with open(marker_path, "w") as file:
+                json.dump(stamp, file)
+        return template_path
+
+    def clone(self, python_path: str, venv_path: str) -> bool:
+        """Creates `venv_path` from the interpreter's template, False when it could not."""
+        # Launchers on Windows carry their shebang inside the .exe, they are not rewritten
+        if sys.platform == "win32" or os.path.exists(venv_path):
+            return False
+        template_path = self.template(python_path)
+        if template_path is None:
+            return False
+        replacements = [
+            (template_path.encode("utf-8"), os.path.abspath(venv_path).encode("utf-8")),
+            (TEMPLATE_NAME.encode("utf-8"), os.path.basename(venv_path).encode("utf-8")),
+        ]
+        try:
+            shutil.copytree(
+                template_path, venv_path, symlinks=True,
+                copy_function=_link_or_copy if self.hardlink else shutil.copy2
+            )
+            _rewrite(os.path.join(venv_path, "pyvenv.cfg"), replacements)
+            bin_dir = bin_directory(venv_path)
+            for name in os.listdir(bin_dir):
+                _rewrite(os.path.join(bin_dir, name), replacements)
+        except OSError as e:
+            print(f"Failed to clone the venv template: {e}")
+            shutil.rmtree(venv_path, ignore_errors=True)
+            return False
+        return True
@@ -1,33 +1,128 @@
 import json
 import os
+import queue
 import subprocess
+import threading
+import time
 from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
-from PyQt6.QtWidgets import QPushButton
+from helpers.pip_runner import UNINSTALL_PHASES, PipProgress, run_pip
+from helpers.utils import get_app_support_directory, normalize_name
+from .reader import read_installed
+from .sizing import SIZE_MODES
+from .templates import VenvTemplates, describe_venv
+
+# How new environments are made: clone a template hard-linking or copying its files, or `python -m venv`
+TEMPLATE_MODES = ("hardlink", "copy", "off")
+
+def scan_cache_directory(app_name: str = "P4cMan") -> str:
+    """Where library-loader keeps its per-venv scan snapshots."""
+    return os.path.join(get_app_support_directory(app_name), "library_scan")
+
+
+def env_scan_cache_directory(app_name: str = "P4cMan") -> str:
+    """Where env-finder keeps its per-directory scans."""
+    return os.path.join(get_app_support_directory(app_name), "env_scan")
+
+
+def venv_template_directory(app_name: str = "P4cMan") -> str:
+    """Where the template venv of every interpreter is kept."""
+    return os.path.join(get_app_support_directory(app_name), "venv_templates")
+
+
+def find_virtual_envs(directory: str, find_env_exe: str, max_depth: int = 2, workers: int = 8,
+                      scan_cache_dir: str = "") -> list:
+    """Runs env-finder on a directory, returning the virtual environments it found."""
+    command = [find_env_exe, f"-depth={max_depth}", f"-workers={workers}"]
+    if scan_cache_dir:
+        command.append(f"-cache-dir={scan_cache_dir}")
+    try:
+        result_venvs = subprocess.run(command + [directory], capture_output=True, text=True)
+    except OSError as e:
+        print(f"Failed to start env-finder: {e}")
+        return []
+    try:
+        return json.loads(result_venvs.stdout) or []
+    except json.JSONDecodeError:
+        return []
+
+
+def load_installed(venv_path: str, load_library_exe: str, scan_cache_dir: str,
+                   size_mode: str = "record", backend: str = "go") -> list:
+    """Loads the installed distributions of a venv in one go, with library-loader or the in-process reader."""
+    if backend == "python":
+        return read_installed(venv_path, size_mode)
+    try:
+        result_details = subprocess.run(
+            [load_library_exe, f"-cache-dir={scan_cache_dir}", f"-size={size_mode}", venv_path],
+            capture_output=True,
+            text=True,
+        )
+    except OSError as e:
+        print(f"Failed to start library-loader: {e}")
+        return []
+    if result_details.stderr:
+        print(result_details.stderr)
+    try:
+        return json.loads(result_details.stdout or "{}").get('installed') or []
+    except json.JSONDecodeError:
+        return []
+
+
+def _read_lines(stream, lines: queue.Queue):
+    """Hands every line of `stream` to `lines`, then None at the end."""
+    with stream:
+        for line in stream:
+            lines.put(line)
+    lines.put(None)
+
+
+def _uninstalled_names(log: list) -> set:
+    """Normalized names pip reported as uninstalled, or skipped because they were not installed."""
+    names = set()
+    for line in log:
+        line = line.strip()
+        if line.startswith("Successfully uninstalled "):
+            names.add(line[len("Successfully uninstalled "):].rsplit("-", 1)[0])
+        elif line.startswith("WARNING: Skipping ") and line.endswith(" as it is not installed."):
+            names.add(line[len("WARNING: Skipping "):-len(" as it is not installed.")])
+    return {normalize_name(name) for name in names}
+
 
 class Uninstall(QThread):
     """
     A QThread subclass to handle the uninstallation of Python packages.
-    It runs `pip uninstall` in a separate thread and emits a signal
-    with the result upon completion.
+    It runs one `pip uninstall` for all the libraries in a separate thread
+    and emits a signal with the result upon completion.
+
+    pip's output is read while it runs: `progress` reports each uninstall
+    starting, and the last lines are kept in `log`. pip stops at the first
+    library it fails to remove, so what it printed tells which ones are gone.
     """
-    finished = pyqtSignal(int, str, str, QPushButton) # (success_code, library_name, python_path, button)
+    finished = pyqtSignal(str, dict) # (python_path, {library_name: uninstalled})
+    progress = pyqtSignal(str, str) # (library_name, phase)
 
-    def __init__(self, python_path, library, uninstall_button):
+    def __init__(self, python_path, libraries: list):
         super().__init__()
         self.python_path = python_path
-        self.library = library
-        self.uninstall_button = uninstall_button
+        self.libraries = list(libraries)
+        self.log = []
 
     def run(self):
-        result = subprocess.run(
-            [self.python_path, "-m", "pip", "uninstall", "-y", self.library],
-            text=True,
-        )
+        pip_progress = PipProgress(self.libraries, UNINSTALL_PHASES)
+
+        def on_line(line: str):
+            for name, phase in pip_progress.feed(line).items():
+                self.progress.emit(name, phase)
 
-        if result.returncode == 0:
-            self.finished.emit(1, self.library, self.python_path, self.uninstall_button)
+        return_code, log = run_pip(self.python_path, ["uninstall", "-y", *self.libraries], on_line)
+        self.log = list(log)
+        if return_code == 0:
+            results = {library: True for library in self.libraries}
         else:
-            self.finished.emit(-1, self.library, self.python_path, self.uninstall_button)
+            print("\n".join(self.log))
+            uninstalled = _uninstalled_names(self.log)
+            results = {library: normalize_name(library) in uninstalled for library in self.libraries}
+        self.finished.emit(self.python_path, results)
 
 class LibraryWorker(QObject):
     """
@@ -38,93 +133,182 @@ class LibraryWorker(QObject):
     details_with_virtual_envs = pyqtSignal(str, list, list)
     new_virtual_env = pyqtSignal(int, str, str, list)
     virtual_envs = pyqtSignal(list)
-    details = pyqtSignal(list)
+    # Every details signal carries the venv path it is about
+    details = pyqtSignal(str, list)
+    details_started = pyqtSignal(str)
+    details_rows = pyqtSignal(str, list)
+    details_sizes = pyqtSignal(str, dict)
+    batch_size = 50
+    batch_interval = 0.1 # seconds
+
+    def __init__(self, app_name: str = "P4cMan", size_mode: str = "record", backend: str = "go",
+                 template_mode: str = "hardlink", parent = None):
+        super().__init__(parent)
+        self.scan_cache_dir = scan_cache_directory(app_name)
+        # "record" sums RECORD's size column, "walk" stats every file (see library-loader -size)
+        self.size_mode = size_mode if size_mode in SIZE_MODES else "record"
+        # "go" runs library-loader, "python" reads site-packages in process (see reader.py)
+        self.backend = backend
+        self.env_scan_cache_dir = env_scan_cache_directory(app_name)
+        # Depth and workers of the last discovery, reused after creating an environment
+        self.discovery_depth = 2
+        self.discovery_workers = 8
+        if template_mode not in TEMPLATE_MODES:
+            template_mode = "hardlink"
+        self.templates = None
+        if template_mode != "off":
+            self.templates = VenvTemplates(venv_template_directory(app_name), hardlink=template_mode == "hardlink")
+
     @pyqtSlot(str, str, str)
     def fetch_only_details(self, directory: str, load_library_exe: str, venv_name: str):
-        """only fetches details of the library by running the compiled Go Code"""
+        """
+        fetches details of the library, with the compiled Go Code or the in-process reader
+
+        With library-loader the rows arrive progressively: `details_started`, then batches
+        of `details_rows` (installed entries) and `details_sizes` ({name: size}), and
+        finally `details` with the complete list. The in-process reader only emits `details`.
+        """
+        venv_path = os.path.join(directory, venv_name)
         if directory == "" or venv_name == "":
-            self.details.emit([])
+            self.details.emit(venv_path, [])
             return
 
-        result_details = subprocess.run(
-            [load_library_exe, os.path.join(directory, venv_name)],
-            capture_output=True,
-            text=True,
-        )
-        if result_details.stderr:
-            print(result_details.stderr)
-        if result_details.stdout.strip() == "":
-            self.details.emit([])
+        if self.backend == "python":
+            self.details.emit(venv_path, read_installed(venv_path, self.size_mode))
             return
 
+        # library-loader keeps a snapshot per venv and only rescans the distributions that changed.
+        # With -stream every package is a line as soon as its metadata is known, sizes follow.
         try:
-            details = json.loads(result_details.stdout).get('installed', [])
-            self.details.emit(details)
-        except json.JSONDecodeError:
-            self.details.emit([])
+            process = subprocess.Popen(
+                [load_library_exe, f"-cache-dir={self.scan_cache_dir}", f"-size={self.size_mode}", "-stream",
+                 venv_path],
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+        except OSError as e:
+            print(f"Failed to start library-loader: {e}")
+            self.details.emit(venv_path, [])
             return
 
-    @pyqtSlot(str, str)
-    def fetch_virtual_envs(self, directory: str, find_env_exe: str):
-        """fetches virtual environments by running the compiled Go Code"""
+        self.details_started.emit(venv_path)
+        installed, all_sizes = {}, {}
+        rows, sizes = [], {}
+        last_flush = time.monotonic()
+        # Lines are read on their own thread, so rows are flushed on time even while library-loader is quiet
+        lines = queue.Queue()
+        reader = threading.Thread(target=_read_lines, args=(process.stdout, lines), daemon=True)
+        reader.start()
+        while True:
+            timeout = None
+            if rows or sizes:
+                timeout = max(0.0, self.batch_interval - (time.monotonic() - last_flush))
+            try:
+                line = lines.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_details(venv_path, rows, sizes)
+                rows, sizes = [], {}
+                last_flush = time.monotonic()
+                continue
+            if line is None:
+                break
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'installed' in response:
+                item = response['installed']
+                installed[item['metadata']['name']] = item
+                rows.append(item)
+            elif 'size' in response and response.get('name') in installed:
+                # Emitted rows are now read by the GUI thread, sizes are applied to copies at the end
+                all_sizes[response['name']] = sizes[response['name']] = response['size']
+            elif response.get('done'):
+                break
+            # Rows go to the UI in batches, not one queued signal per package
+            if len(rows) + len(sizes) >= self.batch_size or time.monotonic() - last_flush >= self.batch_interval:
+                self._flush_details(venv_path, rows, sizes)
+                rows, sizes = [], {}
+                last_flush = time.monotonic()
+        self._flush_details(venv_path, rows, sizes)
+        process.wait()
+        reader.join()
+        self.details.emit(venv_path, [
+            dict(item, metadata=dict(item['metadata'], size=all_sizes[name])) if name in all_sizes else item
+            for name, item in installed.items()
+        ])
+
+    def _flush_details(self, venv_path: str, rows: list, sizes: dict):
+        if rows:
+            self.details_rows.emit(venv_path, rows)
+        if sizes:
+            self.details_sizes.emit(venv_path, sizes)
+
+    @pyqtSlot(str, str, int, int)
+    def fetch_virtual_envs(self, directory: str, find_env_exe: str, max_depth: int = 2, workers: int = 8):
+        """
+        fetches virtual environments by running the compiled Go Code
+
+        env-finder searches `max_depth` levels below `directory` (-1 for no limit),
+        reading `workers` directories at a time. Its scan is cached per directory
+        and reused while none of the directories it looked at changed.
+        """
         if not directory or not find_env_exe:
             self.virtual_envs.emit([])
             return
-
-        result_venvs = subprocess.run(
-            [find_env_exe, directory],
-            capture_output=True,
-            text=True,
+        self.discovery_depth = max_depth
+        self.discovery_workers = workers
+        self.virtual_envs.emit(
+            find_virtual_envs(directory, find_env_exe, max_depth, workers, self.env_scan_cache_dir)
         )
-        if result_venvs.stdout.strip() == "":
-            self.virtual_envs.emit([])
-        try:
-            venvs = json.loads(result_venvs.stdout)
-            if venvs is None:
-                self.virtual_envs.emit([])
-            else:
-                self.virtual_envs.emit(venvs)
-            return
-        except json.JSONDecodeError:
-            self.virtual_envs.emit([])
-            return
 
     @pyqtSlot(str, str, str, str)
     def initialize_new_virtual_env(self, directory: str, python_path: str, virtual_env_name: str, find_env_exe: str):
         """
         Initializes a new virtual environment in the specified directory
         using the given Python path and virtual environment name.
-        After creation, it fetches and emits the updated list of virtual environments.
+
+        The environment is cloned from the interpreter's template venv (see templates.py),
+        `python -m venv` only runs when there is no template to clone. The new environment
+        is described directly, env-finder only runs when it cannot be.
 
         Emits:
         new_virtual_env (int, str, str, list): A signal indicating the status
         of the virtual environment creation.
         - (0, "", "", []) if initial validation fails (Needs to be fixed)
         - (1, directory, virtual_env_name, venvs) on successful creation,
-            containing the directory, name of the new venv, and the updated list of venvs.
+            containing the directory, name of the new venv, and a list holding its entry
+            (the whole directory's list when env-finder had to run).
+        - (-1, directory, virtual_env_name, [reason]) when the environment could not be created,
+            the list holding what went wrong for the error dialog.
         """
         if not (directory or python_path or virtual_env_name, find_env_exe):
             self.new_virtual_env.emit(1, "", "", "")
         self.new_virtual_env.emit(0, "", "", [])
-        is_pip_preset = subprocess.run([python_path, "-m", "pip", "--version"],
-            capture_output=True,
-            text=True,
-        )
-        if is_pip_preset.returncode == 1:
-            # requires python>=3.4
-            subprocess.run([python_path, "-m", "ensurepip", "--upgrade"])
-        subprocess.run([python_path, "-m", "venv", virtual_env_name], capture_output=True, text=True, check=False, cwd=directory)
-        result_venvs = subprocess.run(
-            [find_env_exe, directory],
-            capture_output=True,
-            text=True
+        venv_path = os.path.join(directory, virtual_env_name)
+        reason = f"{virtual_env_name} has no python or pip"
+        if self.templates is None or not self.templates.clone(python_path, venv_path):
+            # venv bootstraps pip into the environment itself
+            try:
+                result = subprocess.run(
+                    [python_path, "-m", "venv", virtual_env_name], capture_output=True, text=True, check=False, cwd=directory
+                )
+                if result.returncode != 0:
+                    reason = (result.stderr.strip().splitlines() or [f"python -m venv exited with {result.returncode}"])[-1]
+            except OSError as e:
+                reason = f"Could not start {python_path}: {e}"
+        venv = describe_venv(venv_path)
+        if venv is not None:
+            self.new_virtual_env.emit(1, directory, virtual_env_name, [venv])
+            return
+        # The new environment changed the directory's mtime, so its cached scan is not reused
+        venvs = find_virtual_envs(
+            directory, find_env_exe, self.discovery_depth, self.discovery_workers, self.env_scan_cache_dir
         )
-        try:
-
-            venvs = json.loads(result_venvs.stdout)
-        except json.JSONDecodeError:
-            venvs = []
-        self.new_virtual_env.emit(1, directory, virtual_env_name, venvs)
+        if any(env.get('venv_name') == virtual_env_name for env in venvs):
+            self.new_virtual_env.emit(1, directory, virtual_env_name, venvs)
+        else:
+            self.new_virtual_env.emit(-1, directory, virtual_env_name, [reason])
 
 class LibraryThreads(QObject):
     """
@@ -137,20 +321,26 @@ class LibraryThreads(QObject):
     new_virtual_env = pyqtSignal(int, str, str, list)
     details_with_virtual_envs = pyqtSignal(str, list, list)
     virtual_envs = pyqtSignal(list)
-    details = pyqtSignal(list)
+    details = pyqtSignal(str, list)
+    details_started = pyqtSignal(str)
+    details_rows = pyqtSignal(str, list)
+    details_sizes = pyqtSignal(str, dict)
     get_details = pyqtSignal(str, str, str)
-    get_virtual_envs = pyqtSignal(str, str)
+    get_virtual_envs = pyqtSignal(str, str, int, int)
     get_details_with_virtual_envs = pyqtSignal(str, str, str)
     create_virtual_env = pyqtSignal(str, str, str, str)
 
-    def __init__(self, parent = None):
+    def __init__(self, parent = None, size_mode: str = "record", backend: str = "go", template_mode: str = "hardlink"):
         super().__init__(parent)
         self.thread_library = QThread()
-        self.worker = LibraryWorker()
+        self.worker = LibraryWorker(size_mode=size_mode, backend=backend, template_mode=template_mode)
         self.worker.moveToThread(self.thread_library)
         self.worker.details_with_virtual_envs.connect(self.details_with_virtual_envs.emit)
         self.worker.virtual_envs.connect(self.virtual_envs.emit)
         self.worker.details.connect(self.details.emit)
+        self.worker.details_started.connect(self.details_started.emit)
+        self.worker.details_rows.connect(self.details_rows.emit)
+        self.worker.details_sizes.connect(self.details_sizes.emit)
         self.worker.new_virtual_env.connect(self.new_virtual_env.emit)
         self.thread_library.start()
         self.get_details.connect(self.worker.fetch_only_details)
@@ -160,8 +350,8 @@ class LibraryThreads(QObject):
     def emit_signal_for_details(self, directory, load_library_exe, venv_name):
         self.get_details.emit(directory, load_library_exe, venv_name)
 
-    def emit_signal_for_virtual_envs(self, directory, load_library_exe):
-        self.get_virtual_envs.emit(directory, load_library_exe)
+    def emit_signal_for_virtual_envs(self, directory, find_env_exe, max_depth = 2, workers = 8):
+        self.get_virtual_envs.emit(directory, find_env_exe, max_depth, workers)
 
     def emit_signal_for_details_with_virtual_envs(self, directory, load_library_exe, venv_name):
         self.get_details_with_virtual_envs.emit(directory, load_library_exe, venv_name)
@@ -1,3 +1,6 @@
+from ..widgets.tooltip import tooltip_html_cache
+
+
 def rank_query(dataList, query):
     """
     Ranks a list of data items based on a query string.
@@ -25,6 +28,21 @@ def rank_query(dataList, query):
     )
     return sorted_matches
 
+def _size_parts(size: int) -> tuple[str, str]:
+    if size/(1024*1024*1024)<0.1:
+        if size/(1024*1024)<0.1:
+            if size/(1024)<0.1:
+                if size < 0.1:
+                    return f"{size*8}", "b"
+                else:
+                    return f"{size:.2f}", "B"
+            else:
+                return f"{size / 1024:.2f}", "KB"
+        else:
+            return f"{size / (1024 * 1024):.2f}", "MB"
+    else:
+        return f"{size / (1024 * 1024 * 1024):.2f}", "GB"
+
 def human_readable_size(size: int) -> str:
     """
     Converts a size in bytes into a human-readable string with appropriate units.
@@ -40,19 +58,28 @@ def human_readable_size(size: int) -> str:
         str: A string representing the size with its unit,
              e.g., "1.23 <span style='font-size:8pt'>KB</span>".
     """
-    if size/(1024*1024*1024)<0.1:
-        if size/(1024*1024)<0.1:
-            if size/(1024)<0.1:
-                if size < 0.1:
-                    return f"{size*8} <span style='font-size:8pt'>b</span>"
-                else:
-                    return f"{size:.2f} <span style='font-size:8pt'>B</span>"
-            else:
-                return f"{size / 1024:.2f} <span style='font-size:8pt'>KB</span>"
-        else:
-            return f"{size / (1024 * 1024):.2f} <span style='font-size:8pt'>MB</span>"
-    else:
-        return f"{size / (1024 * 1024 * 1024):.2f} <span style='font-size:8pt'>GB</span>"
+    value, unit = _size_parts(size)
+    return f"{value} <span style='font-size:8pt'>{unit}</span>"
+
+def plain_size(size: int) -> str:
+    """The same as `human_readable_size` without markup, e.g. "1.23 KB", for text drawn by a delegate."""
+    value, unit = _size_parts(size)
+    return f"{value} {unit}"
+
+def license_label(item) -> str:
+    """The short license shown in the library list, from the OSI classifier, expression or license field."""
+    classifiers = item.get('classifier', [])
+    classifiers = classifiers if classifiers else []
+    license = ""
+    if item.get('license_expression', "") != "":
+        license = item['license_expression'].strip()
+    for classifier in classifiers:
+        if "License :: OSI Approved" in classifier:
+            license = classifier.split("::")[-1].strip()
+    if license == "" and item.get('license', "") != "":
+        license = item['license'].strip()
+    return license.replace("License", "").strip()
+
 
 def format_project_urls(urls):
     """Formats a list of project URLs into clickable <a> tags."""
@@ -132,3 +159,9 @@ def format_tooltip_html(item, font_family_name):
         </table>
     </div>
     """
+
+
+def library_tooltip_html(item, font_family_name: str = 'figtree') -> str:
+    """`format_tooltip_html`, memoized on (package, version)."""
+    key = ('library', item.get('name'), item.get('version'), None, font_family_name)
+    return tooltip_html_cache.get(key, lambda: format_tooltip_html(item, font_family_name))
@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from .reader import find_site_packages, read_distribution, read_metadata
+
+
+def _metadata_directories(site_packages: str) -> dict:
+    """Maps every *.dist-info / *.egg-info directory of site-packages to its mtime."""
+    directories = {}
+    try:
+        with os.scandir(site_packages) as entries:
+            for entry in entries:
+                if entry.name.endswith((".dist-info", ".egg-info")) and entry.is_dir():
+                    directories[entry.name] = entry.stat().st_mtime_ns
+    except OSError:
+        pass
+    return directories
+
+
+def _distribution_name(metadata_location: str) -> str:
+    metadata_file = "PKG-INFO" if metadata_location.endswith(".egg-info") else "METADATA"
+    try:
+        return read_metadata(os.path.join(metadata_location, metadata_file))['name']
+    except OSError:
+        return ""
+
+
+class SitePackagesWatcher(QObject):
+    """
+    Watches the site-packages of the environment on screen and reports what changed in it.
+
+    pip creates and removes the *.dist-info directories of what it installs, upgrades
+    and uninstalls, so a change to site-packages itself is all that is watched. The
+    events of one pip run come in bursts; they are coalesced until none has come for
+    `debounce` ms, then the metadata directories are listed again and compared with
+    the previous listing (name and mtime). Only the new or modified distributions are
+    read, on a background thread, whoever installed them: the app, pip in a terminal
+    or an IDE.
+
+    Signals:
+        changed (str, list, list): Emitted with the venv path, the re-read entries
+            (like library-loader's `installed`) and the names of the removed distributions.
+    """
+    changed = pyqtSignal(str, list, list)
+    _scanned = pyqtSignal(str, list, list)
+
+    def __init__(self, size_mode: str = "record", debounce: int = 500, parent = None):
+        super().__init__(parent)
+        self.size_mode = size_mode
+        self.venv_path = ""
+        self.site_packages = None
+        # Only touched on the executor's single thread, so scans never overlap
+        self._listing = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="site-packages-watcher")
+
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.directoryChanged.connect(self._on_directory_changed)
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setInterval(debounce)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self._rescan)
+        # Emitted from the executor, so the slot runs on the GUI thread
+        self._scanned.connect(self._on_scanned)
+
+    def watching(self) -> bool:
+        return self.site_packages is not None
+
+    def watch(self, venv_path: str):
+        """Starts watching a venv's site-packages, the one watched before is dropped."""
+        if venv_path == self.venv_path and self.watching():
+            return
+        self.unwatch()
+        site_packages = find_site_packages(venv_path)
+        if site_packages is None or not self.file_watcher.addPath(site_packages):
+            return
+        self.venv_path = venv_path
+        self.site_packages = site_packages
+        self._executor.submit(self._take_listing, site_packages)
+
+    def unwatch(self):
+        if self.file_watcher.directories():
+            self.file_watcher.removePaths(self.file_watcher.directories())
+        self.debounce_timer.stop()
+        self.venv_path = ""
+        self.site_packages = None
+
+    def _take_listing(self, site_packages: str):
+        self._listing = {
+            directory: (mtime, _distribution_name(os.path.join(site_packages, directory)))
+            for directory, mtime in _metadata_directories(site_packages).items()
+        }
+
+    def _diff(self, venv_path: str, site_packages: str):
+        current = _metadata_directories(site_packages)
+        removed = [name for directory, (_, name) in self._listing.items() if directory not in current and name]
+        entries = []
+        listing = {}
+        for directory, mtime in current.items():
+            previous = self._listing.get(directory)
+            if previous is not None and previous[0] == mtime:
+                listing[directory] = previous
+                continue
+            entry = read_distribution(site_packages, os.path.join(site_packages, directory), self.size_mode)
+            listing[directory] = (mtime, entry['metadata']['name'] if entry else "")
+            if entry:
+                entries.append(entry)
+        self._listing = listing
+
+        # An upgrade removes the old version's directory, the package itself is still there
+        upgraded = {entry['metadata']['name'] for entry in entries}
+        removed = [name for name in removed if name not in upgraded]
+        if entries or removed:
+            self._scanned.emit(venv_path, entries, removed)
+
+    def _on_directory_changed(self, path: str):
+        if path == self.site_packages:
+            self.debounce_timer.start()
+
+    def _rescan(self):
+        if self.watching():
+            self._executor.submit(self._diff, self.venv_path, self.site_packages)
+
+    def _on_scanned(self, venv_path: str, entries: list, removed: list):
+        if venv_path == self.venv_path:
+            self.changed.emit(venv_path, entries, removed)
+
+    def stop(self):
+        self.unwatch()
+        self._executor.shutdown(wait=False, cancel_futures=True)
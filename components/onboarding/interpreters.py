@@ -0,0 +1,148 @@
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+PYTHON_EXECUTABLE = re.compile(r"^python(2|3)(\.\d+t?)?(\.exe)?$")
+DEFAULT_SEARCH_PATHS = {
+    "darwin": [
+        "/Library/Frameworks/Python.framework/Versions/*/bin",
+        "/opt/homebrew/bin",
+        "/usr/local/bin",
+        "/usr/bin",
+    ],
+    "linux": [
+        "/usr/bin",
+        "/usr/local/bin",
+        "/opt/*/bin",
+        "~/.local/bin",
+    ],
+}
+# Where version managers keep the interpreters their shims dispatch to
+VERSION_MANAGER_PATHS = [
+    os.path.join(os.environ.get("PYENV_ROOT", "~/.pyenv"), "versions", "*", "bin"),
+    os.path.join(os.environ.get("ASDF_DATA_DIR", "~/.asdf"), "installs", "python", "*", "bin"),
+]
+PROBE_TIMEOUT = 5 # seconds
+
+
+def search_paths(config: dict) -> list[str]:
+    """The directories to search on this platform, `paths.search` or the defaults."""
+    configured = config.get('paths', {}).get('search', {}).get(sys.platform)
+    if not isinstance(configured, list):
+        configured = DEFAULT_SEARCH_PATHS.get(sys.platform, [])
+    return configured
+
+
+def _directories(patterns: list[str]) -> list[str]:
+    directories = []
+    for pattern in patterns:
+        for directory in sorted(glob.glob(os.path.expanduser(pattern))):
+            if directory not in directories and os.path.isdir(directory):
+                directories.append(directory)
+    return directories
+
+
+def find_candidates(paths: list[str]) -> list[str]:
+    """
+    Lists the python executables in `paths`, then `$PATH`, then the pyenv / asdf installs.
+
+    Shims are skipped: they are scripts that start the version manager to pick an
+    interpreter, the interpreters they pick are listed from the installs instead.
+    Every interpreter is listed once, by the path its links resolve to.
+    """
+    candidates = []
+    seen = set()
+    path_directories = os.environ.get("PATH", "").split(os.pathsep)
+    for directory in _directories(list(paths) + path_directories + VERSION_MANAGER_PATHS):
+        if os.path.basename(directory) == "shims":
+            continue
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if not PYTHON_EXECUTABLE.match(entry.name):
+                continue
+            resolved = os.path.realpath(entry.path)
+            if resolved in seen or not os.path.isfile(resolved) or not os.access(resolved, os.X_OK):
+                continue
+            seen.add(resolved)
+            candidates.append(resolved)
+    return candidates
+
+
+def probe_version(executable: str) -> str | None:
+    """Runs `--version`, Python 2 prints it on stderr."""
+    try:
+        output = subprocess.run(
+            [executable, "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, timeout=PROBE_TIMEOUT
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output if output.startswith("Python ") else None
+
+
+class InterpreterRegistry:
+    """
+    The Python interpreters found on this machine, persisted between starts.
+
+    Each interpreter is stored under its resolved path with the inode and mtime it
+    had when `--version` was run. While both are unchanged the stored version is
+    used, so a start with nothing new installed runs no subprocess at all; new or
+    replaced interpreters are probed on a thread pool. Interpreters that are gone
+    are dropped from the file.
+    """
+    def __init__(self, file_path: str, max_workers: int = 8):
+        self.file_path = file_path
+        self.max_workers = max_workers
+
+    def _load(self) -> dict:
+        try:
+            with open(self.file_path, "r") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, entries: dict):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        temp_path = f"{self.file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(entries, file, indent=4)
+        os.replace(temp_path, self.file_path)
+
+    def discover(self, paths: list[str]) -> dict[str, str]:
+        """Returns {resolved path: "Python X.Y.Z"} for every interpreter found in `paths`."""
+        stored = self._load()
+        entries = {}
+        to_probe = []
+        for executable in find_candidates(paths):
+            try:
+                stat = os.stat(executable)
+            except OSError:
+                continue
+            entry = {'inode': stat.st_ino, 'mtime': stat.st_mtime_ns}
+            previous = stored.get(executable)
+            if previous and previous.get('inode') == entry['inode'] and previous.get('mtime') == entry['mtime']:
+                entries[executable] = previous
+            else:
+                entries[executable] = entry
+                to_probe.append(executable)
+
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(to_probe))) as executor:
+                for executable, version in zip(to_probe, executor.map(probe_version, to_probe)):
+                    # None when named like Python but not one, probed again only once it changes
+                    entries[executable]['version'] = version
+
+        if entries != stored:
+            try:
+                self._save(entries)
+            except OSError as e:
+                print(f"Failed to save interpreter registry: {e}")
+        return {executable: entry['version'] for executable, entry in entries.items() if entry.get('version')}
@@ -1,9 +1,22 @@
+import os
 from PyQt6.QtCore import  QThread, pyqtSignal
-from .utils import where_python_location
+from helpers.utils import get_app_support_directory
+from .interpreters import InterpreterRegistry
 
 class PythonInterpreters(QThread):
+    """
+    Finds the Python interpreters on this machine, through the persisted registry.
+
+    `search_paths` are searched before `$PATH` and the pyenv / asdf installs; only
+    interpreters that are new or changed since the last start run `--version`.
+    """
     finished = pyqtSignal(dict)
 
+    def __init__(self, search_paths: list[str] | None = None, app_name: str = "P4cMan", parent = None):
+        super().__init__(parent)
+        self.search_paths = search_paths or []
+        self.registry = InterpreterRegistry(os.path.join(get_app_support_directory(app_name), "interpreters.json"))
+
     def run(self):
-        where_python = where_python_location()
+        where_python = self.registry.discover(self.search_paths)
         self.finished.emit(where_python)
@@ -6,6 +6,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import  Qt, pyqtSignal, QEasingCurve, QPropertyAnimation
 from ..library.core import LibraryThreads
 from .threads import PythonInterpreters
+from .interpreters import search_paths
 from ..widgets.helper_classes import LineEdit
 from .utils import loading_virtual_env, commit_action
 from ..widgets.control_bar import ControlBar
@@ -46,8 +47,11 @@ class OnboardingPage(QWidget):
         self.python_interpreters = None
         self.found_python_interpreters = {}
         self.current_env = []
+        self.env = []
 
-        self.worker = LibraryThreads()
+        self.worker = LibraryThreads(
+            template_mode=config.get('controls', {}).get('library', {}).get('venvTemplates', 'hardlink')
+        )
         self.worker.virtual_envs.connect(self._display_env)
         self.worker.new_virtual_env.connect(self._update_widget)
 
@@ -213,13 +217,22 @@ class OnboardingPage(QWidget):
     def _update_widget(self, code: int, venv_path: str, venv_name, all_venv_names):
         """
         Updates the UI based on the result of a virtual environment creation or discovery operation.
-        Switches to a loading screen or emits location_selected based on the provided code.
+        Switches to a loading screen or emits location_selected based on the provided code,
+        and goes back to the location page when the creation failed.
         """
         if code == 0:
             self.stacked_widget.setCurrentIndex(1)
         if code == 1:
+            # The worker only describes the new environment, the others were found before
+            known = {env['venv_path']: env for env in self.env}
+            known.update({env['venv_path']: env for env in all_venv_names})
+            all_venv_names = sorted(known.values(), key=lambda env: env['venv_path'])
             self.location_selected.emit(venv_path, venv_name, all_venv_names)
-        pass
+        elif code == -1:
+            # Back to the selection page, the spinner would otherwise never stop
+            self.stacked_widget.setCurrentIndex(0)
+            reason = all_venv_names[0] if all_venv_names and isinstance(all_venv_names[0], str) else "Unknown error"
+            commit_action(self, f"Could not create {venv_name}: {reason}")
 
 
     def _select_location(self, event):
@@ -236,11 +249,13 @@ class OnboardingPage(QWidget):
 
             self.worker.emit_signal_for_virtual_envs(
                 directory,
-                resource_path(self.config.get('paths', {}).get('executables', {}).get('find_local_environment', {}).get('darwin', "./find_local_env"))
+                resource_path(self.config.get('paths', {}).get('executables', {}).get('find_local_environment', {}).get('darwin', "./find_local_env")),
+                self.config.get('controls', {}).get('library', {}).get('discoveryDepth', 2),
+                self.config.get('controls', {}).get('library', {}).get('discoveryWorkers', 8)
             )
             self.project_location = directory
             self.browse_label.setText(f"Selected: {directory}")
-            self.python_interpreters = PythonInterpreters()
+            self.python_interpreters = PythonInterpreters(search_paths(self.config))
 
             if self.found_python_interpreters == {}:
                 self.python_interpreters.finished.connect(
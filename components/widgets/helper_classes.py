@@ -1,5 +1,5 @@
-from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
-from PyQt6.QtGui import QKeyEvent, QPainter
+from PyQt6.QtCore import QObject, QRect, QTimer, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QKeyEvent, QPainter, QPen
 from PyQt6.QtWidgets import QComboBox, QLabel, QStyleOptionComboBox, QStyledItemDelegate, QTextEdit, QWidget
 
 class LineEdit(QTextEdit):
@@ -135,3 +135,16 @@ class HTMLComboBox(QComboBox):
         painter.translate(option.rect.topLeft())
         label.render(painter)
         painter.restore()
+
+
+def draw_progress_arc(painter: QPainter, rect: QRect, fraction: float, color: QColor):
+    """Draws a clockwise arc from twelve o'clock around `rect`, `fraction` of a full turn."""
+    if fraction <= 0:
+        return
+    painter.save()
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    pen = QPen(color)
+    pen.setWidth(2)
+    painter.setPen(pen)
+    painter.drawArc(rect.adjusted(-4, -4, 4, 4), 90 * 16, -int(min(fraction, 1.0) * 360 * 16))
+    painter.restore()
@@ -1,8 +1,35 @@
+from collections import OrderedDict
 from PyQt6.QtCore import QEvent, QPoint, QRect, QTimer, QUrl, Qt
 from PyQt6.QtGui import QCursor, QDesktopServices
 from PyQt6.QtWidgets import QFrame, QLabel, QScrollArea, QVBoxLayout, QWidget
 
 
+class TooltipHtmlCache:
+    """
+    A bounded LRU of tooltip HTML, keyed by (kind, package, version, fetched_at).
+
+    Tooltips are only built when one is about to be shown, and hovering the same
+    package again returns the string built the first time.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key, build) -> str:
+        html = self._entries.get(key)
+        if html is None:
+            html = build()
+            self._entries[key] = html
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return html
+
+
+tooltip_html_cache = TooltipHtmlCache()
+
+
 class InteractiveToolTip(QFrame):
     """
     A Custom tooltip for interactibility, scrollability
@@ -49,6 +76,7 @@ class InteractiveToolTip(QFrame):
         self._show_timer.timeout.connect(self._show_at_cursor)
 
         self._target_widget = None
+        self._content_provider = None
 
 
         self._polling_timer = QTimer(self)
@@ -59,7 +87,11 @@ class InteractiveToolTip(QFrame):
         QDesktopServices.openUrl(QUrl(link))
 
     def schedule_show(self, content, pos, target_widget):
-        """Starts a timer to show the tooltip, now tracking the target widget."""
+        """
+        Starts a timer to show the tooltip, now tracking the target widget.
+
+        `content` is the HTML, or a callable returning it once the tooltip is shown.
+        """
         self.scroll_area.verticalScrollBar().setValue(0) #type: ignore
         self._hide_timer.stop()
         self._pending_content = content
@@ -71,6 +103,7 @@ class InteractiveToolTip(QFrame):
         """This method is called by the show_timer's timeout."""
         if self._pending_content and self._pending_pos:
             self.set_content(self._pending_content)
+            self._resolve_content()
 
             self.scroll_area.verticalScrollBar().setValue(0) #type: ignore
             self.scroll_area.adjustSize()
@@ -119,8 +152,17 @@ class InteractiveToolTip(QFrame):
     def set_object_name(self, name):
         self.scroll_area.setObjectName(f"{name}ScrollArea")
 
-    def set_content(self, html: str):
-        self.content_label.setText(html)
+    def set_content(self, html):
+        """Sets the HTML, or a callable building it, which is only called when the tooltip shows."""
+        if callable(html):
+            self._content_provider = html
+        else:
+            self._content_provider = None
+            self.content_label.setText(html)
+
+    def _resolve_content(self):
+        if self._content_provider is not None:
+            self.content_label.setText(self._content_provider())
 
     def install_on(self, widget):
         """Installs an event filter on the target widget to trigger the tooltip."""
@@ -146,6 +188,7 @@ class InteractiveToolTip(QFrame):
         if not self._target_widget:
             return
 
+        self._resolve_content()
         cursor_pos = self._target_widget.cursor().pos()
         # Adjust position to be below and to the right of the cursor
         self.move(cursor_pos + QPoint(15, 15))
@@ -1,15 +1,21 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
 	"context"
+	"crypto/sha1"
+	"encoding/hex"
 	"encoding/json"
+	"flag"
+	"fmt"
 	"io"
 	"log/slog"
 	"os"
 	"os/exec"
 	"path/filepath"
 	"runtime"
+	"sort"
 	"strings"
 	"sync"
 	"time"
@@ -30,6 +36,41 @@ type EnvironmentSpecifics struct {
 	ActivatePath []string `json:"activate_path"`
 }
 
+// Directories that never hold a virtual environment worth listing and can be huge
+var pruned_directories = map[string]bool{
+	".git":          true,
+	".hg":           true,
+	".svn":          true,
+	"node_modules":  true,
+	"__pycache__":   true,
+	".mypy_cache":   true,
+	".pytest_cache": true,
+	".ruff_cache":   true,
+	".cache":        true,
+	".idea":         true,
+	".vscode":       true,
+	".next":         true,
+	".gradle":       true,
+	"build":         true,
+	"dist":          true,
+	"target":        true,
+}
+
+// Bumped whenever the detection or the pruned directories change, older scans are ignored
+const scan_version = 1
+
+// Scan is what is cached for a project directory: the environments found, and the
+// mtime of every path looked at to find them. A directory's mtime changes whenever
+// an entry is created, removed or renamed in it, so while none of them changed the
+// walk would find the same environments.
+type Scan struct {
+	Version      int                  `json:"version"`
+	Root         string               `json:"root"`
+	Depth        int                  `json:"depth"`
+	Stamps       map[string]int64     `json:"stamps"`
+	Environments []VirtualEnvironment `json:"environments"`
+}
+
 // Setting Environment Specifics
 func setEnvironmentSpecifics(EnvSpecifics *EnvironmentSpecifics) {
 
@@ -46,78 +87,159 @@ func setEnvironmentSpecifics(EnvSpecifics *EnvironmentSpecifics) {
 	}
 }
 
-func dispatchJobs(jobs chan<- string, root_path string, max_depth int) {
-	defer close(jobs)
+type finder struct {
+	env_specifics EnvironmentSpecifics
+	max_depth     int
+	// At most `workers` directories are read at the same time
+	slots chan struct{}
+	wg    sync.WaitGroup
 
-	absolute_root, err := filepath.Abs(root_path)
-	if err == nil {
-		jobs <- absolute_root
+	mutex  sync.Mutex
+	stamps map[string]int64
+	found  []VirtualEnvironment
+}
+
+func new_finder(env_specifics EnvironmentSpecifics, max_depth int, workers int) *finder {
+	return &finder{
+		env_specifics: env_specifics,
+		max_depth:     max_depth,
+		slots:         make(chan struct{}, max(1, workers)),
+		stamps:        make(map[string]int64),
 	}
+}
 
-	var walk func(string, int)
-	walk = func(current_path string, current_depth int) {
-		if max_depth != -1 && current_depth >= max_depth {
-			return
-		}
+func (f *finder) stamp(path string, info os.FileInfo) {
+	f.mutex.Lock()
+	f.stamps[path] = info.ModTime().UnixNano()
+	f.mutex.Unlock()
+}
 
-		entries, err := os.ReadDir(current_path)
-		if err != nil {
-			slog.Error("Error reading directory", "path", current_path, "error", err)
-			return
-		}
+// Walks the tree from `root_path`, every directory on its own goroutine once a slot is free
+func (f *finder) walk(root_path string) []VirtualEnvironment {
+	f.wg.Add(1)
+	go f.visit(root_path, 0)
+	f.wg.Wait()
+	sort.Slice(f.found, func(i, j int) bool { return f.found[i].VenvPath < f.found[j].VenvPath })
+	return f.found
+}
 
-		for _, entry := range entries {
-			if entry.IsDir() {
-				full_path := filepath.Join(current_path, entry.Name())
-				jobs <- full_path
+func (f *finder) visit(dir_path string, depth int) {
+	defer f.wg.Done()
+	f.slots <- struct{}{}
+	children := f.inspect(dir_path, depth)
+	// The slot is given back before the children wait for one
+	<-f.slots
+	for _, child := range children {
+		f.wg.Add(1)
+		go f.visit(child, depth+1)
+	}
+}
 
-				walk(full_path, current_depth+1)
-			}
+// Records a directory, returning the subdirectories still to visit
+func (f *finder) inspect(dir_path string, depth int) []string {
+	info, err := os.Stat(dir_path)
+	if err != nil {
+		return nil
+	}
+	f.stamp(dir_path, info)
+
+	if venv, ok := f.detect(dir_path); ok {
+		f.mutex.Lock()
+		f.found = append(f.found, venv)
+		f.mutex.Unlock()
+		// Nothing below a virtual environment is listed
+		return nil
+	}
+	if f.max_depth != -1 && depth >= f.max_depth {
+		return nil
+	}
+
+	entries, err := os.ReadDir(dir_path)
+	if err != nil {
+		slog.Error("Error reading directory", "path", dir_path, "error", err)
+		return nil
+	}
+	var children []string
+	for _, entry := range entries {
+		// Symlinked directories are not followed, they are not reported as directories here
+		if entry.IsDir() && !pruned_directories[entry.Name()] {
+			children = append(children, filepath.Join(dir_path, entry.Name()))
 		}
 	}
-	walk(root_path, 0)
+	return children
 }
 
-func worker(jobs <-chan string, env_specifics EnvironmentSpecifics, results chan<- VirtualEnvironment, wg *sync.WaitGroup) {
-	defer wg.Done()
-	for dir_path := range jobs {
-		bin_dir := filepath.Join(dir_path, env_specifics.BinPath)
-		bin_dir, _ = filepath.Abs(bin_dir)
-		include_path := filepath.Join(dir_path, "include")
-		lib_path := filepath.Join(dir_path, "lib")
+// A virtual environment has a pyvenv.cfg, which also records its Python version. Trees
+// made by virtualenv before it wrote one are recognised by their bin, include and lib.
+func (f *finder) detect(dir_path string) (VirtualEnvironment, bool) {
+	bin_dir := filepath.Join(dir_path, f.env_specifics.BinPath)
+	python_version := ""
+	config_path := filepath.Join(dir_path, "pyvenv.cfg")
+	if info, err := os.Stat(config_path); err == nil {
+		f.stamp(config_path, info)
+		python_version = pyvenv_version(config_path)
+	} else if !legacy_layout(dir_path, bin_dir) {
+		return VirtualEnvironment{}, false
+	}
 
-		if _, err := os.Stat(bin_dir); os.IsNotExist(err) {
+	python_path, python_present := findFirst(bin_dir, f.env_specifics.PythonPath, true)
+	pip_path, pip_present := findFirst(bin_dir, f.env_specifics.PipPath, true)
+	_, has_activate := findFirst(bin_dir, f.env_specifics.ActivatePath, false)
+	if !(python_present && pip_present && has_activate) {
+		return VirtualEnvironment{}, false
+	}
+	if info, err := os.Stat(bin_dir); err == nil {
+		f.stamp(bin_dir, info)
+	}
 
-			continue
-		}
-		if _, err := os.Stat(include_path); os.IsNotExist(err) {
-			continue
-		}
-		if _, err := os.Stat(lib_path); os.IsNotExist(err) {
-			continue
-		}
-		python_path, python_present := findFirst(bin_dir, env_specifics.PythonPath, true)
-		pip_path, pip_present := findFirst(bin_dir, env_specifics.PipPath, true)
-		_, has_activate := findFirst(bin_dir, env_specifics.ActivatePath, false)
-		if !(python_present && pip_present && has_activate) {
-			continue
-		}
+	if python_version == "" {
 		ctx, cancel := context.WithTimeout(context.Background(), 5*time.Second)
-		cmd := exec.CommandContext(ctx, python_path, "--version")
-		output, err := cmd.CombinedOutput()
+		output, err := exec.CommandContext(ctx, python_path, "--version").CombinedOutput()
 		cancel()
 		if err != nil {
-			continue
+			return VirtualEnvironment{}, false
+		}
+		python_version = strings.TrimPrefix(strings.TrimSpace(string(output)), "Python ")
+	}
+
+	return VirtualEnvironment{
+		VenvName:      filepath.Base(dir_path),
+		VenvPath:      dir_path,
+		PythonVersion: python_version,
+		PipPath:       pip_path,
+		PythonPath:    python_path,
+	}, true
+}
+
+func legacy_layout(dir_path string, bin_dir string) bool {
+	for _, path := range []string{bin_dir, filepath.Join(dir_path, "include"), filepath.Join(dir_path, "lib")} {
+		if _, err := os.Stat(path); err != nil {
+			return false
 		}
+	}
+	return true
+}
 
-		results <- VirtualEnvironment{
-			VenvName:      filepath.Base(dir_path),
-			VenvPath:      dir_path,
-			PythonVersion: strings.TrimPrefix(strings.TrimSpace(string(output)), "Python "),
-			PipPath:       pip_path,
-			PythonPath:    python_path,
+// venv writes `version = 3.12.1`, virtualenv and uv `version_info = 3.12.1.final.0`
+func pyvenv_version(config_path string) string {
+	file, err := os.Open(config_path)
+	if err != nil {
+		return ""
+	}
+	defer file.Close()
+	scanner := bufio.NewScanner(file)
+	for scanner.Scan() {
+		key, value, found := strings.Cut(scanner.Text(), "=")
+		if !found {
+			continue
+		}
+		key = strings.TrimSpace(key)
+		if key == "version" || key == "version_info" {
+			parts := strings.Split(strings.TrimSpace(value), ".")
+			return strings.Join(parts[:min(3, len(parts))], ".")
 		}
 	}
+	return ""
 }
 
 func findFirst(base_dir string, candidates []string, executable bool) (string, bool) {
@@ -145,11 +267,82 @@ func checkExecutable(path string) bool {
 	return !info.IsDir() && (info.Mode()&0111) != 0
 }
 
+func scan_path(cache_dir string, root_path string) string {
+	sum := sha1.Sum([]byte(root_path))
+	return filepath.Join(cache_dir, hex.EncodeToString(sum[:])+".json")
+}
+
+// Returns the cached scan of a directory while every path it looked at is unchanged
+func load_scan(cache_dir string, root_path string, max_depth int) (Scan, bool) {
+	var scan Scan
+	if cache_dir == "" {
+		return scan, false
+	}
+	data, err := os.ReadFile(scan_path(cache_dir, root_path))
+	if err != nil {
+		return scan, false
+	}
+	if err := json.Unmarshal(data, &scan); err != nil || scan.Version != scan_version ||
+		scan.Root != root_path || scan.Depth != max_depth || len(scan.Stamps) == 0 {
+		return scan, false
+	}
+	for path, mtime := range scan.Stamps {
+		info, err := os.Stat(path)
+		if err != nil || info.ModTime().UnixNano() != mtime {
+			return scan, false
+		}
+	}
+	return scan, true
+}
+
+// Replaces the cached scan, renamed into place so a concurrent reader never sees half of it
+func save_scan(cache_dir string, scan Scan) {
+	if cache_dir == "" {
+		return
+	}
+	if err := os.MkdirAll(cache_dir, 0755); err != nil {
+		slog.Error("Failed to create scan cache directory", "error", err)
+		return
+	}
+	data, err := json.Marshal(scan)
+	if err != nil {
+		slog.Error("Failed to encode scan", "error", err)
+		return
+	}
+	file_path := scan_path(cache_dir, scan.Root)
+	temp_path := fmt.Sprintf("%s.%d.tmp", file_path, os.Getpid())
+	if err := os.WriteFile(temp_path, data, 0644); err != nil {
+		slog.Error("Failed to write scan", "error", err)
+		return
+	}
+	if err := os.Rename(temp_path, file_path); err != nil {
+		slog.Error("Failed to write scan", "error", err)
+	}
+}
+
+func find_environments(root_path string, env_specifics EnvironmentSpecifics, max_depth int, workers int, cache_dir string) []VirtualEnvironment {
+	if scan, ok := load_scan(cache_dir, root_path, max_depth); ok {
+		return scan.Environments
+	}
+	f := new_finder(env_specifics, max_depth, workers)
+	found := f.walk(root_path)
+	save_scan(cache_dir, Scan{
+		Version:      scan_version,
+		Root:         root_path,
+		Depth:        max_depth,
+		Stamps:       f.stamps,
+		Environments: found,
+	})
+	return found
+}
+
 func main() {
 	logger := slog.New(slog.NewTextHandler(os.Stderr, nil))
 	slog.SetDefault(logger)
-	max_depth := 2
-	number_worker := 4
+	max_depth := flag.Int("depth", 2, "how many directory levels below the given one are searched, -1 for no limit")
+	number_worker := flag.Int("workers", runtime.NumCPU(), "directories read at the same time")
+	cache_dir := flag.String("cache-dir", "", "directory for per-directory scan caches, no caching when empty")
+	flag.Parse()
 
 	var EnvSpecifics EnvironmentSpecifics
 	setEnvironmentSpecifics(&EnvSpecifics)
@@ -160,32 +353,18 @@ func main() {
 	encoder.SetEscapeHTML(false)
 	encoder.SetIndent("", "  ")
 
-	args := strings.TrimSpace(os.Args[1:][0])
-
+	args := strings.TrimSpace(flag.Arg(0))
 	if len(args) == 0 {
 		encoder.Encode("")
+		return
 	}
-	jobs := make(chan string, 100)
-	results := make(chan VirtualEnvironment, 100)
-
-	var wg sync.WaitGroup
-
-	// start the worker pool
-	for range number_worker {
-		wg.Add(1)
-		go worker(jobs, EnvSpecifics, results, &wg)
+	root_path, err := filepath.Abs(args)
+	if err != nil {
+		slog.Error("Invalid directory", "path", args, "error", err)
+		encoder.Encode("")
+		return
 	}
 
-	go dispatchJobs(jobs, args, max_depth)
-
-	go func() {
-		wg.Wait()
-		close(results)
-	}()
-
-	var foundEnvs []VirtualEnvironment
-	for venv := range results {
-		foundEnvs = append(foundEnvs, venv)
-	}
+	foundEnvs := find_environments(root_path, EnvSpecifics, *max_depth, *number_worker, *cache_dir)
 	encoder.Encode(foundEnvs)
 }
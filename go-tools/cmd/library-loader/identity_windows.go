@@ -0,0 +1,10 @@
+//go:build windows
+
+package main
+
+import "os"
+
+// Windows has no inodes in os.FileInfo, the modification time alone decides
+func file_identity(info os.FileInfo) uint64 {
+	return 0
+}
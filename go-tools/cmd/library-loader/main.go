@@ -1,9 +1,14 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
+	"crypto/sha1"
 	"encoding/csv"
+	"encoding/hex"
 	"encoding/json"
+	"flag"
+	"fmt"
 	"io"
 	"io/fs"
 	"log/slog"
@@ -11,6 +16,8 @@ import (
 	"os/exec"
 	"path/filepath"
 	"runtime"
+	"sort"
+	"strconv"
 	"strings"
 	"sync"
 )
@@ -44,8 +51,8 @@ type libraries struct {
 }
 
 type Job struct {
-	LibraryIdx  int
-	PathsToScan []string
+	LibraryIdx       int
+	MetadataLocation string
 }
 
 type result struct {
@@ -53,6 +60,63 @@ type result struct {
 	size       int64
 }
 
+// What a distribution's metadata directory looked like when it was last read
+type SnapshotEntry struct {
+	ModTime   int64     `json:"mtime"`
+	Inode     uint64    `json:"inode"`
+	Installed Installed `json:"installed"`
+}
+
+// The last scan of one virtual environment, stored as <cache_dir>/<sha1(venv path)>.json.
+// Entries are keyed by the name of the *.dist-info / *.egg-info directory in
+// site-packages; Others holds distributions pip reported from anywhere else,
+// which are only refreshed by a full scan.
+type Snapshot struct {
+	Version       int                      `json:"version"`
+	SitePackages  string                   `json:"site_packages"`
+	PyvenvModTime int64                    `json:"pyvenv_mtime"`
+	PipVersion    string                   `json:"pip_version"`
+	SizeMode      string                   `json:"size_mode"`
+	Entries       map[string]SnapshotEntry `json:"entries"`
+	Others        []Installed              `json:"others"`
+}
+
+const snapshot_version = 1
+
+// One line of -stream output: a distribution as soon as its metadata is known (its
+// size is 0 until a size line for it follows, unless it came from the snapshot),
+// a size once it is worked out, and finally one line with Done set.
+type StreamLine struct {
+	Installed  *Installed `json:"installed,omitempty"`
+	Name       string     `json:"name,omitempty"`
+	Size       *int64     `json:"size,omitempty"`
+	Done       bool       `json:"done,omitempty"`
+	PipVersion string     `json:"pip_version,omitempty"`
+}
+
+// Set by -stream, nil when the whole result is written as one document at the end
+var stream *json.Encoder
+
+func stream_line(line StreamLine) {
+	if stream == nil {
+		return
+	}
+	if err := stream.Encode(line); err != nil {
+		slog.Error("Failed to write stream line", "error", err)
+	}
+}
+
+func stream_installed(installed Installed) {
+	if installed.Metadata.Name != "" {
+		stream_line(StreamLine{Installed: &installed})
+	}
+}
+
+// How distributions are sized, set by -size:
+//   - "walk" walks every top level path RECORD mentions and stats each file under it
+//   - "record" sums the size column of RECORD, stat-ing only the rows without a size
+var size_mode = "walk"
+
 func (libraries *libraries) remove(name string) {
 	for index, installed := range libraries.Installed {
 		if name == installed.Metadata.Name {
@@ -101,11 +165,60 @@ func get_path_size(paths []string) int64 {
 	return total_size
 }
 
-func worker(id int, wg *sync.WaitGroup, jobs <-chan Job, results chan<- result) {
+// Sums the sizes RECORD lists for the files inside site-packages. Rows without a size
+// (usually the .pyc files compiled at install time) are stat-ed instead. Every file
+// is counted once, even when several distributions share a top level directory.
+// Reports false when there is no RECORD to read.
+func get_record_size(site_packages_path string, metadata_location string) (int64, bool) {
+	file, err := os.Open(filepath.Join(metadata_location, "RECORD"))
+	if err != nil {
+		return 0, false
+	}
+	defer file.Close()
+
+	var total_size int64 = 0
+	record_file := csv.NewReader(file)
+	record_file.FieldsPerRecord = -1
+	record_file.ReuseRecord = true
+	for {
+		record, err := record_file.Read()
+		if err == io.EOF {
+			break
+		} else if err != nil || len(record) == 0 || record[0] == "" {
+			continue
+		}
+		file_path := filepath.Join(site_packages_path, record[0])
+		if !strings.HasPrefix(file_path, site_packages_path) {
+			// Scripts and data files outside site-packages are not counted, like the walk
+			continue
+		}
+		if len(record) >= 3 && record[2] != "" {
+			if size, err := strconv.ParseInt(record[2], 10, 64); err == nil {
+				total_size += size
+				continue
+			}
+		}
+		if info, err := os.Stat(file_path); err == nil && !info.IsDir() {
+			total_size += info.Size()
+		}
+	}
+	return total_size, true
+}
+
+func library_size(site_packages_path string, metadata_location string) int64 {
+	if size_mode == "record" {
+		if size, ok := get_record_size(site_packages_path, metadata_location); ok {
+			return size
+		}
+	}
+	return get_path_size(paths_to_size(site_packages_path, metadata_location))
+}
+
+func worker(id int, wg *sync.WaitGroup, site_packages_path string, jobs <-chan Job, results chan<- result) {
 	defer wg.Done()
 
 	for job := range jobs {
-		size := get_path_size(job.PathsToScan)
+		size := library_size(site_packages_path, job.MetadataLocation)
 		results <- result{
 			LibraryIdx: job.LibraryIdx,
 			size:       size,
@@ -113,12 +226,298 @@ func worker(id int, wg *sync.WaitGroup, jobs <-chan Job, results chan<- result)
 	}
 }
 
-func get_installed_libraries_with_size(venv_path string) (libraries, error) {
-	venv_path_abs, err := filepath.Abs(venv_path)
+// The top level paths a distribution's RECORD lists, or its metadata directory without one
+func paths_to_size(site_packages_path string, metadata_location string) []string {
+	record_path := filepath.Join(metadata_location, "RECORD")
+	paths_to_Size := make(map[string]struct{})
+	file, err := os.Open(record_path)
+	if err == nil {
+		defer file.Close()
+
+		record_file := csv.NewReader(file)
+		for {
+			record, err := record_file.Read()
+			if err == io.EOF {
+				break
+			} else if err != nil {
+				continue
+			}
+			relative_row := record[0]
+			abs_file_path, _ := filepath.Abs(filepath.Join(site_packages_path, relative_row))
+			if strings.HasPrefix(abs_file_path, site_packages_path) {
+				parts := strings.Split(relative_row, string(filepath.Separator))
+				if len(parts) > 0 && !strings.Contains("__pycache__", relative_row) {
+					top_level := parts[0]
+					paths_to_Size[filepath.Join(site_packages_path, top_level)] = struct{}{}
+				}
+			}
+		}
+
+	} else {
+		paths_to_Size[metadata_location] = struct{}{}
+	}
+
+	paths := make([]string, 0, len(paths_to_Size))
+	for p := range paths_to_Size {
+		paths = append(paths, p)
+	}
+	return paths
+}
+
+// Sizes the given distributions on a pool of workers, writing into their metadata
+func size_libraries(site_packages_path string, installed []Installed, indexes []int) {
+	jobs := make(chan Job, len(indexes))
+	results := make(chan result, len(indexes))
+
+	number_of_worker := min(runtime.NumCPU(), 8)
+
+	var wg sync.WaitGroup
+
+	for w := range number_of_worker {
+		wg.Add(1)
+		go worker(w, &wg, site_packages_path, jobs, results)
+	}
+
+	for _, index := range indexes {
+		jobs <- Job{LibraryIdx: index, MetadataLocation: installed[index].MetadataLocation}
+	}
+
+	close(jobs)
+
+	go func() {
+		wg.Wait()
+		close(results)
+	}()
+
+	for res := range results {
+		installed[res.LibraryIdx].Metadata.Size = res.size
+		if name := installed[res.LibraryIdx].Metadata.Name; name != "" {
+			size := res.size
+			stream_line(StreamLine{Name: name, Size: &size})
+		}
+	}
+}
+
+// Reads an email-header style METADATA / PKG-INFO file into the shape `pip inspect` reports
+func read_metadata(metadata_path string) (Metadata, error) {
+	var metadata Metadata
+	file, err := os.Open(metadata_path)
 	if err != nil {
-		slog.Error("Error while absoluting paths", "error", err)
-		return libraries{}, err
+		return metadata, err
 	}
+	defer file.Close()
+
+	headers := make(map[string][]string)
+	last_key := ""
+	scanner := bufio.NewScanner(file)
+	scanner.Buffer(make([]byte, 64*1024), 4*1024*1024)
+	for scanner.Scan() {
+		line := scanner.Text()
+		if line == "" {
+			// The description body follows the headers
+			break
+		}
+		if (line[0] == ' ' || line[0] == '\t') && last_key != "" {
+			values := headers[last_key]
+			values[len(values)-1] += "\n" + strings.TrimSpace(line)
+			continue
+		}
+		key, value, found := strings.Cut(line, ":")
+		if !found {
+			continue
+		}
+		last_key = strings.ToLower(strings.TrimSpace(key))
+		headers[last_key] = append(headers[last_key], strings.TrimSpace(value))
+	}
+	if err := scanner.Err(); err != nil {
+		return metadata, err
+	}
+
+	first := func(key string) string {
+		if values := headers[key]; len(values) > 0 {
+			return values[0]
+		}
+		return ""
+	}
+	metadata.Name = first("name")
+	metadata.Version = first("version")
+	metadata.Summary = first("summary")
+	metadata.Author = first("author")
+	metadata.License = first("license")
+	metadata.LicenseExpression = first("license-expression")
+	metadata.LicenseFile = headers["license-file"]
+	metadata.Classifiers = headers["classifier"]
+	metadata.RequiresDistribution = headers["requires-dist"]
+	metadata.RequiresPython = first("requires-python")
+	metadata.ProjectUrl = headers["project-url"]
+	metadata.ProvidesExtra = headers["provides-extra"]
+	return metadata, nil
+}
+
+// Reads one *.dist-info or *.egg-info directory without going through pip
+func read_installed(metadata_location string) (Installed, error) {
+	metadata_file := filepath.Join(metadata_location, "METADATA")
+	if strings.HasSuffix(metadata_location, ".egg-info") {
+		metadata_file = filepath.Join(metadata_location, "PKG-INFO")
+	}
+	metadata, err := read_metadata(metadata_file)
+	if err != nil {
+		return Installed{}, err
+	}
+	installer, _ := os.ReadFile(filepath.Join(metadata_location, "INSTALLER"))
+	_, requested_err := os.Stat(filepath.Join(metadata_location, "REQUESTED"))
+	return Installed{
+		Metadata:         metadata,
+		MetadataLocation: metadata_location,
+		Installer:        strings.TrimSpace(string(installer)),
+		Requested:        requested_err == nil,
+	}, nil
+}
+
+func is_metadata_dir(name string) bool {
+	return strings.HasSuffix(name, ".dist-info") || strings.HasSuffix(name, ".egg-info")
+}
+
+// The metadata directories in site-packages, with the state they are compared on
+func list_metadata_dirs(site_packages_path string) (map[string]SnapshotEntry, error) {
+	dir_entries, err := os.ReadDir(site_packages_path)
+	if err != nil {
+		return nil, err
+	}
+	entries := make(map[string]SnapshotEntry)
+	for _, dir_entry := range dir_entries {
+		if !dir_entry.IsDir() || !is_metadata_dir(dir_entry.Name()) {
+			continue
+		}
+		info, err := dir_entry.Info()
+		if err != nil {
+			continue
+		}
+		entries[dir_entry.Name()] = SnapshotEntry{ModTime: info.ModTime().UnixNano(), Inode: file_identity(info)}
+	}
+	return entries, nil
+}
+
+func mod_time(path string) int64 {
+	info, err := os.Stat(path)
+	if err != nil {
+		return 0
+	}
+	return info.ModTime().UnixNano()
+}
+
+func snapshot_path(cache_dir string, venv_path string) string {
+	sum := sha1.Sum([]byte(venv_path))
+	return filepath.Join(cache_dir, hex.EncodeToString(sum[:])+".json")
+}
+
+func load_snapshot(cache_dir string, venv_path string) (Snapshot, bool) {
+	var snapshot Snapshot
+	if cache_dir == "" {
+		return snapshot, false
+	}
+	data, err := os.ReadFile(snapshot_path(cache_dir, venv_path))
+	if err != nil {
+		return snapshot, false
+	}
+	if err := json.Unmarshal(data, &snapshot); err != nil || snapshot.Version != snapshot_version {
+		return snapshot, false
+	}
+	if snapshot.Entries == nil {
+		snapshot.Entries = make(map[string]SnapshotEntry)
+	}
+	return snapshot, true
+}
+
+// Replaces the snapshot, renamed into place so a concurrent reader never sees half of it
+func save_snapshot(cache_dir string, venv_path string, snapshot Snapshot) {
+	if cache_dir == "" {
+		return
+	}
+	if err := os.MkdirAll(cache_dir, 0755); err != nil {
+		slog.Error("Failed to create scan cache directory", "error", err)
+		return
+	}
+	buffer := new(bytes.Buffer)
+	buffer_encoder := json.NewEncoder(buffer)
+	buffer_encoder.SetEscapeHTML(false)
+	if err := buffer_encoder.Encode(snapshot); err != nil {
+		slog.Error("Failed to encode scan snapshot", "error", err)
+		return
+	}
+	file_path := snapshot_path(cache_dir, venv_path)
+	temp_path := fmt.Sprintf("%s.%d.tmp", file_path, os.Getpid())
+	if err := os.WriteFile(temp_path, buffer.Bytes(), 0644); err != nil {
+		slog.Error("Failed to write scan snapshot", "error", err)
+		return
+	}
+	if err := os.Rename(temp_path, file_path); err != nil {
+		slog.Error("Failed to write scan snapshot", "error", err)
+	}
+}
+
+func (snapshot *Snapshot) libraries() libraries {
+	library_data := libraries{PipVersion: snapshot.PipVersion}
+	for _, entry := range snapshot.Entries {
+		library_data.Installed = append(library_data.Installed, entry.Installed)
+	}
+	library_data.Installed = append(library_data.Installed, snapshot.Others...)
+	sort.Slice(library_data.Installed, func(i, j int) bool {
+		return strings.ToLower(library_data.Installed[i].Metadata.Name) < strings.ToLower(library_data.Installed[j].Metadata.Name)
+	})
+	return library_data
+}
+
+// Brings a snapshot up to date with site-packages: metadata directories that are new
+// or whose mtime / inode changed are read and sized again, missing ones are dropped.
+// Returns whether anything changed.
+func (snapshot *Snapshot) refresh(current map[string]SnapshotEntry) bool {
+	changed := false
+	for name := range snapshot.Entries {
+		if _, ok := current[name]; !ok {
+			delete(snapshot.Entries, name)
+			changed = true
+		}
+	}
+	for _, installed := range snapshot.Others {
+		stream_installed(installed)
+	}
+
+	var stale []Installed
+	var stale_names []string
+	for name, state := range current {
+		cached, ok := snapshot.Entries[name]
+		if ok && cached.ModTime == state.ModTime && cached.Inode == state.Inode {
+			stream_installed(cached.Installed)
+			continue
+		}
+		changed = true
+		delete(snapshot.Entries, name)
+		installed, err := read_installed(filepath.Join(snapshot.SitePackages, name))
+		if err != nil || installed.Metadata.Name == "" {
+			slog.Error("Error reading distribution metadata", "path", name, "error", err)
+			continue
+		}
+		stream_installed(installed)
+		stale = append(stale, installed)
+		stale_names = append(stale_names, name)
+	}
+
+	indexes := make([]int, len(stale))
+	for i := range stale {
+		indexes[i] = i
+	}
+	size_libraries(snapshot.SitePackages, stale, indexes)
+	for i, installed := range stale {
+		state := current[stale_names[i]]
+		state.Installed = installed
+		snapshot.Entries[stale_names[i]] = state
+	}
+	return changed
+}
+
+// The full scan: site-packages from the venv's python, metadata from `pip inspect`
+func scan_with_pip(venv_path_abs string) (Snapshot, error) {
 	bin_dir := filepath.Join(venv_path_abs, "bin")
 	operating_system := runtime.GOOS
 	if operating_system == "windows" {
@@ -129,7 +528,7 @@ func get_installed_libraries_with_size(venv_path string) (libraries, error) {
 	site_packages_path, site_err := get_site_package_main(&python_exec)
 	if site_err != nil {
 		slog.Error("Error while getting site packages path", "error", site_err)
-		return libraries{}, err
+		return Snapshot{}, site_err
 	}
 
 	cmd := exec.Command(pip_exec, "inspect")
@@ -137,92 +536,85 @@ func get_installed_libraries_with_size(venv_path string) (libraries, error) {
 	stdout, inspect_err := cmd.StdoutPipe()
 	if inspect_err != nil {
 		slog.Error("Error while creating stdout pipe", "error", inspect_err)
-		return libraries{}, err
+		return Snapshot{}, inspect_err
 	}
 
 	if err := cmd.Start(); err != nil {
 		slog.Error("Error starting command", "error", err)
-		return libraries{}, err
+		return Snapshot{}, err
 	}
 
 	output, err := io.ReadAll(stdout)
 	if err != nil {
 		slog.Error("Error reading output stream", "error", err)
-		return libraries{}, err
+		return Snapshot{}, err
 	}
 	if err := cmd.Wait(); err != nil {
 		slog.Error("Error waiting for command", "error", err)
-		return libraries{}, err
+		return Snapshot{}, err
 	}
 	var library_data libraries
 	if err := json.Unmarshal(output, &library_data); err != nil {
 		slog.Error("Error unmarshalling JSON", "error", err)
-		return libraries{}, err
+		return Snapshot{}, err
 	}
+	library_data.remove("")
 
-	num_libraries := len(library_data.Installed)
-	jobs := make(chan Job, num_libraries)
-	results := make(chan result, num_libraries)
-
-	number_of_worker := min(runtime.NumCPU(), 8)
-
-	var wg sync.WaitGroup
+	indexes := make([]int, len(library_data.Installed))
+	for i, installed := range library_data.Installed {
+		indexes[i] = i
+		stream_installed(installed)
+	}
+	size_libraries(site_packages_path, library_data.Installed, indexes)
+
+	snapshot := Snapshot{
+		Version:       snapshot_version,
+		SitePackages:  site_packages_path,
+		PyvenvModTime: mod_time(filepath.Join(venv_path_abs, "pyvenv.cfg")),
+		PipVersion:    library_data.PipVersion,
+		SizeMode:      size_mode,
+		Entries:       make(map[string]SnapshotEntry),
+	}
+	current, _ := list_metadata_dirs(site_packages_path)
+	for _, installed := range library_data.Installed {
+		name := filepath.Base(installed.MetadataLocation)
+		state, ok := current[name]
+		if ok && filepath.Clean(filepath.Dir(installed.MetadataLocation)) == filepath.Clean(site_packages_path) {
+			state.Installed = installed
+			snapshot.Entries[name] = state
+		} else {
+			snapshot.Others = append(snapshot.Others, installed)
+		}
+	}
+	return snapshot, nil
+}
 
-	for w := range number_of_worker {
-		wg.Add(1)
-		go worker(w, &wg, jobs, results)
+// Loads the installed distributions of a venv, from its snapshot when nothing changed,
+// refreshing only the changed distributions when some did, and with a full scan otherwise.
+func get_installed_libraries_with_size(venv_path string, cache_dir string) (libraries, error) {
+	venv_path_abs, err := filepath.Abs(venv_path)
+	if err != nil {
+		slog.Error("Error while absoluting paths", "error", err)
+		return libraries{}, err
 	}
 
-	for index, installed_libraries := range library_data.Installed {
-		metadata_location := installed_libraries.MetadataLocation
-		record_path := filepath.Join(metadata_location, "RECORD")
-		paths_to_Size := make(map[string]struct{})
-		file, err := os.Open(record_path)
+	snapshot, ok := load_snapshot(cache_dir, venv_path_abs)
+	if ok && snapshot.SizeMode == size_mode && snapshot.PyvenvModTime == mod_time(filepath.Join(venv_path_abs, "pyvenv.cfg")) {
+		current, err := list_metadata_dirs(snapshot.SitePackages)
 		if err == nil {
-			defer file.Close()
-
-			record_file := csv.NewReader(file)
-			for {
-				record, err := record_file.Read()
-				if err == io.EOF {
-					break
-				} else if err != nil {
-					continue
-				}
-				relative_row := record[0]
-				abs_file_path, err := filepath.Abs(filepath.Join(site_packages_path, relative_row))
-				if strings.HasPrefix(abs_file_path, site_packages_path) {
-					parts := strings.Split(relative_row, string(filepath.Separator))
-					if len(parts) > 0 && !strings.Contains("__pycache__", relative_row) {
-						top_level := parts[0]
-						paths_to_Size[filepath.Join(site_packages_path, top_level)] = struct{}{}
-					}
-				}
+			if snapshot.refresh(current) {
+				save_snapshot(cache_dir, venv_path_abs, snapshot)
 			}
-
-		} else {
-			paths_to_Size[metadata_location] = struct{}{}
-		}
-
-		paths := make([]string, 0, len(paths_to_Size))
-		for p := range paths_to_Size {
-			paths = append(paths, p)
+			return snapshot.libraries(), nil
 		}
-		jobs <- Job{LibraryIdx: index, PathsToScan: paths}
 	}
 
-	close(jobs)
-
-	go func() {
-		wg.Wait()
-		close(results)
-	}()
-
-	for res := range results {
-		library_data.Installed[res.LibraryIdx].Metadata.Size = res.size
+	snapshot, err = scan_with_pip(venv_path_abs)
+	if err != nil {
+		return libraries{}, err
 	}
-
-	return library_data, nil
+	save_snapshot(cache_dir, venv_path_abs, snapshot)
+	return snapshot.libraries(), nil
 }
 
 func main() {
@@ -230,38 +622,39 @@ func main() {
 	logger := slog.New(handler).With("service", "go-detail-api")
 	slog.SetDefault(logger)
 
-	// scanner := bufio.NewScanner(os.Stdin)
-	var buffer bytes.Buffer
-	multi_encoder := io.MultiWriter(os.Stdout, &buffer)
-	encoder := json.NewEncoder(multi_encoder)
-	encoder.SetEscapeHTML(false)
+	cache_dir := flag.String("cache-dir", "", "directory for per-venv scan snapshots, no caching when empty")
+	flag.StringVar(&size_mode, "size", size_mode, "how packages are sized: walk (stat every file) or record (RECORD size column)")
+	stream_mode := flag.Bool("stream", false, "write one JSON line per package as soon as it is known, then its size")
+	flag.Parse()
+	if size_mode != "walk" && size_mode != "record" {
+		slog.Error("Unknown size mode", "size", size_mode)
+		os.Exit(2)
+	}
 
-	virtual_env_dir := os.Args[1:][0]
+	// Lines are flushed as they are written, stdout is not buffered
+	encoder := json.NewEncoder(os.Stdout)
+	encoder.SetEscapeHTML(false)
+	if *stream_mode {
+		stream = encoder
+	}
 
-	virtual_env_path := strings.TrimSpace(virtual_env_dir)
-	site_packages_path, err := get_installed_libraries_with_size(virtual_env_path)
-	site_packages_path.remove("")
+	if flag.NArg() < 1 {
+		slog.Error("Usage: library-loader [-cache-dir=DIR] [-size=walk|record] [-stream] VENV_PATH")
+		os.Exit(2)
+	}
+	virtual_env_path := strings.TrimSpace(flag.Arg(0))
+	library_data, err := get_installed_libraries_with_size(virtual_env_path, *cache_dir)
 	if err != nil {
 		slog.Error("Error getting installed libraries", "error", err)
+		stream_line(StreamLine{Done: true})
 		return
 	}
-	if err := encoder.Encode(site_packages_path); err != nil {
+	if stream != nil {
+		stream_line(StreamLine{Done: true, PipVersion: library_data.PipVersion})
+		return
+	}
+	library_data.remove("")
+	if err := encoder.Encode(library_data); err != nil {
 		slog.Error("Failed to write JSON output", "error", err)
 	}
-
-	// for scanner.Scan() {
-	// 	virtual_env_path := strings.TrimSpace(scanner.Text())
-	// 	site_packages_path, err := get_installed_libraries_with_size(virtual_env_path)
-	// 	if err != nil {
-	// 		slog.Error("Error getting installed libraries", "error", err)
-	// 		return
-	// 	}
-	// 	if err := encoder.Encode(site_packages_path); err != nil {
-	// 		slog.Error("Failed to write JSON output", "error", err)
-	// 	}
-	// 	if err := scanner.Err(); err != nil {
-	// 		slog.Error("Error reading from stdin", "error", err)
-	// 	}
-	// 	slog.Info("Stdin closed. Exiting.")
-	// }
 }
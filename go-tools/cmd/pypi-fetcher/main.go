@@ -1,8 +1,13 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
+	"crypto/sha1"
+	"encoding/hex"
 	"encoding/json"
+	"errors"
+	"flag"
 	"fmt"
 	"io"
 	"log/slog"
@@ -10,6 +15,8 @@ import (
 	"os"
 	"os/signal"
 	"path/filepath"
+	"regexp"
+	"sort"
 	"strings"
 	"sync"
 	"syscall"
@@ -40,9 +47,48 @@ type PyPIInfo struct {
 	} `json:"info"`
 }
 
+// One line of the journal written by older versions
+type JournalEntry struct {
+	Name string   `json:"name"`
+	Data PyPIInfo `json:"data"`
+}
+
+// One line read from stdin in serve mode
+type Request struct {
+	ID       int      `json:"id"`
+	Packages []string `json:"packages"`
+}
+
+// One line written to stdout in serve mode: a result per package, then one with Done set.
+// Error is set when the package could not be fetched (not when PyPI does not have it),
+// its Data is then empty and the app asks for it again later.
+type Response struct {
+	ID    int       `json:"id"`
+	Name  string    `json:"name,omitempty"`
+	Data  *PyPIInfo `json:"data,omitempty"`
+	Error string    `json:"error,omitempty"`
+	Done  bool      `json:"done,omitempty"`
+}
+
+// The details cache shared with the app (components/installer/cache.py):
+// <cache_dir>/<first two hex digits of sha1(name)>/<name>.json, one file per package.
+// The modification time of a file is bumped on every hit and is the LRU order.
+type DetailsCache struct {
+	Dir        string
+	TTL        time.Duration
+	MaxEntries int
+}
+
+const max_concurrent_fetches = 16
+
 var (
-	package_database = make(map[string]PyPIInfo)
-	dbMutex          = &sync.Mutex{}
+	valid_name     = regexp.MustCompile(`^[A-Za-z0-9][A-Za-z0-9._-]*$`)
+	stdoutMutex    = &sync.Mutex{}
+	stdout_encoder = json.NewEncoder(os.Stdout)
+	fetch_slots    = make(chan struct{}, max_concurrent_fetches)
+	details_url    = "https://pypi.org/pypi/{}/json"
+	// PyPI has no such package, answered with empty data rather than an error
+	err_not_found = errors.New("package not found")
 )
 
 func get_license(classifiers []string) string {
@@ -55,50 +101,170 @@ func get_license(classifiers []string) string {
 	return "UNKNOWN"
 }
 
-func save_data(file_dir string) {
+func (cache *DetailsCache) path_for(package_name string) (string, bool) {
+	if !valid_name.MatchString(package_name) {
+		return "", false
+	}
+	sum := sha1.Sum([]byte(package_name))
+	shard := hex.EncodeToString(sum[:])[:2]
+	return filepath.Join(cache.Dir, shard, package_name+".json"), true
+}
+
+// Reads one entry, treating expired or unreadable entries as missing
+func (cache *DetailsCache) get(package_name string) (PyPIInfo, bool) {
+	var pypi_data PyPIInfo
+	file_dir, ok := cache.path_for(package_name)
+	if !ok {
+		return pypi_data, false
+	}
+	file, err := os.ReadFile(file_dir)
+	if err != nil {
+		return pypi_data, false
+	}
+	if err := json.Unmarshal(file, &pypi_data); err != nil {
+		return pypi_data, false
+	}
+	if time.Since(pypi_data.FetchedAt) > cache.TTL {
+		return pypi_data, false
+	}
+	now := time.Now()
+	os.Chtimes(file_dir, now, now)
+	return pypi_data, true
+}
+
+// Replaces one entry, the file is renamed into place so readers never see half of it
+func (cache *DetailsCache) put(package_name string, pypi_data PyPIInfo) {
+	file_dir, ok := cache.path_for(package_name)
+	if !ok {
+		return
+	}
+	if err := os.MkdirAll(filepath.Dir(file_dir), 0755); err != nil {
+		slog.Error("Failed to create cache directory", "error", err)
+		return
+	}
 	buffer := new(bytes.Buffer)
 	buffer_encoder := json.NewEncoder(buffer)
 	buffer_encoder.SetEscapeHTML(false)
-	buffer_encoder.SetIndent("", " ")
-	dbMutex.Lock()
-	if err := buffer_encoder.Encode(package_database); err != nil {
-		slog.Error("Failed to encode package database", "error", err)
+	if err := buffer_encoder.Encode(pypi_data); err != nil {
+		slog.Error("Failed to encode cache entry", "package", package_name, "error", err)
+		return
+	}
+	temp_dir := fmt.Sprintf("%s.%d.tmp", file_dir, os.Getpid())
+	if err := os.WriteFile(temp_dir, buffer.Bytes(), 0644); err != nil {
+		slog.Error("Failed to write cache entry", "package", package_name, "error", err)
+		return
+	}
+	if err := os.Rename(temp_dir, file_dir); err != nil {
+		slog.Error("Failed to write cache entry", "package", package_name, "error", err)
 	}
-	dbMutex.Unlock()
+}
 
-	if err := os.WriteFile(file_dir, buffer.Bytes(), 0644); err != nil {
-		slog.Error("Failed to write package database: ", "error", err)
+// Deletes expired entries, then the least recently used ones beyond MaxEntries
+func (cache *DetailsCache) sweep() {
+	type entry struct {
+		path     string
+		modified time.Time
+	}
+	var entries []entry
+	shards, _ := os.ReadDir(cache.Dir)
+	for _, shard := range shards {
+		if !shard.IsDir() {
+			continue
+		}
+		shard_dir := filepath.Join(cache.Dir, shard.Name())
+		files, _ := os.ReadDir(shard_dir)
+		for _, file := range files {
+			if !strings.HasSuffix(file.Name(), ".json") {
+				continue
+			}
+			file_dir := filepath.Join(shard_dir, file.Name())
+			var pypi_data PyPIInfo
+			content, err := os.ReadFile(file_dir)
+			if err == nil {
+				err = json.Unmarshal(content, &pypi_data)
+			}
+			info, stat_err := file.Info()
+			if err != nil || stat_err != nil || time.Since(pypi_data.FetchedAt) > cache.TTL {
+				os.Remove(file_dir)
+				continue
+			}
+			entries = append(entries, entry{file_dir, info.ModTime()})
+		}
+	}
+	if len(entries) <= cache.MaxEntries {
+		return
+	}
+	sort.Slice(entries, func(i, j int) bool { return entries[i].modified.After(entries[j].modified) })
+	for _, old := range entries[cache.MaxEntries:] {
+		os.Remove(old.path)
 	}
 }
 
-func get_library_info(package_name string, wg *sync.WaitGroup) {
-	defer wg.Done()
+// Moves library_details.json and its journal, written by older versions, into the cache
+func (cache *DetailsCache) migrate_legacy(app_support_dir string) {
+	legacy_dir := filepath.Join(app_support_dir, "library_details.json")
+	if file, err := os.ReadFile(legacy_dir); err == nil {
+		package_database := make(map[string]PyPIInfo)
+		if len(file) > 0 {
+			if err := json.Unmarshal(file, &package_database); err != nil {
+				slog.Error("Failed to unmarshal package database", "error", err)
+			}
+		}
+		for package_name, pypi_data := range package_database {
+			cache.put(package_name, pypi_data)
+		}
+		os.Remove(legacy_dir)
+	}
+
+	journal_dir := filepath.Join(app_support_dir, "library_details.journal")
+	if file, err := os.Open(journal_dir); err == nil {
+		scanner := bufio.NewScanner(file)
+		scanner.Buffer(make([]byte, 1024*1024), 16*1024*1024)
+		for scanner.Scan() {
+			var entry JournalEntry
+			if err := json.Unmarshal(scanner.Bytes(), &entry); err == nil && entry.Name != "" {
+				cache.put(entry.Name, entry.Data)
+			}
+		}
+		file.Close()
+		os.Remove(journal_dir)
+	}
+}
+
+// Fetches one package from PyPI and stores it. Redirects (non canonical names) are followed
+// by net/http; a 404 is err_not_found.
+func fetch_library_info(cache *DetailsCache, package_name string) (PyPIInfo, error) {
+	fetch_slots <- struct{}{}
+	defer func() { <-fetch_slots }()
 
 	// Url is formatted link for get request
-	url := fmt.Sprintf("https://pypi.org/pypi/%s/json", package_name)
+	url := strings.Replace(details_url, "{}", package_name, 1)
 	resp, err := http.Get(url)
 
+	var pypi_data PyPIInfo
 	if err != nil {
-		slog.Error("Failed to fetch %s: %v", package_name, err)
-		return
+		slog.Error("Failed to fetch", "package", package_name, "error", err)
+		return pypi_data, err
 	}
 	defer resp.Body.Close()
 
+	if resp.StatusCode == http.StatusNotFound {
+		return pypi_data, err_not_found
+	}
 	if resp.StatusCode != http.StatusOK {
-		slog.Error("Error bad status for fetching %s: %v", package_name, resp.Status)
-		return
+		slog.Error("Error bad status for fetching", "package", package_name, "status", resp.Status)
+		return pypi_data, fmt.Errorf("status %s", resp.Status)
 	}
 
 	body, err := io.ReadAll(resp.Body)
 	if err != nil {
-		slog.Error("Error Parsing JSON file for %s: %v", package_name, err)
-		return
+		slog.Error("Error reading response", "package", package_name, "error", err)
+		return pypi_data, err
 	}
 
-	var pypi_data PyPIInfo
 	if err := json.Unmarshal(body, &pypi_data); err != nil {
-		slog.Error("Error Parsing JSON file for %s: %v", package_name, err)
-		return
+		slog.Error("Error Parsing JSON file", "package", package_name, "error", err)
+		return pypi_data, err
 	}
 	pypi_data.FetchedAt = time.Now()
 	if license := get_license(pypi_data.Info.Classifiers); license != "UNKNOWN" {
@@ -109,9 +275,63 @@ func get_library_info(package_name string, wg *sync.WaitGroup) {
 		}
 	}
 
-	dbMutex.Lock()
-	package_database[package_name] = pypi_data
-	dbMutex.Unlock()
+	cache.put(package_name, pypi_data)
+	return pypi_data, nil
+}
+
+func write_response(response Response) {
+	stdoutMutex.Lock()
+	defer stdoutMutex.Unlock()
+	if err := stdout_encoder.Encode(response); err != nil {
+		slog.Error("Failed to write response", "error", err)
+	}
+}
+
+// Answers one request: cached packages right away, the others as soon as each one arrives
+func handle_request(cache *DetailsCache, request Request) {
+	var wg sync.WaitGroup
+	for _, pkg := range request.Packages {
+		if pkg == "" {
+			continue
+		}
+		if pypi_data, ok := cache.get(pkg); ok {
+			write_response(Response{ID: request.ID, Name: pkg, Data: &pypi_data})
+			continue
+		}
+		wg.Add(1)
+		go func(pkg string) {
+			defer wg.Done()
+			// Empty data, with the error unless PyPI simply does not have the package
+			pypi_data, err := fetch_library_info(cache, pkg)
+			response := Response{ID: request.ID, Name: pkg, Data: &pypi_data}
+			if err != nil && !errors.Is(err, err_not_found) {
+				response.Error = err.Error()
+			}
+			write_response(response)
+		}(pkg)
+	}
+	wg.Wait()
+	write_response(Response{ID: request.ID, Done: true})
+}
+
+// Serves line delimited JSON requests from stdin until it is closed
+func serve(cache *DetailsCache) {
+	scanner := bufio.NewScanner(os.Stdin)
+	scanner.Buffer(make([]byte, 1024*1024), 16*1024*1024)
+	var wg sync.WaitGroup
+	for scanner.Scan() {
+		var request Request
+		if err := json.Unmarshal(scanner.Bytes(), &request); err != nil {
+			slog.Error("Failed to parse request", "error", err)
+			continue
+		}
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			handle_request(cache, request)
+		}()
+	}
+	wg.Wait()
 }
 
 func create_find_app_support_dir(app_name string) (string, error) {
@@ -137,72 +357,68 @@ func main() {
 	logger := slog.New(handler).With("service", "go-detail-api")
 	slog.SetDefault(logger)
 	app_name := "P4cMan"
-	file_name := "library_details.json"
+	stdout_encoder.SetEscapeHTML(false)
+
+	serve_mode := flag.Bool("serve", false, "answer line delimited JSON requests from stdin")
+	ttl := flag.Duration("ttl", 24*time.Hour, "how long cached details stay valid")
+	max_entries := flag.Int("max-entries", 5000, "how many packages the cache keeps")
+	flag.StringVar(&details_url, "url", details_url, "details URL, {} is replaced by the package name")
+	cache_dir := flag.String("cache-dir", "", "cache directory, defaults to library_details in the app support directory")
+	flag.Parse()
 
 	app_support_dir, err := create_find_app_support_dir(app_name)
 	if err != nil {
 		return
 	}
-	file_dir := filepath.Join(app_support_dir, file_name)
-
-	if _, err := os.Stat(file_dir); os.IsNotExist(err) {
-		file, err := os.Create(file_dir)
-		if err != nil {
-			slog.Error("Failed to create file", "error", err)
-		}
-		defer file.Close()
-	}
-
-	dbMutex.Lock()
-	file, err := os.ReadFile(file_dir)
-	if err != nil {
-		file, err := os.Create(file_dir)
-		if err != nil {
-			slog.Error("Failed to create file", "error", err)
-		}
-		file.Close()
+	if *cache_dir == "" {
+		*cache_dir = filepath.Join(app_support_dir, "library_details")
 	}
-	if len(file) > 0 {
-		if err := json.Unmarshal(file, &package_database); err != nil {
-			slog.Error("Failed to unmarshal package database", "error", err)
-		}
+	cache := &DetailsCache{
+		Dir:        *cache_dir,
+		TTL:        *ttl,
+		MaxEntries: *max_entries,
 	}
-
-	dbMutex.Unlock()
+	cache.migrate_legacy(app_support_dir)
 
 	signal_for_closing := make(chan os.Signal, 1)
 	signal.Notify(signal_for_closing, syscall.SIGINT, syscall.SIGTERM)
 
-	packages := os.Args[1:]
+	if *serve_mode {
+		// Every entry is already on disk, so a signal has nothing left to save
+		go func() {
+			<-signal_for_closing
+			os.Exit(0)
+		}()
+		go cache.sweep()
+		serve(cache)
+		return
+	}
+
+	packages := flag.Args()
+	current_packages := make(map[string]PyPIInfo)
+	var mapMutex sync.Mutex
 	var wg sync.WaitGroup
 	for _, pkg := range packages {
 		if pkg == "" {
 			continue
 		}
-		dbMutex.Lock()
-		_, ok := package_database[pkg]
-		dbMutex.Unlock()
-		if ok {
-			continue
-		}
 		wg.Add(1)
-		go get_library_info(pkg, &wg)
+		go func(pkg string) {
+			defer wg.Done()
+			pypi_data, ok := cache.get(pkg)
+			if !ok {
+				pypi_data, _ = fetch_library_info(cache, pkg)
+			}
+			mapMutex.Lock()
+			current_packages[pkg] = pypi_data
+			mapMutex.Unlock()
+		}(pkg)
 	}
 	wg.Wait()
 
-	current_packages := make(map[string]PyPIInfo)
-	dbMutex.Lock()
-	for _, pkg := range packages {
-		current_packages[pkg] = package_database[pkg]
-	}
-	dbMutex.Unlock()
-
-	var buffer bytes.Buffer
-	multi_writer := io.MultiWriter(os.Stdout, &buffer)
-	encoder := json.NewEncoder(multi_writer)
+	encoder := json.NewEncoder(os.Stdout)
 	encoder.SetEscapeHTML(false)
 	encoder.SetIndent("", " ")
 	encoder.Encode(current_packages)
-	save_data(file_dir)
-
+	cache.sweep()
 }
@@ -0,0 +1,98 @@
+import re
+import subprocess
+from collections import deque
+from helpers.utils import normalize_name
+
+# What pip prints when a package enters a phase, in the order the phases happen
+PIP_PHASES = (
+    ("collecting", re.compile(r"^Collecting ([A-Za-z0-9][A-Za-z0-9._-]*)")),
+    # Files are named by URL, by local path or on their own
+    ("downloading", re.compile(r"^\s*(?:Downloading|Processing) (?:\S*/)?([A-Za-z0-9][A-Za-z0-9._]*)-")),
+    ("building", re.compile(r"^\s*Building wheel for ([A-Za-z0-9][A-Za-z0-9._-]*)")),
+    ("installing", re.compile(r"^Installing collected packages: (.+)$")),
+    ("uninstalling", re.compile(r"^\s*(?:Found existing installation|Uninstalling):? ([A-Za-z0-9][A-Za-z0-9._-]*)")),
+)
+PHASE_ORDER = {phase: rank for rank, (phase, _) in enumerate(PIP_PHASES, 1)}
+# The phases each kind of run goes through. An upgrade prints the uninstall lines of
+# the old version after "Installing collected packages", they are not a phase of it.
+INSTALL_PHASES = ("collecting", "downloading", "building", "installing")
+UNINSTALL_PHASES = ("uninstalling",)
+DEFAULT_LOG_LINES = 200
+
+
+def phase_fraction(phase: str) -> float:
+    """How far along a package in `phase` is, for the progress drawn around its status icon."""
+    if phase == "uninstalling":
+        return 0.5
+    return PHASE_ORDER.get(phase, 0) / PHASE_ORDER["installing"]
+
+
+def parse_pip_line(line: str) -> tuple[str, list[str]] | None:
+    """Returns the phase a line of pip output starts and the packages it names, if any."""
+    for phase, pattern in PIP_PHASES:
+        match = pattern.match(line)
+        if match:
+            names = [name.strip() for name in match.group(1).split(",")]
+            return phase, [name for name in names if name]
+    return None
+
+
+class PipProgress:
+    """
+    Follows the phases of the packages one pip run was asked for.
+
+    A line about one of them moves that package on; a line about anything else
+    (a dependency being downloaded or built) moves on every requested package
+    still behind it, since the run is waiting on it for all of them. Only the
+    `phases` of this kind of run are followed (INSTALL_PHASES or UNINSTALL_PHASES),
+    other lines are ignored. Phases never go back.
+    """
+    def __init__(self, names: list[str], phases: tuple = INSTALL_PHASES):
+        self.names = {normalize_name(name): name for name in names}
+        self.phases = {name: "" for name in names}
+        self.followed = set(phases)
+
+    def feed(self, line: str) -> dict[str, str]:
+        """Returns {requested name: phase} for the packages this line moved on."""
+        parsed = parse_pip_line(line)
+        if parsed is None:
+            return {}
+        phase, named = parsed
+        if phase not in self.followed:
+            return {}
+        requested = [self.names[normalize_name(name)] for name in named if normalize_name(name) in self.names]
+        changed = {}
+        for name in requested or self.phases:
+            if PHASE_ORDER[phase] > PHASE_ORDER.get(self.phases[name], 0):
+                self.phases[name] = phase
+                changed[name] = phase
+        return changed
+
+
+def run_pip(python_path: str, args: list[str], on_line = None, log_lines: int = DEFAULT_LOG_LINES) -> tuple[int, deque]:
+    """
+    Runs `python -m pip <args>`, handing every output line to `on_line` as soon as pip prints it.
+
+    stderr is merged into stdout so warnings and errors come in order with the rest.
+    Returns the exit code (-1 when pip could not be started) and the last
+    `log_lines` lines of output.
+    """
+    log = deque(maxlen=log_lines)
+    try:
+        process = subprocess.Popen(
+            [python_path, "-m", "pip", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+    except OSError as e:
+        log.append(f"Failed to start pip: {e}")
+        return -1, log
+    assert process.stdout is not None
+    for line in process.stdout:
+        line = line.rstrip()
+        log.append(line)
+        if on_line is not None:
+            on_line(line)
+    return process.wait(), log
@@ -1,6 +1,15 @@
+import re
 import sys
 import os
 
+_NORMALIZE_PATTERN = re.compile(r"[-_.]+")
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes a package name as described in PEP 503."""
+    return _NORMALIZE_PATTERN.sub("-", name).lower()
+
+
 # This code is specifically for mac
 # Note to self: add some if else statements for windows execution
 def get_app_support_directory(appName: str = "P4cMan") -> str:
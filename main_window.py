@@ -9,11 +9,11 @@ from components.library.core import Library
 from components.widgets.control_bar import ControlBar
 from components.about.core import About
 from components.installer.core import Installer
-from components.installer.utils import save_file
 from components.analysis.core import Analysis
 from components.settings.core import Setting
 from helpers.state_manager import save_state
 from components.onboarding.threads import PythonInterpreters
+from components.onboarding.interpreters import search_paths
 
 class P4cMan(QMainWindow):
     """
@@ -129,7 +129,7 @@ class P4cMan(QMainWindow):
         """
         self.main_stack.setCurrentWidget(self.container)
         if self.python_interpreters == {}:
-            self.python_thread_worker = PythonInterpreters()
+            self.python_thread_worker = PythonInterpreters(search_paths(self.config))
             self.python_thread_worker.finished.connect(self._set_python_interpreters)
             self.python_thread_worker.finished.connect(self.python_thread_worker.deleteLater)
             self.python_thread_worker.start()
@@ -142,7 +142,7 @@ class P4cMan(QMainWindow):
         """
         self.libraries = Library(config = self.config)
         self.installer = Installer(config = self.config)
-        self.analysis = Analysis()
+        self.analysis = Analysis(self.installer.wheelhouse)
         self.dependency_tree = DependencyTree()
         self.settings = Setting()
         self.about = About()
@@ -309,5 +309,9 @@ class P4cMan(QMainWindow):
             save_state(
                 self.state_variables
             )
-            save_file(self.installer.all_libraries)
+        self.installer.scraper_pypi.stop()
+        self.installer.search_runner.stop()
+        self.installer.details_prefetcher.stop()
+        self.libraries.env_prefetcher.stop()
+        self.libraries.site_watcher.stop()
         super().closeEvent(a0)